@@ -1,12 +1,50 @@
 # server.py - Core FastAPI logic
 from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from llm_reporting.backends.service import ConversionService
 from llm_reporting.core.evaluator import evaluate_rule_by_id
+from llm_reporting.core.search import default_index
+from llm_reporting.engine.coverage import CoverageIndex
+from llm_reporting.engine.similarity import MIN_SIMILARITY, SimilarityIndex
 from llm_reporting.core.utils import list_rule_ids, load_evaluation
-from typing import List
+from typing import List, Optional
 import os
+import yaml
 
 app = FastAPI()
 
+# Created on first use; keeps the per-backend caches and worker pool warm between requests
+_conversion_service = None
+
+# ATT&CK coverage of the rule tree; refreshed (incrementally) on each request
+coverage_index = CoverageIndex()
+
+# Near-duplicate search over the rule tree; refreshed (incrementally) on each request
+similarity_index = SimilarityIndex()
+
+# Full-text search over evaluations and reports; the evaluator updates it on write
+search_index = default_index()
+
+class ConvertRequest(BaseModel):
+    backends: Optional[List[str]] = None  # default: every backend
+    rules: Optional[List[str]] = None  # Sigma YAML texts; default: the whole rule tree
+
+class SimilarRequest(BaseModel):
+    rule: str  # Sigma YAML of a draft rule
+    k: int = 5
+    min_similarity: float = MIN_SIMILARITY
+
+def get_conversion_service():
+    global _conversion_service
+    if _conversion_service is None:
+        _conversion_service = ConversionService()
+    return _conversion_service
+
+@app.on_event("shutdown")
+def close_conversion_service():
+    if _conversion_service is not None:
+        _conversion_service.close()
+
 @app.get("/list_results", response_model=List[str])
 def list_results():
     return list_rule_ids()
@@ -24,4 +62,49 @@ def eval_rule(rule_id: str):
         result = evaluate_rule_by_id(rule_id)
         return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/convert")
+def convert_rules(request: ConvertRequest):
+    service = get_conversion_service()
+    try:
+        if request.rules is None:
+            return service.convert_corpus(request.backends)
+        return service.convert_texts(request.rules, request.backends)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/coverage")
+def get_coverage():
+    coverage_index.refresh()
+    return {"summary": coverage_index.summary(), "matrix": coverage_index.matrix()}
+
+@app.get("/coverage/{technique}")
+def get_technique_coverage(technique: str):
+    coverage_index.refresh()
+    return coverage_index.coverage(technique)
+
+@app.get("/similar/{rule_id}")
+def similar_rules(rule_id: str, k: int = 5, min_similarity: float = MIN_SIMILARITY):
+    similarity_index.refresh()
+    results = similarity_index.similar_to_id(rule_id, k, min_similarity)
+    if results is None:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    return results
+
+@app.post("/similar")
+def similar_to_draft(request: SimilarRequest):
+    try:
+        rule = yaml.safe_load(request.rule)
+    except yaml.YAMLError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not isinstance(rule, dict):
+        raise HTTPException(status_code=400, detail="Rule must be a YAML mapping")
+    similarity_index.refresh()
+    return similarity_index.similar_to_rule(rule, request.k, request.min_similarity)
+
+
+@app.get("/search")
+def search_reports(q: str, k: int = 10, kind: Optional[str] = None):
+    search_index.refresh()
+    return search_index.search(q, k, kind)
@@ -0,0 +1,126 @@
+# base.py - Backend-neutral query tree built from a Sigma detection section
+#
+# Leaves:
+#   ("cmp", field, values)          field equals any of values (Sigma '*'/'?' wildcards kept)
+#   ("regex", field, pattern, flags)
+#   ("exists", field, present)
+#   ("kw", values)                  keyword search over the whole event
+# Inner nodes: ("and", [...]), ("or", [...]), ("not", node)
+import os
+from typing import List, Tuple
+
+from llm_reporting.engine.compiler import ConditionParser, RuleCompileError
+from llm_reporting.engine.rules import load_rule_file, normalize_rule
+
+Tree = Tuple
+
+
+class ConversionError(ValueError):
+    pass
+
+
+class UnsupportedRule(ConversionError):
+    """The backend has no translation for this kind of rule (not a defect in the rule)."""
+
+
+def _values(raw) -> list:
+    return list(raw) if isinstance(raw, (list, tuple)) else [raw]
+
+
+def _group(kind: str, children: List[Tree]) -> Tree:
+    return children[0] if len(children) == 1 else (kind, list(children))
+
+
+def field_tree(spec: str, raw) -> Tree:
+    field, *modifiers = spec.split("|")
+    values = _values(raw)
+
+    if "exists" in modifiers:
+        return ("exists", field, bool(values[0]))
+    if values == [None]:
+        return ("not", ("exists", field, True))
+
+    if "re" in modifiers:
+        flags = "".join(m for m in modifiers if m in ("i", "m", "s"))
+        leaves = [("regex", field, str(v), flags) for v in values]
+        return _group("and" if "all" in modifiers else "or", leaves)
+
+    unknown = [m for m in modifiers if m not in ("contains", "startswith", "endswith", "all")]
+    if unknown:
+        raise ConversionError(f"Unsupported modifier(s) {unknown} on field {field}")
+    patterns = []
+    for value in values:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            patterns.append(value)
+            continue
+        text = str(value)
+        if "contains" in modifiers:
+            text = f"*{text}*"
+        elif "startswith" in modifiers:
+            text = f"{text}*"
+        elif "endswith" in modifiers:
+            text = f"*{text}"
+        patterns.append(text)
+    if "all" in modifiers:
+        return _group("and", [("cmp", field, (p,)) for p in patterns])
+    return ("cmp", field, tuple(patterns))
+
+
+def selection_tree(name: str, block) -> Tree:
+    if isinstance(block, dict):
+        return _group("and", [field_tree(spec, raw) for spec, raw in block.items()])
+    if isinstance(block, list):
+        if all(isinstance(item, dict) for item in block):
+            return _group("or", [selection_tree(name, item) for item in block])
+        return ("kw", tuple(str(v) for v in block))
+    if isinstance(block, (str, int)):
+        return ("kw", (str(block),))
+    raise ConversionError(f"Unsupported detection block '{name}'")
+
+
+class TreeParser(ConditionParser):
+    """Sigma condition grammar producing backend-neutral tuples."""
+
+    make_and = staticmethod(lambda children: ("and", list(children)))
+    make_or = staticmethod(lambda children: ("or", list(children)))
+    make_not = staticmethod(lambda child: ("not", child))
+
+
+def simplify(node: Tree) -> Tree:
+    """Flatten nested and/or of the same kind and collapse single-child groups."""
+    kind = node[0]
+    if kind == "not":
+        return ("not", simplify(node[1]))
+    if kind not in ("and", "or"):
+        return node
+    children = []
+    for child in node[1]:
+        child = simplify(child)
+        if child[0] == kind:
+            children.extend(child[1])
+        else:
+            children.append(child)
+    return _group(kind, children)
+
+
+def detection_tree(detection: dict) -> Tree:
+    if not isinstance(detection, dict) or "condition" not in detection:
+        raise ConversionError("Detection section has no condition")
+    names = [name for name in detection if name not in ("condition", "timeframe")]
+    selections = {name: selection_tree(name, detection[name]) for name in names}
+    conditions = detection["condition"]
+    if isinstance(conditions, str):
+        conditions = [conditions]
+    try:
+        trees = [TreeParser(condition, selections).parse() for condition in conditions]
+    except RuleCompileError as e:
+        raise ConversionError(str(e)) from None
+    return simplify(_group("or", trees))
+
+
+def load_rule(path: str) -> dict:
+    data = load_rule_file(path)
+    if not isinstance(data, dict):
+        raise ConversionError(f"{os.path.basename(path)} does not contain a rule mapping")
+    return normalize_rule(data, path)
+
@@ -0,0 +1,94 @@
+# cache.py - Per-backend output cache keyed by rule content hash
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Optional
+
+from llm_reporting.engine.rules import RULE_DIR
+
+CACHE_DIR = os.path.join(RULE_DIR, ".cache")
+# Entries kept per backend by MemoryCache
+MEMORY_ENTRIES = 1024
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class OutputCache:
+    """JSON file of {rule hash: entry}; discarded wholesale when the backend version changes."""
+
+    def __init__(self, backend: str, version: str, cache_dir: str = CACHE_DIR):
+        self.path = os.path.join(cache_dir, f"{backend}.json")
+        self.version = version
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == version:
+                self.entries = data.get("entries", {})
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: dict):
+        self.entries[key] = entry
+        self._dirty = True
+
+    def retain(self, keys):
+        """Forget entries for rules that no longer exist."""
+        keys = set(keys)
+        stale = [key for key in self.entries if key not in keys]
+        for key in stale:
+            del self.entries[key]
+        self._dirty = self._dirty or bool(stale)
+
+    def save(self):
+        if not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "entries": self.entries}, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+
+class MemoryCache:
+    """Bounded in-process LRU with the OutputCache interface, for output that must not reach disk."""
+
+    def __init__(self, max_entries: int = MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: dict):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def save(self):
+        pass
@@ -0,0 +1,139 @@
+# elastic.py - Sigma -> Elastic Lucene query strings (Winlogbeat field layout)
+import re
+from typing import Dict, List, Optional
+
+from llm_reporting.backends.base import ConversionError, Tree, UnsupportedRule, detection_tree, simplify
+from llm_reporting.backends.splunk import CATEGORY_EVENT_CODES
+from llm_reporting.engine.fieldmap import default_mappings
+
+# Bump whenever the generated queries change so cached output is regenerated
+BACKEND_VERSION = "1"
+OUTPUT_EXT = ".lucene"
+
+# Sigma field -> Winlogbeat field (the "elastic" profile of data/field_mappings.yml);
+# other Windows fields live under winlog.event_data
+FIELD_MAP = default_mappings().profile("elastic")
+CACHE_VERSION = f"{BACKEND_VERSION}-{default_mappings().digest[:12]}"
+WINDOWS_PREFIX = "winlog.event_data."
+SYSMON_CHANNEL = "Microsoft-Windows-Sysmon/Operational"
+SERVICE_CHANNELS = {
+    "security": ("Security",),
+    "system": ("System",),
+    "application": ("Application",),
+    "powershell": ("Microsoft-Windows-PowerShell/Operational", "PowerShellCore/Operational"),
+    "powershell-classic": ("Windows PowerShell",),
+    "sysmon": (SYSMON_CHANNEL,),
+}
+
+# Lucene query_string syntax characters (wildcards handled separately)
+_SPECIAL = set('+-=&|><!(){}[]^"~:\\/ ')
+# Regex shorthands Lucene's RegExp engine lacks, rewritten outside character classes
+_SHORTHANDS = {"d": "[0-9]", "w": "[A-Za-z0-9_]", "s": "[ \\t\\r\\n]"}
+
+
+def es_field(field: str, windows: bool) -> str:
+    if field in FIELD_MAP:
+        return FIELD_MAP[field]
+    return WINDOWS_PREFIX + field if windows else field
+
+
+def escape(value, wildcards: bool = True) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    out = []
+    for c in str(value):
+        if c in _SPECIAL or (not wildcards and c in "*?"):
+            out.append("\\" + c)
+        else:
+            out.append(c)
+    return "".join(out)
+
+
+def lucene_regex(pattern: str, flags: str) -> str:
+    """Translate an unanchored Python regex to Lucene's anchored RegExp dialect."""
+    if re.search(r"\(\?|\\[bBAZ]|\\[1-9]", pattern):
+        raise ConversionError(f"Regex /{pattern}/ uses constructs Lucene does not support")
+    anchored_start = pattern.startswith("^")
+    anchored_end = pattern.endswith("$") and not pattern.endswith("\\$")
+    body = pattern[1 if anchored_start else 0:len(pattern) - 1 if anchored_end else len(pattern)]
+    out = []
+    in_class = False
+    i = 0
+    while i < len(body):
+        c = body[i]
+        if c == "\\" and i + 1 < len(body):
+            nxt = body[i + 1]
+            if nxt in _SHORTHANDS:
+                if in_class:
+                    raise ConversionError(f"Regex /{pattern}/ uses \\{nxt} inside a character class")
+                out.append(_SHORTHANDS[nxt])
+            else:
+                out.append(c + nxt)
+            i += 2
+            continue
+        if c == "[":
+            in_class = True
+        elif c == "]":
+            in_class = False
+        elif c == "/":
+            c = "\\/"
+        elif "i" in flags and not in_class and c.isalpha():
+            c = f"[{c.lower()}{c.upper()}]"
+        out.append(c)
+        i += 1
+    text = "".join(out)
+    return ("" if anchored_start else ".*") + text + ("" if anchored_end else ".*")
+
+
+def render(node: Tree, windows: bool, nested: bool = False) -> str:
+    kind = node[0]
+    if kind in ("and", "or"):
+        joiner = " AND " if kind == "and" else " OR "
+        text = joiner.join(render(child, windows, True) for child in node[1])
+        return f"({text})" if nested else text
+    if kind == "not":
+        return f"NOT {render(node[1], windows, True)}"
+    if kind == "cmp":
+        field, values = es_field(node[1], windows), node[2]
+        if len(values) == 1:
+            return f"{field}:{escape(values[0])}"
+        return f"{field}:({' OR '.join(escape(v) for v in values)})"
+    if kind == "regex":
+        _, field, pattern, flags = node
+        return f"{es_field(field, windows)}:/{lucene_regex(pattern, flags)}/"
+    if kind == "exists":
+        text = f"_exists_:{es_field(node[1], windows)}"
+        return text if node[2] else f"NOT {text}"
+    if kind == "kw":
+        text = " OR ".join(f'"{escape(v, wildcards=False)}"' for v in node[1])
+        return f"({text})" if nested and len(node[1]) > 1 else text
+    raise ConversionError(f"Cannot render {kind} as a Lucene query")
+
+
+def logsource_tree(logsource: dict) -> List[Tree]:
+    terms = []
+    service = logsource.get("service")
+    category = logsource.get("category")
+    if service in SERVICE_CHANNELS:
+        terms.append(("cmp", "Channel", SERVICE_CHANNELS[service]))
+    elif category in CATEGORY_EVENT_CODES and logsource.get("product") == "windows":
+        terms.append(("cmp", "Channel", (SYSMON_CHANNEL,)))
+    if category in CATEGORY_EVENT_CODES:
+        terms.append(("cmp", "EventID", CATEGORY_EVENT_CODES[category]))
+    return terms
+
+
+def base_query(rule: dict, detection: Optional[Tree] = None) -> str:
+    if detection is None:
+        detection = detection_tree(rule.get("detection"))
+    logsource = rule.get("logsource") or {}
+    windows = logsource.get("product") == "windows"
+    return render(simplify(("and", logsource_tree(logsource) + [detection])), windows)
+
+
+def convert_rule(rule: dict, detection: Optional[Tree] = None) -> str:
+    return base_query(rule, detection)
+
+
+def convert_correlation(rule: dict, bases: Dict[str, str]) -> str:
+    raise UnsupportedRule("Correlation rules need an EQL or threshold rule; Lucene cannot express them")
@@ -0,0 +1,117 @@
+# qradar.py - Sigma -> QRadar AQL searches
+import math
+from typing import Dict, Optional
+
+from llm_reporting.backends.base import ConversionError, Tree, UnsupportedRule, detection_tree
+from llm_reporting.backends.splunk import CATEGORY_EVENT_CODES
+from llm_reporting.engine.correlation import CorrelationError, CorrelationRule
+
+# Bump whenever the generated AQL changes so cached output is regenerated
+BACKEND_VERSION = "1"
+OUTPUT_EXT = ".aql"
+
+# Sigma product -> QRadar log source type (DSM) name
+PRODUCT_LOGSOURCE_TYPES = {"windows": "Microsoft Windows Security Event Log"}
+DEFAULT_COLUMNS = ("starttime", "QIDNAME(qid) AS event_name", "LOGSOURCENAME(logsourceid) AS log_source",
+                   "sourceip", "username")
+
+
+def aql_field(field: str) -> str:
+    return '"' + field.replace('"', '') + '"'
+
+
+def literal(value) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def like_pattern(value) -> str:
+    # Literal % and _ in a value become LIKE wildcards too; that only over-matches
+    return literal(str(value).replace("*", "%").replace("?", "_"))
+
+
+def _compare(field: str, value) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"{field} = {value}"
+    # Sigma string matching is case-insensitive, so even exact values use ILIKE
+    return f"{field} ILIKE {like_pattern(value)}"
+
+
+def render(node: Tree, nested: bool = False) -> str:
+    kind = node[0]
+    if kind in ("and", "or"):
+        joiner = " AND " if kind == "and" else " OR "
+        text = joiner.join(render(child, True) for child in node[1])
+        return f"({text})" if nested else text
+    if kind == "not":
+        return f"NOT {render(node[1], True)}"
+    if kind == "cmp":
+        field, values = aql_field(node[1]), node[2]
+        if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values) and len(values) > 1:
+            return f"{field} IN ({', '.join(literal(v) for v in values)})"
+        parts = [_compare(field, v) for v in values]
+        text = " OR ".join(parts)
+        return f"({text})" if nested and len(parts) > 1 else text
+    if kind == "regex":
+        _, field, pattern, flags = node
+        operator = "IMATCHES" if "i" in flags else "MATCHES"
+        inline = "".join(f for f in flags if f in "ms")
+        prefix = f"(?{inline})" if inline else ""
+        return f"{aql_field(field)} {operator} {literal(f'{prefix}.*(?:{pattern}).*')}"
+    if kind == "exists":
+        return f"{aql_field(node[1])} IS {'NOT ' if node[2] else ''}NULL"
+    if kind == "kw":
+        parts = [f"UTF8(payload) ILIKE {like_pattern(f'*{v}*')}" for v in node[1]]
+        text = " OR ".join(parts)
+        return f"({text})" if nested and len(parts) > 1 else text
+    raise ConversionError(f"Cannot render {kind} as AQL")
+
+
+def where_clause(rule: dict, detection: Optional[Tree] = None) -> str:
+    if detection is None:
+        detection = detection_tree(rule.get("detection"))
+    logsource = rule.get("logsource") or {}
+    terms = []
+    dsm = PRODUCT_LOGSOURCE_TYPES.get(logsource.get("product"))
+    if dsm:
+        terms.append(f"LOGSOURCETYPENAME(devicetype) = {literal(dsm)}")
+    category = logsource.get("category")
+    if category in CATEGORY_EVENT_CODES:
+        terms.append(render(("cmp", "EventID", CATEGORY_EVENT_CODES[category]), True))
+    terms.append(render(detection, True) if len(terms) else render(detection))
+    return " AND ".join(terms)
+
+
+def base_query(rule: dict, detection: Optional[Tree] = None) -> str:
+    return where_clause(rule, detection)
+
+
+def convert_rule(rule: dict, detection: Optional[Tree] = None) -> str:
+    columns = list(DEFAULT_COLUMNS) + [aql_field(f) for f in rule.get("fields") or []]
+    return f"SELECT {', '.join(columns)} FROM events WHERE {where_clause(rule, detection)} LAST 24 HOURS"
+
+
+def convert_correlation(rule: dict, bases: Dict[str, str]) -> str:
+    try:
+        correlation = CorrelationRule(rule)
+    except CorrelationError as e:
+        raise ConversionError(str(e)) from None
+    if correlation.type not in ("event_count", "value_count"):
+        raise UnsupportedRule(f"{correlation.type} correlations have no AQL translation")
+    wheres = []
+    for ref in correlation.rules:
+        if ref not in bases:
+            raise ConversionError(f"Correlation references unknown rule '{ref}'")
+        wheres.append(bases[ref])
+    where = wheres[0] if len(wheres) == 1 else " OR ".join(f"({w})" for w in wheres)
+    group = [aql_field(f) for f in correlation.group_by]
+    if correlation.type == "event_count":
+        metric, alias = "COUNT(*)", "event_count"
+    else:
+        metric, alias = f"UNIQUECOUNT({aql_field(correlation.field)})", "value_count"
+    columns = ", ".join(group + [f"{metric} AS {alias}"])
+    group_by = f" GROUP BY {', '.join(group)}" if group else ""
+    minutes = max(1, math.ceil(correlation.timespan / 60))
+    return (f"SELECT {columns} FROM events WHERE {where}{group_by} "
+            f"HAVING {alias} >= {correlation.threshold} LAST {minutes} MINUTES")
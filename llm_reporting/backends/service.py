@@ -0,0 +1,254 @@
+# service.py - Convert rules to every backend in one pass on a worker pool
+#
+# Each rule file is parsed once (YAML + detection tree) and the tree is handed to
+# every backend emitter in the same worker. Output is cached per backend by rule
+# content hash, so a warm corpus conversion only reads and hashes files.
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import yaml
+
+from llm_reporting.backends import elastic, qradar, sigma, splunk
+from llm_reporting.backends.base import ConversionError, UnsupportedRule, detection_tree
+from llm_reporting.backends.cache import CACHE_DIR, MemoryCache, OutputCache, content_hash
+from llm_reporting.engine.rules import BASE_DIR, RULE_DIR, YamlLoader, list_rule_files, normalize_rule
+
+# name -> module exposing BACKEND_VERSION (or CACHE_VERSION), OUTPUT_EXT, base_query,
+# convert_rule and convert_correlation
+BACKENDS = {"splunk": splunk, "elastic": elastic, "qradar": qradar, "sigma": sigma}
+CONVERTED_DIR = os.path.join(BASE_DIR, "converted")
+
+# Below this many rules to (re)convert the process pool costs more than it saves
+PARALLEL_THRESHOLD = 32
+CHUNK_SIZE = 64
+
+# (key, path or None, raw YAML bytes)
+Source = Tuple[str, Optional[str], bytes]
+
+
+def parse_source(data: bytes, path: Optional[str] = None) -> dict:
+    rule = yaml.load(data, Loader=YamlLoader)
+    if not isinstance(rule, dict):
+        raise ConversionError("does not contain a rule mapping")
+    return normalize_rule(rule, path)
+
+
+def convert_source(task) -> Tuple[str, Optional[dict], Dict[str, dict], Optional[str]]:
+    """Worker: parse one rule and run each requested emitter on the shared tree.
+
+    Returns (key, the rule if it is a correlation, {backend: entry}, parse error).
+    Correlations are only parsed here; they need every base query and are
+    converted afterwards by the caller.
+    """
+    key, path, data, backends = task
+    try:
+        rule = parse_source(data, path)
+        if "correlation" in rule:
+            return key, rule, {}, None
+        detection = detection_tree(rule.get("detection"))
+    except (ConversionError, ValueError, yaml.YAMLError) as e:
+        return key, None, {}, str(e)
+    outputs = {}
+    for name in backends:
+        module = BACKENDS[name]
+        try:
+            outputs[name] = {"kind": "rule", "id": str(rule.get("id")), "name": rule.get("name"),
+                             "base": module.base_query(rule, detection),
+                             "query": module.convert_rule(rule, detection)}
+        except UnsupportedRule as e:
+            outputs[name] = {"unsupported": str(e)}
+        except (ConversionError, ValueError) as e:
+            outputs[name] = {"error": str(e)}
+    return key, None, outputs, None
+
+
+class ConversionService:
+    """Long-lived converter: keeps the caches loaded and the worker pool warm."""
+
+    def __init__(self, rule_dir: str = RULE_DIR, workers: Optional[int] = None, cache_dir: str = CACHE_DIR):
+        self.rule_dir = rule_dir
+        self.workers = workers
+        self.caches = {name: OutputCache(name, getattr(module, "CACHE_VERSION", module.BACKEND_VERSION), cache_dir)
+                       for name, module in BACKENDS.items()}
+        # Ad-hoc texts (API requests) are cached in memory only, never next to the corpus
+        self.text_caches = {name: MemoryCache() for name in BACKENDS}
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _map(self, tasks: list) -> list:
+        if len(tasks) < PARALLEL_THRESHOLD:
+            return [convert_source(task) for task in tasks]
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        workers = self.workers or os.cpu_count() or 1
+        chunksize = max(1, min(CHUNK_SIZE, len(tasks) // (4 * workers)))
+        return list(self._pool.map(convert_source, tasks, chunksize=chunksize))
+
+    @staticmethod
+    def _backends(backends: Optional[Iterable[str]]) -> List[str]:
+        names = list(backends) if backends else list(BACKENDS)
+        unknown = [name for name in names if name not in BACKENDS]
+        if unknown:
+            raise ValueError(f"Unknown backend(s) {unknown}; available: {sorted(BACKENDS)}")
+        return names
+
+    def convert(self, sources: Sequence[Source], backends: Optional[Iterable[str]] = None,
+                caches: Optional[dict] = None) -> dict:
+        """Convert sources to each backend; errors are reported per backend, never raised.
+
+        caches maps backend names to the caches to read and fill (default: the
+        on-disk corpus caches).
+        """
+        names = self._backends(backends)
+        caches = caches or self.caches
+        started = time.perf_counter()
+        with self._lock:
+            outputs = {name: {} for name in names}
+            errors = {name: [] for name in names}
+            skipped = {name: [] for name in names}
+            compiled = {name: 0 for name in names}
+            digests = {}
+            tasks = []
+            for key, path, data in sources:
+                digest = digests[key] = content_hash(data)
+                missing = []
+                for name in names:
+                    entry = caches[name].get(digest)
+                    if entry is None or entry["kind"] == "correlation":
+                        missing.append(name)
+                    else:
+                        outputs[name][key] = entry
+                if missing:
+                    tasks.append((key, path, data, tuple(missing)))
+
+            correlations = []
+            for (key, _path, _data, missing), (_key, rule, results, error) in zip(tasks, self._map(tasks)):
+                if error is not None:
+                    for name in missing:
+                        errors[name].append(f"{key}: {error}")
+                    continue
+                if rule is not None:
+                    correlations.append((key, rule, missing))
+                    continue
+                for name, entry in results.items():
+                    if "unsupported" in entry:
+                        skipped[name].append(f"{key}: {entry['unsupported']}")
+                        continue
+                    if "error" in entry:
+                        errors[name].append(f"{key}: {entry['error']}")
+                        continue
+                    caches[name].put(digests[key], entry)
+                    outputs[name][key] = entry
+                    compiled[name] += 1
+
+            for key, rule, missing in correlations:
+                refs = [str(r) for r in (rule.get("correlation") or {}).get("rules") or []]
+                for name in missing:
+                    bases, ref_digests = {}, {}
+                    for base_key, entry in outputs[name].items():
+                        if entry["kind"] == "rule":
+                            for ref in (entry["id"], entry["name"]):
+                                bases[ref] = entry["base"]
+                                ref_digests[ref] = digests[base_key]
+                    deps = [ref_digests.get(ref) for ref in refs]
+                    entry = caches[name].entries.get(digests[key])
+                    if entry is None or entry.get("deps") != deps:
+                        try:
+                            entry = {"kind": "correlation", "id": str(rule.get("id")), "name": rule.get("name"),
+                                     "deps": deps, "query": BACKENDS[name].convert_correlation(rule, bases)}
+                        except UnsupportedRule as e:
+                            skipped[name].append(f"{key}: {e}")
+                            continue
+                        except (ConversionError, ValueError) as e:
+                            errors[name].append(f"{key}: {e}")
+                            continue
+                        caches[name].put(digests[key], entry)
+                        compiled[name] += 1
+                    outputs[name][key] = entry
+
+        order = [key for key, _path, _data in sources]
+        return {
+            "rules": len(order),
+            "seconds": round(time.perf_counter() - started, 4),
+            "backends": {name: {
+                "entries": [dict(outputs[name][key], source=key) for key in order if key in outputs[name]],
+                "errors": errors[name],
+                "skipped": skipped[name],
+                "compiled": compiled[name],
+                "cached": len(outputs[name]) - compiled[name],
+            } for name in names},
+        }
+
+    def convert_corpus(self, backends: Optional[Iterable[str]] = None) -> dict:
+        sources = []
+        for path in list_rule_files(self.rule_dir):
+            with open(path, "rb") as f:
+                sources.append((os.path.relpath(path, self.rule_dir), path, f.read()))
+        result = self.convert(sources, backends)
+        with self._lock:
+            keep = {content_hash(data) for _key, _path, data in sources}
+            for name in result["backends"]:
+                self.caches[name].retain(keep)
+                self.caches[name].save()
+        return result
+
+    def convert_texts(self, texts: Sequence[str], backends: Optional[Iterable[str]] = None) -> dict:
+        """Convert rules posted as YAML text; their output is only cached in memory."""
+        sources = [(f"rule[{i}]", None, text.encode("utf-8")) for i, text in enumerate(texts)]
+        return self.convert(sources, backends, self.text_caches)
+
+
+def combined_text(name: str, entries: List[dict]) -> str:
+    if name == "sigma":
+        return "---\n".join(entry["query"] for entry in entries)
+    return "\n\n".join(entry["query"] for entry in entries) + "\n"
+
+
+def write_outputs(result: dict, out_dir: str = CONVERTED_DIR) -> Dict[str, bool]:
+    os.makedirs(out_dir, exist_ok=True)
+    changed = {}
+    for name, output in result["backends"].items():
+        path = os.path.join(out_dir, f"{name}{BACKENDS[name].OUTPUT_EXT}")
+        changed[name] = splunk.write_if_changed(path, combined_text(name, output["entries"]))
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the Sigma rule tree to several SIEM backends")
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS),
+                        help="Backend to convert to (repeatable, default: all)")
+    parser.add_argument("--rules", default=RULE_DIR)
+    parser.add_argument("--out-dir", default=CONVERTED_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    args = parser.parse_args()
+
+    service = ConversionService(args.rules, args.workers)
+    try:
+        result = service.convert_corpus(args.backend)
+    finally:
+        service.close()
+    changed = write_outputs(result, args.out_dir)
+    failed = False
+    for name, output in result["backends"].items():
+        for error in output["errors"]:
+            print(f"❌ {name}: {error}")
+        for skipped in output["skipped"]:
+            print(f"⏭️ {name}: {skipped}")
+        failed = failed or bool(output["errors"])
+        print(f"✅ {name}: {len(output['entries'])} queries ({output['compiled']} compiled, "
+              f"{output['cached']} cached), {'updated' if changed[name] else 'unchanged'}")
+    print(f"Converted {result['rules']} rules in {result['seconds']:.2f}s")
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# sigma.py - Canonical Sigma YAML (validated, normalized, stable key order)
+import os
+from typing import Dict, Optional
+
+import yaml
+
+from llm_reporting.backends.base import ConversionError, Tree, detection_tree
+
+# Bump whenever the generated YAML changes so cached output is regenerated
+BACKEND_VERSION = "1"
+OUTPUT_EXT = ".yml"
+
+KEY_ORDER = ("title", "id", "name", "status", "description", "references", "author", "date", "modified",
+             "tags", "logsource", "detection", "correlation", "fields", "falsepositives", "level")
+# libyaml-backed dumper when available, pure-Python otherwise
+YamlDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+# Added by normalize_rule for the engine, not part of the rule
+LOCAL_KEYS = ("path",)
+
+
+def canonical_rule(rule: dict) -> dict:
+    out = {}
+    for key in KEY_ORDER:
+        if rule.get(key) not in (None, [], {}):
+            out[key] = rule[key]
+    for key, value in rule.items():
+        if key not in out and key not in LOCAL_KEYS and value not in (None, [], {}):
+            out[key] = value
+    # normalize_rule fills name from the file stem; only correlations need it
+    path = rule.get("path")
+    if path and "correlation" not in rule and out.get("name") == os.path.splitext(os.path.basename(path))[0]:
+        del out["name"]
+    return out
+
+
+def dump(rule: dict) -> str:
+    return yaml.dump(canonical_rule(rule), Dumper=YamlDumper, sort_keys=False, allow_unicode=True,
+                     default_flow_style=False)
+
+
+def base_query(rule: dict, detection: Optional[Tree] = None) -> str:
+    # Correlations are emitted as-is, so nothing needs a rule's base query
+    return ""
+
+
+def convert_rule(rule: dict, detection: Optional[Tree] = None) -> str:
+    if detection is None:
+        # Still validate: a rule that no backend can parse is not emitted as Sigma either
+        detection_tree(rule.get("detection"))
+    return dump(rule)
+
+
+def convert_correlation(rule: dict, bases: Dict[str, str]) -> str:
+    if not (rule.get("correlation") or {}).get("rules"):
+        raise ConversionError("Correlation references no rules")
+    return dump(rule)
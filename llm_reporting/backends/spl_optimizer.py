@@ -0,0 +1,242 @@
+# spl_optimizer.py - Scope and prefilter generated SPL, and estimate what each query costs
+import argparse
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from llm_reporting.backends.base import ConversionError, Tree, load_rule, simplify
+from llm_reporting.backends.splunk import (RULE_DIR, convert_correlation, regex_command, render, search_tree,
+                                           spl_field, write_if_changed)
+from llm_reporting.engine.correlation import CorrelationRule
+from llm_reporting.engine.rules import list_rule_files
+
+OPTIMIZED_SPL_PATH = os.path.join(RULE_DIR, "all_splunk_rules.optimized.spl")
+
+# (index, sourcetype) per logsource; adjust to the local Splunk deployment
+LOGSOURCE_SCOPES = {
+    ("windows", "service", "security"): ("wineventlog", "WinEventLog"),
+    ("windows", "service", "system"): ("wineventlog", "WinEventLog"),
+    ("windows", "service", "application"): ("wineventlog", "WinEventLog"),
+    ("windows", "service", "powershell"): ("wineventlog", "WinEventLog"),
+    ("windows", "service", "powershell-classic"): ("wineventlog", "WinEventLog"),
+    ("windows", "service", "sysmon"): ("sysmon", "XmlWinEventLog"),
+    ("windows", "category", None): ("sysmon", "XmlWinEventLog"),
+    ("email", None, None): ("email", None),
+}
+
+# Splunk segmentation (segmenters.conf defaults, simplified)
+MAJOR_BREAKERS = set(" \t\r\n[]<>(){}|!;,'\"&?+")
+MINOR_BREAKERS = set("/:=@.-$#%\\_")
+MIN_TOKEN = 3
+# Segments present in most events; a lexicon lookup on them filters nothing
+COMMON_TOKENS = {"exe", "dll", "com", "sys", "www", "http", "https", "windows", "system32"}
+# Fields Splunk always indexes; already searched through the lexicon
+DEFAULT_INDEXED = {"index", "source", "sourcetype", "host"}
+# Sourcetypes whose raw events bound field values with major breakers (XML tags,
+# tab/newline separated text), so TERM(value) cannot miss an event
+TERM_SAFE_SOURCETYPES = {"XmlWinEventLog", "WinEventLog"}
+
+# Relative cost units used by the estimate
+SCOPE_COST = {"none": 100, "index": 20, "index+sourcetype": 10}
+LEAF_COST = {"leading_wildcard": 40, "prefiltered": 3, "wildcard": 2, "exact": 1, "keyword": 3, "regex": 25}
+SLOW_COST = 60
+MODERATE_COST = 20
+
+
+def logsource_scope(logsource: dict) -> Tuple[Optional[str], Optional[str]]:
+    product = logsource.get("product")
+    if logsource.get("service"):
+        key = (product, "service", logsource["service"])
+    elif logsource.get("category"):
+        key = (product, "category", None)
+    else:
+        key = (product, None, None)
+    return LOGSOURCE_SCOPES.get(key, (None, None))
+
+
+def lexicon_token(value: str) -> Optional[Tuple[str, bool]]:
+    """Pick an indexed segment of a wildcard value that can drive a lexicon lookup.
+
+    Returns (token, complete) or None. A token qualifies only if its left edge is a
+    real boundary (a breaker or the start of a value without leading '*'); if its
+    right edge is a wildcard it is emitted as a prefix search (`token*`).
+    """
+    candidates = []
+    start = 0
+    text = str(value)
+    for i in range(len(text) + 1):
+        at_end = i == len(text)
+        if at_end or text[i] in MAJOR_BREAKERS or text[i] in MINOR_BREAKERS or text[i] in "*?":
+            token = text[start:i]
+            left_ok = start > 0 and text[start - 1] not in "*?" or start == 0 and not text.startswith(("*", "?"))
+            right_wild = not at_end and text[i] in "*?"
+            if len(token) >= MIN_TOKEN and left_ok and token.isalnum() and token.lower() not in COMMON_TOKENS:
+                candidates.append((token, not right_wild))
+            start = i + 1
+    if not candidates:
+        return None
+    return max(candidates, key=lambda c: (c[1], len(c[0])))
+
+
+def _has_leading_wildcard(value) -> bool:
+    return isinstance(value, str) and value.startswith(("*", "?"))
+
+
+class QueryPlan:
+    def __init__(self, rule: dict):
+        self.rule = rule
+        self.name = rule.get("name") or str(rule.get("id"))
+        self.notes: List[str] = []
+        self.cost = 0
+        self.base = ""
+        self.query = ""
+
+    @property
+    def rating(self) -> str:
+        if self.cost >= SLOW_COST:
+            return "slow"
+        return "moderate" if self.cost >= MODERATE_COST else "fast"
+
+
+class SplOptimizer:
+    def __init__(self, indexed_fields: Iterable[str] = ()):
+        self.indexed_fields = {spl_field(f) for f in indexed_fields}
+
+    def _leaf(self, node: Tree, plan: QueryPlan, negated: bool, term_safe: bool) -> Tree:
+        kind = node[0]
+        if kind == "kw":
+            plan.cost += LEAF_COST["keyword"] * len(node[1])
+            return node
+        if kind == "exists":
+            plan.cost += LEAF_COST["exact"]
+            return node
+        if kind != "cmp":
+            return node
+        field, values = node[1], node[2]
+        exact = all(not isinstance(v, str) or ("*" not in v and "?" not in v) for v in values)
+        if exact and spl_field(field) in self.indexed_fields:
+            plan.cost += LEAF_COST["exact"]
+            plan.notes.append(f"{spl_field(field)} searched as an indexed field")
+            return ("indexed", spl_field(field), tuple(values))
+        if exact:
+            plan.cost += LEAF_COST["exact"] * len(values)
+            if negated or not term_safe or spl_field(field) in DEFAULT_INDEXED:
+                return node
+            terms = [self._exact_term(v) for v in values]
+            if all(terms):
+                return simplify(("and", [simplify(("or", terms)), node]))
+            return node
+        leading = [v for v in values if _has_leading_wildcard(v)]
+        if not leading:
+            plan.cost += LEAF_COST["wildcard"] * len(values)
+            return node
+        tokens = [lexicon_token(v) for v in values]
+        if negated or not all(tokens):
+            plan.cost += LEAF_COST["leading_wildcard"] * len(leading)
+            plan.notes.append(f"{spl_field(field)}: leading wildcard scans raw events "
+                              f"({', '.join(str(v) for v in leading)})")
+            return node
+        plan.cost += LEAF_COST["prefiltered"] * len(values)
+        terms = [("term", token if complete else f"{token}*", False) for token, complete in tokens]
+        plan.notes.append(f"{spl_field(field)}: prefiltered on {', '.join(t[1] for t in terms)}")
+        return ("and", [simplify(("or", terms)), node])
+
+    @staticmethod
+    def _exact_term(value) -> Optional[Tree]:
+        """TERM() for exact values made of minor segments (IPs, paths, domains)."""
+        text = str(value)
+        if any(c in MAJOR_BREAKERS for c in text) or not any(c in MINOR_BREAKERS for c in text):
+            return None
+        if text[0] in MINOR_BREAKERS or text[-1] in MINOR_BREAKERS:
+            return None
+        return ("term", text, True)
+
+    def _walk(self, node: Tree, plan: QueryPlan, negated: bool, term_safe: bool) -> Tree:
+        kind = node[0]
+        if kind in ("and", "or"):
+            return simplify((kind, [self._walk(c, plan, negated, term_safe) for c in node[1]]))
+        if kind == "not":
+            return ("not", self._walk(node[1], plan, not negated, term_safe))
+        return self._leaf(node, plan, negated, term_safe)
+
+    def optimize_rule(self, rule: dict) -> QueryPlan:
+        plan = QueryPlan(rule)
+        tree, regexes = search_tree(rule)
+        index, sourcetype = logsource_scope(rule.get("logsource") or {})
+        scope = []
+        if index:
+            scope.append(("cmp", "index", (index,)))
+        if sourcetype:
+            scope.append(("cmp", "sourcetype", (sourcetype,)))
+        plan.cost += SCOPE_COST["index+sourcetype" if sourcetype else "index" if index else "none"]
+        if not index:
+            plan.notes.append("no index scope for this logsource: searches every index")
+        optimized = self._walk(tree, plan, False, sourcetype in TERM_SAFE_SOURCETYPES)
+        plan.cost += LEAF_COST["regex"] * len(regexes)
+        query = render(simplify(("and", scope + [optimized])))
+        plan.base = " ".join([query] + [regex_command(r) for r in regexes])
+        plan.query = plan.base
+        if rule.get("fields"):
+            plan.query += " | table " + ",".join(spl_field(f) for f in rule["fields"])
+        return plan
+
+
+def optimize_corpus(rule_dir: str = RULE_DIR, indexed_fields: Iterable[str] = ()) -> Tuple[List[QueryPlan], List[str]]:
+    optimizer = SplOptimizer(indexed_fields)
+    plans, errors, correlations = [], [], []
+    bases: Dict[str, QueryPlan] = {}
+    for path in list_rule_files(rule_dir):
+        try:
+            rule = load_rule(path)
+            if "correlation" in rule:
+                correlations.append(rule)
+                continue
+            plan = optimizer.optimize_rule(rule)
+        except (ConversionError, ValueError) as e:
+            errors.append(f"{os.path.relpath(path, rule_dir)}: {e}")
+            continue
+        plans.append(plan)
+        bases[str(rule.get("id"))] = bases[rule.get("name")] = plan
+
+    # Correlations aggregate over the optimized base searches and inherit their cost
+    for rule in correlations:
+        plan = QueryPlan(rule)
+        try:
+            plan.query = convert_correlation(rule, {ref: base.base for ref, base in bases.items()})
+        except (ConversionError, ValueError) as e:
+            errors.append(f"{os.path.relpath(rule['path'], rule_dir)}: {e}")
+            continue
+        refs = {id(bases[ref]): bases[ref] for ref in CorrelationRule(rule).rules if ref in bases}
+        plan.cost = sum(base.cost for base in refs.values())
+        plan.notes.append("aggregates " + ", ".join(base.name for base in refs.values()))
+        plans.append(plan)
+    return plans, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimize generated SPL and report per-query cost")
+    parser.add_argument("--rules", default=RULE_DIR)
+    parser.add_argument("--out", default=OPTIMIZED_SPL_PATH)
+    parser.add_argument("--indexed-field", action="append", default=[],
+                        help="Field extracted at index time (searched with field::value)")
+    parser.add_argument("--max-cost", type=int, default=None,
+                        help="Exit non-zero if any query's estimated cost exceeds this")
+    args = parser.parse_args()
+
+    plans, errors = optimize_corpus(args.rules, args.indexed_field)
+    for error in errors:
+        print(f"❌ {error}")
+    for plan in sorted(plans, key=lambda p: p.cost, reverse=True):
+        icon = {"slow": "🐢", "moderate": "⚠️", "fast": "✅"}[plan.rating]
+        print(f"{icon} {plan.cost:>4}  {plan.rating:<8}  {plan.name}")
+        for note in plan.notes:
+            print(f"          - {note}")
+    changed = write_if_changed(args.out, "\n\n".join(p.query for p in plans) + "\n")
+    print(f"{os.path.basename(args.out)} {'updated' if changed else 'unchanged'}")
+    if args.max_cost is not None and any(p.cost > args.max_cost for p in plans):
+        raise SystemExit(1)
+    if errors:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+# splunk.py - Sigma -> Splunk SPL backend with a per-rule output cache
+import argparse
+import os
+import re
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from llm_reporting.backends.base import ConversionError, Tree, UnsupportedRule, detection_tree, load_rule, simplify
+from llm_reporting.backends.cache import OutputCache, content_hash
+from llm_reporting.engine.correlation import CorrelationError, CorrelationRule
+from llm_reporting.engine.events import SYSMON_CATEGORIES
+from llm_reporting.engine.fieldmap import default_mappings
+from llm_reporting.engine.rules import RULE_DIR, list_rule_files
+
+# Bump whenever the generated SPL changes so cached output is regenerated
+BACKEND_VERSION = "1"
+OUTPUT_EXT = ".spl"
+SPL_PATH = os.path.join(RULE_DIR, "all_splunk_rules.spl")
+
+# Sigma field -> Splunk Windows TA field (the "splunk" profile of data/field_mappings.yml)
+FIELD_MAP = default_mappings().profile("splunk")
+# Cached output is also invalidated by edits to the field mappings
+CACHE_VERSION = f"{BACKEND_VERSION}-{default_mappings().digest[:12]}"
+
+SYSMON_SOURCE = "XmlWinEventLog:Microsoft-Windows-Sysmon/Operational"
+SERVICE_SOURCES = {
+    "security": ("WinEventLog:Security",),
+    "system": ("WinEventLog:System",),
+    "application": ("WinEventLog:Application",),
+    "powershell": ("WinEventLog:Microsoft-Windows-PowerShell/Operational",
+                   "WinEventLog:PowerShellCore/Operational"),
+    "powershell-classic": ("WinEventLog:Windows PowerShell",),
+    "sysmon": (SYSMON_SOURCE,),
+}
+CATEGORY_EVENT_CODES: Dict[str, Tuple[int, ...]] = {}
+for _code, _category in sorted(SYSMON_CATEGORIES.items()):
+    CATEGORY_EVENT_CODES[_category] = CATEGORY_EVENT_CODES.get(_category, ()) + (_code,)
+
+
+def spl_field(field: str) -> str:
+    return FIELD_MAP.get(field, field)
+
+
+# =============================================================================
+# Rendering
+# =============================================================================
+
+def quote(value) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def logsource_tree(logsource: dict) -> List[Tree]:
+    """Index-side constraints implied by a rule's logsource."""
+    terms = []
+    service = logsource.get("service")
+    category = logsource.get("category")
+    if service in SERVICE_SOURCES:
+        terms.append(("cmp", "source", SERVICE_SOURCES[service]))
+    elif category in CATEGORY_EVENT_CODES and logsource.get("product") == "windows":
+        terms.append(("cmp", "source", (SYSMON_SOURCE,)))
+    if category in CATEGORY_EVENT_CODES:
+        terms.append(("cmp", "EventID", CATEGORY_EVENT_CODES[category]))
+    return terms
+
+
+def render(node: Tree, nested: bool = False) -> str:
+    kind = node[0]
+    if kind == "and":
+        text = " ".join(render(child, True) for child in node[1])
+        return f"({text})" if nested else text
+    if kind == "or":
+        text = " OR ".join(render(child, True) for child in node[1])
+        return f"({text})" if nested else text
+    if kind == "not":
+        return f"NOT {render(node[1], True)}"
+    if kind == "cmp":
+        field, values = spl_field(node[1]), node[2]
+        if len(values) == 1:
+            return f"{field}={quote(values[0])}"
+        return f"{field} IN ({', '.join(quote(v) for v in values)})"
+    if kind == "exists":
+        return f"{spl_field(node[1])}=*" if node[2] else f"NOT {spl_field(node[1])}=*"
+    if kind == "kw":
+        text = " OR ".join(quote(v) for v in node[1])
+        return f"({text})" if nested and len(node[1]) > 1 else text
+    if kind == "term":
+        # Lexicon lookups emitted by the optimizer: TERM(x) or a bare (prefix) token
+        return f"TERM({node[1]})" if node[2] else node[1]
+    if kind == "indexed":
+        text = " OR ".join(f"{node[1]}::{v}" for v in node[2])
+        return f"({text})" if nested and len(node[2]) > 1 else text
+    raise ConversionError(f"Cannot render {kind} inside a search expression")
+
+
+def split_regex(tree: Tree) -> Tuple[Optional[Tree], List[Tree]]:
+    """Regexes can only be applied as `| regex` commands, i.e. as top-level conjuncts."""
+    children = tree[1] if tree[0] == "and" else [tree]
+    regexes = [c for c in children if c[0] == "regex"]
+    rest = [c for c in children if c[0] != "regex"]
+    if any(_contains_regex(c) for c in rest):
+        raise ConversionError("Regex under OR/NOT cannot be expressed as an SPL search")
+    if not rest:
+        return None, regexes
+    return simplify(("and", rest)), regexes
+
+
+def _contains_regex(node: Tree) -> bool:
+    if node[0] == "regex":
+        return True
+    if node[0] in ("and", "or"):
+        return any(_contains_regex(c) for c in node[1])
+    if node[0] == "not":
+        return _contains_regex(node[1])
+    return False
+
+
+def _constrains(tree: Optional[Tree], field: str) -> bool:
+    if tree is None:
+        return False
+    children = tree[1] if tree[0] == "and" else [tree]
+    return any(c[0] == "cmp" and c[1] == field for c in children)
+
+
+def search_tree(rule: dict, detection: Optional[Tree] = None) -> Tuple[Tree, List[Tree]]:
+    """The full search expression (logsource scope + detection) and hoisted regexes.
+
+    `detection` is the rule's already-built detection tree, if the caller has one.
+    """
+    if detection is None:
+        detection = detection_tree(rule.get("detection"))
+    tree, regexes = split_regex(detection)
+    scope = [t for t in logsource_tree(rule.get("logsource") or {}) if not _constrains(tree, t[1])]
+    parts = scope + ([tree] if tree is not None else [])
+    if not parts:
+        parts = [("kw", ("*",))]
+    return simplify(("and", parts)), regexes
+
+
+def regex_command(node: Tree) -> str:
+    _, field, pattern, flags = node
+    prefix = f"(?{flags})" if flags else ""
+    return f"| regex {spl_field(field)}={quote(prefix + pattern)}"
+
+
+def base_query(rule: dict, detection: Optional[Tree] = None) -> str:
+    tree, regexes = search_tree(rule, detection)
+    return " ".join([render(tree)] + [regex_command(r) for r in regexes])
+
+
+def convert_rule(rule: dict, detection: Optional[Tree] = None) -> str:
+    query = base_query(rule, detection)
+    if rule.get("fields"):
+        query += " | table " + ",".join(spl_field(f) for f in rule["fields"])
+    return query
+
+
+def convert_correlation(rule: dict, bases: Dict[str, str]) -> str:
+    try:
+        correlation = CorrelationRule(rule)
+    except CorrelationError as e:
+        raise ConversionError(str(e)) from None
+    if correlation.type not in ("event_count", "value_count"):
+        raise UnsupportedRule(f"{correlation.type} correlations have no SPL translation")
+    searches = []
+    for ref in correlation.rules:
+        if ref not in bases:
+            raise ConversionError(f"Correlation references unknown rule '{ref}'")
+        searches.append(bases[ref])
+    search = searches[0] if len(searches) == 1 else " OR ".join(f"({s})" for s in searches)
+    group = ", ".join(spl_field(f) for f in correlation.group_by)
+    by = f" by _time, {group}" if group else " by _time"
+    span = f"{int(correlation.timespan)}s"
+    if correlation.type == "event_count":
+        stats = f"| stats count as event_count{by} | search event_count>={correlation.threshold}"
+    else:
+        field = spl_field(correlation.field)
+        stats = f"| stats dc({field}) as value_count{by} | search value_count>={correlation.threshold}"
+    return f"{search} | bin _time span={span} {stats}"
+
+
+# =============================================================================
+# Parsing generated SPL back (round-trip verification)
+# =============================================================================
+
+_SPL_TOKEN_RE = re.compile(r'\s*("(?:\\.|[^"\\])*"|\(|\)|,|=|[^\s(),="]+)')
+
+
+def _unquote(token: str):
+    if token.startswith('"'):
+        return re.sub(r"\\(.)", r"\1", token[1:-1])
+    return int(token) if token.isdigit() else token
+
+
+class SplParser:
+    """Parser for the search-expression subset this backend emits."""
+
+    def __init__(self, text: str):
+        self.tokens = _SPL_TOKEN_RE.findall(text.strip())
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self, expected=None):
+        token = self.peek()
+        if token is None or (expected is not None and token != expected):
+            raise ConversionError(f"Expected {expected or 'a token'}, got {token!r}")
+        self.pos += 1
+        return token
+
+    def parse(self) -> Tree:
+        node = self.or_expr()
+        if self.peek() is not None:
+            raise ConversionError(f"Trailing token {self.peek()!r}")
+        return node
+
+    def or_expr(self):
+        children = [self.and_expr()]
+        while self.peek() == "OR":
+            self.take()
+            children.append(self.and_expr())
+        return children[0] if len(children) == 1 else ("or", children)
+
+    def and_expr(self):
+        children = [self.unary()]
+        while self.peek() not in (None, ")", "OR"):
+            children.append(self.unary())
+        return children[0] if len(children) == 1 else ("and", children)
+
+    def unary(self):
+        token = self.take()
+        if token == "NOT":
+            return ("not", self.unary())
+        if token == "(":
+            node = self.or_expr()
+            self.take(")")
+            return node
+        if token.startswith('"'):
+            return ("kw", (_unquote(token),))
+        if self.peek() == "=":
+            self.take()
+            value = self.take()
+            if value == "*":
+                return ("exists", token, True)
+            return ("cmp", token, (_unquote(value),))
+        if self.peek() == "IN":
+            self.take()
+            self.take("(")
+            values = [_unquote(self.take())]
+            while self.peek() == ",":
+                self.take()
+                values.append(_unquote(self.take()))
+            self.take(")")
+            return ("cmp", token, tuple(values))
+        raise ConversionError(f"Unexpected token {token!r}")
+
+
+def canonical(node: Tree) -> Tree:
+    """Normal form used to compare trees: mapped fields, flattened, keyword lists split."""
+    kind = node[0]
+    if kind == "cmp":
+        return ("cmp", spl_field(node[1]), tuple(node[2]))
+    if kind == "exists":
+        leaf = ("exists", spl_field(node[1]), True)
+        return leaf if node[2] else ("not", leaf)
+    if kind == "kw":
+        return simplify(("or", [("kw", (v,)) for v in node[1]]))
+    if kind == "not":
+        return ("not", canonical(node[1]))
+    if kind in ("and", "or"):
+        return simplify((kind, [canonical(c) for c in node[1]]))
+    return node
+
+
+def verify_rule(rule: dict, query: str) -> List[str]:
+    """Round-trip: the generated query must parse back to the rule's own tree."""
+    problems = []
+    tree, regexes = search_tree(rule)
+    search = render(tree)
+    if not query.startswith(search):
+        return [f"search expression differs from rule: {query!r}"]
+    try:
+        parsed = SplParser(search).parse()
+    except ConversionError as e:
+        return [f"generated search does not parse: {e}"]
+    if canonical(parsed) != canonical(tree):
+        problems.append("search expression does not round-trip to the rule's detection")
+    rest = query[len(search):]
+    for node in regexes:
+        if regex_command(node) not in rest:
+            problems.append(f"missing regex command for {node[1]}")
+    for term in logsource_tree(rule.get("logsource") or {}):
+        if not _constrains(parsed, spl_field(term[1])):
+            problems.append(f"missing {spl_field(term[1])} constraint from logsource")
+    fields = rule.get("fields")
+    if fields and not rest.endswith(" | table " + ",".join(spl_field(f) for f in fields)):
+        problems.append("table clause does not list the rule's fields")
+    return problems
+
+
+# =============================================================================
+# Corpus build
+# =============================================================================
+
+def _file_entries(rule_dir: str, cache: OutputCache):
+    """Yield (path, content digest, cached entry or None) per rule file."""
+    for path in list_rule_files(rule_dir):
+        with open(path, "rb") as f:
+            digest = content_hash(f.read())
+        yield path, digest, cache.get(digest)
+
+
+def build_queries(rule_dir: str = RULE_DIR, cache: Optional[OutputCache] = None) -> Tuple[List[dict], List[str]]:
+    """Compile every rule, reusing cached SPL for files whose content is unchanged.
+
+    Returns (entries in file order, error messages). Correlations are compiled after
+    base rules and are cached together with the hashes of the rules they reference.
+    """
+    cache = cache or OutputCache("splunk", CACHE_VERSION)
+    entries: Dict[str, dict] = {}
+    pending = []
+    errors = []
+    order = []
+    for path, digest, entry in _file_entries(rule_dir, cache):
+        order.append(path)
+        if entry is not None and entry["kind"] == "rule":
+            entries[path] = dict(entry, digest=digest, path=path)
+            continue
+        try:
+            rule = load_rule(path)
+            if "correlation" in rule:
+                pending.append((path, digest, entry, rule))
+                continue
+            entry = {"kind": "rule", "id": str(rule.get("id")), "name": rule.get("name"),
+                     "base": base_query(rule), "query": convert_rule(rule)}
+        except (ConversionError, ValueError) as e:
+            errors.append(f"{os.path.relpath(path, rule_dir)}: {e}")
+            continue
+        cache.put(digest, entry)
+        entries[path] = dict(entry, digest=digest, path=path)
+
+    bases, ref_digests = {}, {}
+    for entry in entries.values():
+        for ref in (entry["id"], entry["name"]):
+            bases[ref] = entry["base"]
+            ref_digests[ref] = entry["digest"]
+
+    for path, digest, entry, rule in pending:
+        refs = [str(r) for r in (rule.get("correlation") or {}).get("rules") or []]
+        deps = [ref_digests.get(ref) for ref in refs]
+        if entry is None or entry.get("deps") != deps:
+            try:
+                entry = {"kind": "correlation", "id": str(rule.get("id")), "name": rule.get("name"),
+                         "deps": deps, "query": convert_correlation(rule, bases)}
+            except (ConversionError, ValueError) as e:
+                errors.append(f"{os.path.relpath(path, rule_dir)}: {e}")
+                continue
+            cache.put(digest, entry)
+        entries[path] = dict(entry, digest=digest, path=path)
+
+    cache.retain(e["digest"] for e in entries.values())
+    cache.save()
+    return [entries[path] for path in order if path in entries], errors
+
+
+def write_if_changed(path: str, text: str) -> bool:
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == text:
+                return False
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+    return True
+
+
+def combined_text(entries: List[dict]) -> str:
+    return "\n\n".join(entry["query"] for entry in entries) + "\n"
+
+
+def check_corpus(rule_dir: str = RULE_DIR, spl_path: str = SPL_PATH) -> List[str]:
+    """Verify every YAML rule against its generated query and the committed .spl file."""
+    entries, problems = build_queries(rule_dir)
+    for entry in entries:
+        if entry["kind"] != "rule":
+            continue
+        path = entry["path"]
+        rule = load_rule(path)
+        for problem in verify_rule(rule, entry["query"]):
+            problems.append(f"{os.path.relpath(path, rule_dir)}: {problem}")
+    if os.path.exists(spl_path):
+        with open(spl_path, "r", encoding="utf-8") as f:
+            if f.read() != combined_text(entries):
+                problems.append(f"{os.path.basename(spl_path)} is out of date, run the build command")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the Sigma rule tree to Splunk SPL")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help=f"Regenerate {os.path.basename(SPL_PATH)}")
+    build.add_argument("--rules", default=RULE_DIR)
+    build.add_argument("--out", default=SPL_PATH)
+    check = sub.add_parser("check", help="Round-trip verify every rule against its generated query")
+    check.add_argument("--rules", default=RULE_DIR)
+    check.add_argument("--spl", default=SPL_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        cache = OutputCache("splunk", CACHE_VERSION)
+        entries, errors = build_queries(args.rules, cache)
+        for error in errors:
+            print(f"❌ {error}")
+        changed = write_if_changed(args.out, combined_text(entries))
+        print(f"✅ {len(entries)} queries ({cache.misses} compiled, {cache.hits} cached), "
+              f"{os.path.basename(args.out)} {'updated' if changed else 'unchanged'}")
+        raise SystemExit(1 if errors else 0)
+
+    problems = check_corpus(args.rules, args.spl)
+    for problem in problems:
+        print(f"❌ {problem}")
+    if problems:
+        raise SystemExit(1)
+    print("✅ Every rule round-trips through its generated SPL")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 # evaluator.py (complete version)
 import json, os
 from ollama import chat  # Replace with appropriate Ollama client if needed
+from llm_reporting.core.search import index_path
 from llm_reporting.core.utils import ensure_dir
 
 RULES_PATH = os.path.join("llm_reporting", "detection_rules", "json")
@@ -45,5 +46,6 @@ def evaluate_rule_by_id(rule_id: str) -> dict:
     output_path = os.path.join(EVAL_PATH, f"{rule_id}.json")
     with open(output_path, "w") as f:
         json.dump(result, f, indent=2)
+    index_path(output_path)
 
     return result
\ No newline at end of file
@@ -0,0 +1,320 @@
+# search.py - Full-text search over rule evaluations and markdown reports
+#
+# An in-memory inverted index {term: {document: [positions]}} ranked with BM25.
+# Documents are (re)indexed one file at a time: refresh() stats the two report
+# directories and only re-reads files whose (mtime, size) changed, and writers
+# call index_path() right after saving so the index never waits for a scan.
+# Positions make quoted phrases ("lateral movement") and dotted ids (T1021.001)
+# exact, and give the snippet window without re-tokenizing the document.
+import json
+import math
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from llm_reporting.engine.rules import BASE_DIR
+
+EVAL_DIR = os.path.join(BASE_DIR, "reports", "evaluations")
+REPORTS_DIR = os.path.join(os.path.dirname(BASE_DIR), "reports")
+# Document kind -> file extension indexed in its source directory
+EXTENSIONS = {"evaluation": ".json", "report": ".md"}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+", re.ASCII | re.IGNORECASE)
+PHRASE_RE = re.compile(r'"([^"]*)"|(\S+)')
+WHITESPACE_RE = re.compile(r"\s")
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+SNIPPET_TOKENS = 30
+
+# (start, end) character offsets
+Span = Tuple[int, int]
+
+
+def tokenize(text: str) -> List[Tuple[str, int, int]]:
+    """Lower-cased alphanumeric tokens with their (start, end) offsets in text."""
+    return [(m.group().lower(), m.start(), m.end()) for m in TOKEN_RE.finditer(text)]
+
+
+def parse_query(query: str) -> List[Tuple[str, ...]]:
+    """Split a query into terms: quoted text and words like 'T1021.001' become phrases."""
+    out = []
+    for m in PHRASE_RE.finditer(query):
+        text = m.group(1) if m.group(1) is not None else m.group(2)
+        tokens = tuple(token.lower() for token in TOKEN_RE.findall(text))
+        if tokens and tokens not in out:
+            out.append(tokens)
+    return out
+
+
+def _evaluation_text(data) -> Tuple[str, str]:
+    """(title, text) of an evaluation JSON document."""
+    if not isinstance(data, dict):
+        return "", json.dumps(data)
+    parts = []
+    for key, value in data.items():
+        if isinstance(value, str):
+            parts.append(value)
+        elif value is not None:
+            parts.append(json.dumps(value))
+    return str(data.get("rule_id") or ""), "\n\n".join(parts)
+
+
+def _markdown_title(text: str) -> str:
+    for line in text.splitlines():
+        if line.startswith("#"):
+            return line.lstrip("#").strip()
+    return ""
+
+
+class _Document:
+    __slots__ = ("key", "kind", "title", "text", "spans", "terms", "length")
+
+    def __init__(self, key: str, kind: str, title: str, text: str):
+        self.key = key
+        self.kind = kind
+        self.title = title or key
+        self.text = text
+        self.spans: List[Span] = []
+        self.terms: Tuple[str, ...] = ()
+        self.length = 0
+
+
+class SearchIndex:
+    """Ranked full-text search with snippets, updated document by document.
+
+    sources maps a document kind (see EXTENSIONS) to the directory its files live in.
+    """
+
+    def __init__(self, sources: Optional[Dict[str, str]] = None):
+        self.sources = {"evaluation": EVAL_DIR, "report": REPORTS_DIR} if sources is None else sources
+        self.version = 0
+        self._docs: Dict[str, _Document] = {}
+        self._postings: Dict[str, Dict[str, List[int]]] = {}
+        self._total_length = 0
+        self._signatures: Dict[str, Tuple[int, int]] = {}
+        self._errors: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self.refresh()
+
+    def __len__(self):
+        return len(self._docs)
+
+    # -------------------------------------------------------------------------
+    # Updates
+    # -------------------------------------------------------------------------
+
+    def add_document(self, key: str, kind: str, text: str, title: str = ""):
+        """Index (or re-index) one document under key."""
+        with self._lock:
+            self.remove_document(key)
+            doc = _Document(key, kind, title, text)
+            positions: Dict[str, List[int]] = {}
+            for i, (token, start, end) in enumerate(tokenize(text)):
+                doc.spans.append((start, end))
+                positions.setdefault(token, []).append(i)
+            doc.length = len(doc.spans)
+            doc.terms = tuple(positions)
+            for token, offsets in positions.items():
+                self._postings.setdefault(token, {})[key] = offsets
+            self._docs[key] = doc
+            self._total_length += doc.length
+
+    def remove_document(self, key: str):
+        with self._lock:
+            doc = self._docs.pop(key, None)
+            if doc is None:
+                return
+            self._total_length -= doc.length
+            for token in doc.terms:
+                docs = self._postings[token]
+                docs.pop(key, None)
+                if not docs:
+                    del self._postings[token]
+
+    def _kind_of(self, path: str) -> Optional[str]:
+        directory = os.path.dirname(os.path.abspath(path))
+        ext = os.path.splitext(path)[1].lower()
+        for kind, source in self.sources.items():
+            if os.path.abspath(source) == directory and ext == EXTENSIONS.get(kind):
+                return kind
+        return None
+
+    def index_path(self, path: str) -> bool:
+        """Re-index one file of a source directory if it changed; removes it if it is gone."""
+        kind = self._kind_of(path)
+        if kind is None:
+            return False
+        path = os.path.abspath(path)
+        with self._lock:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                removed = self._signatures.pop(path, None) is not None
+                self._errors.pop(path, None)
+                self.remove_document(path)
+                if removed:
+                    self.version += 1
+                return removed
+            signature = (st.st_mtime_ns, st.st_size)
+            if self._signatures.get(path) == signature:
+                return False
+            self._signatures[path] = signature
+            self.version += 1
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    raw = f.read()
+                if kind == "evaluation":
+                    title, text = _evaluation_text(json.loads(raw))
+                else:
+                    title, text = _markdown_title(raw), raw
+            except (OSError, ValueError) as e:
+                # Keep the last good version of a file that no longer reads
+                self._errors[path] = str(e)
+                return True
+            self._errors.pop(path, None)
+            self.add_document(path, kind, text, title or os.path.splitext(os.path.basename(path))[0])
+            return True
+
+    def refresh(self) -> bool:
+        """Re-index files whose (mtime, size) changed; returns True if anything did."""
+        with self._lock:
+            changed = False
+            seen = set()
+            for kind, directory in self.sources.items():
+                try:
+                    names = os.listdir(directory)
+                except FileNotFoundError:
+                    continue
+                for name in sorted(names):
+                    path = os.path.abspath(os.path.join(directory, name))
+                    if self._kind_of(path) != kind:
+                        continue
+                    seen.add(path)
+                    changed = self.index_path(path) or changed
+            for path in [p for p in self._signatures if p not in seen]:
+                changed = self.index_path(path) or changed
+            return changed
+
+    # -------------------------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------------------------
+
+    def _phrase_positions(self, phrase: Tuple[str, ...]) -> Dict[str, List[int]]:
+        """{document: start positions} of a phrase (a single term is a one-token phrase)."""
+        postings = [self._postings.get(token) for token in phrase]
+        if not all(postings):
+            return {}
+        if len(phrase) == 1:
+            return postings[0]
+        out = {}
+        rarest = min(range(len(phrase)), key=lambda i: len(postings[i]))
+        for key in postings[rarest]:
+            if not all(key in docs for docs in postings):
+                continue
+            later = [set(docs[key]) for docs in postings[1:]]
+            starts = [p for p in postings[0][key] if all(p + i + 1 in positions for i, positions in enumerate(later))]
+            if starts:
+                out[key] = starts
+        return out
+
+    def _snippet(self, doc: _Document, hits: List[Tuple[int, int]]) -> Tuple[str, List[Span]]:
+        """The SNIPPET_TOKENS window with the most distinct hits, and hit spans within it."""
+        if not doc.spans:
+            return "", []
+        hits = sorted(hits)
+        best, best_score, lo = 0, -1, 0
+        for hi in range(len(hits)):
+            while hits[hi][0] + hits[hi][1] - hits[lo][0] > SNIPPET_TOKENS:
+                lo += 1
+            score = len({hits[i][0] for i in range(lo, hi + 1)})
+            if score > best_score:
+                best, best_score = hits[lo][0], score
+        first = max(0, min(best - 5, doc.length - SNIPPET_TOKENS))
+        last = min(doc.length, first + SNIPPET_TOKENS) - 1
+        start, end = doc.spans[first][0], doc.spans[last][1]
+        # Same length as the source text, so token offsets carry over
+        snippet = WHITESPACE_RE.sub(" ", doc.text[start:end])
+        lead = "… " if first else ""
+        spans = [(len(lead) + doc.spans[p][0] - start, len(lead) + doc.spans[p + n - 1][1] - start)
+                 for p, n in hits if first <= p and p + n - 1 <= last]
+        return lead + snippet + (" …" if last < doc.length - 1 else ""), sorted(set(spans))
+
+    def search(self, query: str, k: int = 10, kind: Optional[str] = None) -> List[dict]:
+        """BM25-ranked documents matching any query term; phrases must match exactly."""
+        phrases = parse_query(query)
+        if not phrases:
+            return []
+        with self._lock:
+            n = len(self._docs)
+            if not n:
+                return []
+            avgdl = self._total_length / n
+            scores: Dict[str, float] = {}
+            hits: Dict[str, List[Tuple[int, int]]] = {}
+            for phrase in phrases:
+                matches = self._phrase_positions(phrase)
+                if not matches:
+                    continue
+                idf = math.log(1 + (n - len(matches) + 0.5) / (len(matches) + 0.5))
+                for key, starts in matches.items():
+                    doc = self._docs[key]
+                    if kind is not None and doc.kind != kind:
+                        continue
+                    tf = len(starts)
+                    norm = K1 * (1 - B + B * doc.length / avgdl)
+                    # Phrases weigh as much as their terms together
+                    scores[key] = scores.get(key, 0.0) + len(phrase) * idf * tf * (K1 + 1) / (tf + norm)
+                    hits.setdefault(key, []).extend((p, len(phrase)) for p in starts)
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+            results = []
+            for key, score in ranked:
+                doc = self._docs[key]
+                snippet, spans = self._snippet(doc, hits[key])
+                results.append({
+                    "kind": doc.kind,
+                    "id": os.path.splitext(os.path.basename(key))[0],
+                    "file": os.path.basename(key),
+                    "title": doc.title,
+                    "score": round(score, 4),
+                    "snippet": snippet,
+                    "highlights": spans,
+                })
+            return results
+
+    def summary(self) -> dict:
+        return {"version": self.version, "documents": len(self._docs), "terms": len(self._postings),
+                "errors": dict(self._errors)}
+
+
+def highlight(snippet: str, spans: Iterable[Span], before: str = "**", after: str = "**") -> str:
+    """Wrap the highlighted spans of a snippet in markers (markdown bold by default)."""
+    out, pos = [], 0
+    for start, end in sorted(spans):
+        out.append(snippet[pos:start])
+        out.append(before + snippet[start:end] + after)
+        pos = end
+    out.append(snippet[pos:])
+    return "".join(out)
+
+
+_default: Optional[SearchIndex] = None
+_default_lock = threading.Lock()
+
+
+def default_index() -> SearchIndex:
+    """The index over EVAL_DIR and REPORTS_DIR, built once per process."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = SearchIndex()
+        return _default
+
+
+def index_path(path: str):
+    """Update-on-write hook: re-index a saved file if this process has an index."""
+    if _default is not None:
+        _default.index_path(path)
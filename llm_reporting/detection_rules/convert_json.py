@@ -1,22 +1,135 @@
-import yaml, json, glob, os
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 
-# Make output folder
-os.makedirs("converted_json", exist_ok=True)
+import yaml
 
-# Find all .yml files recursively
-yml_files = glob.glob("**/*.yml", recursive=True)
+# Everything is resolved against the rule tree, not the current working directory
+RULE_DIR = os.path.dirname(os.path.abspath(__file__))
+# The evaluator (llm_reporting/core/evaluator.py) reads rules from here
+JSON_DIR = os.path.join(RULE_DIR, "json")
+MANIFEST_PATH = os.path.join(JSON_DIR, ".manifest.json")
+
+# libyaml-backed loader when available, pure-Python otherwise
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Below this many changed files the process pool costs more than it saves
+PARALLEL_THRESHOLD = 32
+
+
+def find_yaml_files(rule_dir=RULE_DIR):
+    paths = []
+    for root, dirs, files in os.walk(rule_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(".") and os.path.join(root, d) != JSON_DIR]
+        for name in files:
+            if name.endswith((".yml", ".yaml")):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
 
-for yml_file in yml_files:
-    try:
-        with open(yml_file, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
 
-        # Create matching .json file path
-        json_filename = os.path.join("converted_json", os.path.basename(yml_file).replace(".yml", ".json"))
+def json_name(yml_path):
+    return os.path.splitext(os.path.basename(yml_path))[0] + ".json"
 
-        with open(json_filename, "w", encoding="utf-8") as jf:
-            json.dump(data, jf, indent=2)
 
-        print(f"✅ Converted: {yml_file} → {json_filename}")
+def write_atomic(path, text):
+    """Write via a temp file in the same directory and rename over the target."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def convert_file(yml_path, out_dir=JSON_DIR):
+    """Worker: parse one YAML rule and atomically write its JSON twin."""
+    try:
+        with open(yml_path, "r", encoding="utf-8") as f:
+            data = yaml.load(f, Loader=YamlLoader)
+        out_path = os.path.join(out_dir, json_name(yml_path))
+        write_atomic(out_path, json.dumps(data, indent=2))
+        return yml_path, None
     except Exception as e:
-        print(f"❌ Error in {yml_file}: {e}")
+        return yml_path, str(e)
+
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def convert_all(rule_dir=RULE_DIR, out_dir=JSON_DIR, force=False, workers=None):
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, ".manifest.json")
+    manifest = {} if force else load_manifest(manifest_path)
+
+    current = {}
+    todo = []
+    owners = {}
+    for yml_file in find_yaml_files(rule_dir):
+        rel = os.path.relpath(yml_file, rule_dir)
+        name = json_name(yml_file)
+        if name in owners:
+            print(f"❌ Skipping {rel}: {name} is already produced by {owners[name]}")
+            continue
+        owners[name] = rel
+        digest = file_digest(yml_file)
+        current[rel] = digest
+        up_to_date = manifest.get(rel) == digest and os.path.exists(os.path.join(out_dir, name))
+        if not up_to_date:
+            todo.append(yml_file)
+
+    if len(todo) >= PARALLEL_THRESHOLD:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(convert_file, todo, [out_dir] * len(todo), chunksize=16))
+    else:
+        results = [convert_file(path, out_dir) for path in todo]
+
+    failed = 0
+    for yml_file, error in results:
+        rel = os.path.relpath(yml_file, rule_dir)
+        if error:
+            failed += 1
+            current.pop(rel, None)  # retry next run
+            print(f"❌ Error in {rel}: {error}")
+        else:
+            print(f"✅ Converted: {rel} → {os.path.relpath(os.path.join(out_dir, json_name(yml_file)), rule_dir)}")
+
+    # Drop JSON whose YAML source was deleted (only files this tool produced)
+    for rel in set(manifest) - set(current):
+        if os.path.exists(os.path.join(rule_dir, rel)):
+            continue
+        stale = os.path.join(out_dir, json_name(rel))
+        if os.path.exists(stale):
+            os.remove(stale)
+            print(f"🗑️ Removed: {os.path.relpath(stale, rule_dir)}")
+
+    write_atomic(manifest_path, json.dumps(current, indent=2, sort_keys=True))
+    skipped = len(current) - (len(todo) - failed)
+    print(f"Done: {len(todo) - failed} converted, {skipped} unchanged, {failed} failed")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert Sigma YAML rules to the JSON the evaluator reads")
+    parser.add_argument("--force", action="store_true", help="Ignore the manifest and convert everything")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    args = parser.parse_args()
+    raise SystemExit(1 if convert_all(force=args.force, workers=args.workers) else 0)
+
+
+if __name__ == "__main__":
+    main()
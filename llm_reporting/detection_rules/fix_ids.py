@@ -1,32 +1,123 @@
-import glob
-import uuid
+import argparse
+import os
 import re
-import yaml
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from llm_reporting.detection_rules.convert_json import PARALLEL_THRESHOLD, RULE_DIR, find_yaml_files, write_atomic
+
+# Top-level `id:` line; rules are edited in place on this line only. As in YAML,
+# `#` starts a comment only after whitespace, so `id: <uuid>#x` has the id `<uuid>#x`
+ID_LINE_RE = re.compile(
+    r"^id:(?P<value>[ \t]+(?:'[^'\r\n]*'|\"[^\"\r\n]*\"|[^ \t\r\n#'\"][^\r\n]*?))?"
+    r"(?P<comment>[ \t]+#[^\r\n]*)?[ \t]*(?P<eol>\r?)$",
+    re.MULTILINE,
+)
+TITLE_LINE_RE = re.compile(r"^title:[^\r\n]*(?:\r?\n|\Z)", re.MULTILINE)
+
 
 def is_valid_uuid(val):
     try:
         uuid.UUID(str(val))
         return True
-    except:
+    except (ValueError, TypeError, AttributeError):
         return False
 
-files = glob.glob("**/*.yml", recursive=True)
 
-for file in files:
-    with open(file, "r", encoding="utf-8") as f:
-        content = yaml.safe_load(f)
+def is_canonical_uuid(val):
+    return is_valid_uuid(val) and str(uuid.UUID(str(val))) == str(val)
+
+
+def read_id(path):
+    """Worker: return (path, raw id or None) without a full YAML parse."""
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    m = ID_LINE_RE.search(content)
+    if not m or not m.group("value"):
+        return path, None
+    value = m.group("value").strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        value = value[1:-1]
+    return path, value or None
+
+
+def build_index(paths, workers=None):
+    if len(paths) >= PARALLEL_THRESHOLD:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return dict(pool.map(read_id, paths, chunksize=64))
+    return dict(read_id(path) for path in paths)
 
-    modified = False
-    rule_id = content.get("id")
 
-    if not rule_id or not is_valid_uuid(rule_id):
-        new_id = str(uuid.uuid4())
-        content["id"] = new_id
-        modified = True
-        print(f"✅ Added UUID {new_id} to {file}")
+def find_problems(ids):
+    """Classify every file: missing id, malformed id, or duplicate of an earlier file."""
+    problems = {}
+    owners = {}
+    for path in sorted(ids):
+        rule_id = ids[path]
+        if rule_id is None:
+            problems[path] = "missing"
+            continue
+        if not is_valid_uuid(rule_id):
+            problems[path] = "malformed"
+            continue
+        key = str(uuid.UUID(rule_id))
+        if key in owners:
+            problems[path] = f"duplicate of {os.path.relpath(owners[key], RULE_DIR)}"
+        else:
+            owners[key] = path
+            if not is_canonical_uuid(rule_id):
+                problems[path] = "non-canonical"
+    return problems
+
+
+def set_id(path, new_id):
+    """Rewrite just the id line (or insert one after the title), leaving the rest untouched."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        content = f.read()
+    newline = "\r\n" if "\r\n" in content else "\n"
+    m = ID_LINE_RE.search(content)
+    if m:
+        comment = m.group("comment")
+        line = f"id: {new_id}" + (f" {comment.strip()}" if comment else "") + m.group("eol")
+        content = content[:m.start()] + line + content[m.end():]
     else:
-        print(f"✔️ Valid UUID exists in {file}")
+        title = TITLE_LINE_RE.search(content)
+        at = title.end() if title else 0
+        prefix = newline if at and not content[:at].endswith("\n") else ""
+        content = content[:at] + f"{prefix}id: {new_id}{newline}" + content[at:]
+    write_atomic(path, content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check (and optionally repair) rule ids across the corpus")
+    parser.add_argument("--fix", action="store_true", help="Assign fresh UUIDs where needed")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    files = find_yaml_files(RULE_DIR)
+    ids = build_index(files, args.workers)
+    problems = find_problems(ids)
+
+    for path in files:
+        rel = os.path.relpath(path, RULE_DIR)
+        problem = problems.get(path)
+        if not problem:
+            continue
+        if not args.fix:
+            print(f"❌ {rel}: {problem} id {ids[path]!r}")
+            continue
+        if problem == "non-canonical":
+            new_id = str(uuid.UUID(ids[path]))
+        else:
+            new_id = str(uuid.uuid4())
+        set_id(path, new_id)
+        print(f"✅ {rel}: {problem} id {ids[path]!r} → {new_id}")
+
+    print(f"Checked {len(files)} rules: {len(files) - len(problems)} ok, {len(problems)} "
+          f"{'repaired' if args.fix else 'with problems'}")
+    if problems and not args.fix:
+        raise SystemExit(1)
+
 
-    if modified:
-        with open(file, "w", encoding="utf-8") as f:
-            yaml.dump(content, f, sort_keys=False)
+if __name__ == "__main__":
+    main()
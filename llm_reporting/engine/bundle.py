@@ -0,0 +1,173 @@
+# bundle.py - Precompiled rule-pack bundle: normalized rules, compiled plans and indexes
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+from llm_reporting.engine.engine import STATS_PATH, DetectionEngine, compile_rules
+from llm_reporting.engine.correlation import compile_correlations
+from llm_reporting.engine.rules import RULE_DIR, list_rule_files, load_rules
+
+BUNDLE_PATH = os.path.join(RULE_DIR, "rules.bundle")
+MAGIC = b"LDRB"
+FORMAT_VERSION = 1
+# magic, format version, header length
+_PREAMBLE = struct.Struct("<4sHI")
+
+ENGINE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class BundleError(Exception):
+    pass
+
+
+def source_digest(rule_dir: str = RULE_DIR) -> str:
+    """Hash of every rule file's relative path and content."""
+    digest = hashlib.sha256()
+    for path in list_rule_files(rule_dir):
+        digest.update(os.path.relpath(path, rule_dir).encode())
+        with open(path, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def code_digest() -> str:
+    """Hash of the engine sources, so bundles pickled by older code are rebuilt."""
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(ENGINE_DIR)):
+        if name.endswith(".py"):
+            with open(os.path.join(ENGINE_DIR, name), "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+class Bundle:
+    def __init__(self, header: dict, rules: List[dict], engine: DetectionEngine):
+        self.header = header
+        self.rules = rules
+        self.engine = engine
+
+    @property
+    def version(self) -> str:
+        return self.header["source_digest"][:12]
+
+
+def build_bundle(rule_dir: str = RULE_DIR, out_path: str = BUNDLE_PATH,
+                 stats_path: Optional[str] = STATS_PATH) -> Bundle:
+    rules = load_rules(rule_dir)
+    engine = DetectionEngine(compile_rules(rules), compile_correlations(rules))
+    if stats_path:
+        engine.load_stats(stats_path)
+    header = {
+        "format": FORMAT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": "%d.%d" % sys.version_info[:2],
+        "source_digest": source_digest(rule_dir),
+        "code_digest": code_digest(),
+        "rules": len(engine.rules),
+        "correlations": len(engine.correlations),
+    }
+    payload = pickle.dumps({"rules": rules, "engine": engine}, protocol=pickle.HIGHEST_PROTOCOL)
+    header_bytes = json.dumps(header).encode()
+
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    os.makedirs(out_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, prefix=".bundle-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            f.write(payload)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return Bundle(header, rules, engine)
+
+
+def _parse(buf) -> Bundle:
+    magic, version, header_len = _PREAMBLE.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise BundleError("Not a rule bundle")
+    if version != FORMAT_VERSION:
+        raise BundleError(f"Unsupported bundle format {version}, expected {FORMAT_VERSION}")
+    start = _PREAMBLE.size
+    header = json.loads(bytes(buf[start:start + header_len]))
+    data = pickle.loads(buf[start + header_len:])
+    return Bundle(header, data["rules"], data["engine"])
+
+
+def read_header(path: str = BUNDLE_PATH) -> dict:
+    with open(path, "rb") as f:
+        magic, version, header_len = _PREAMBLE.unpack(f.read(_PREAMBLE.size))
+        if magic != MAGIC:
+            raise BundleError("Not a rule bundle")
+        return json.loads(f.read(header_len))
+
+
+def load_bundle(path: str = BUNDLE_PATH) -> Bundle:
+    """Map the bundle file and unpickle it in one pass (no YAML parsing)."""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                return _parse(view)
+            finally:
+                view.release()
+
+
+def is_current(path: str = BUNDLE_PATH, rule_dir: str = RULE_DIR) -> bool:
+    if not os.path.exists(path):
+        return False
+    try:
+        header = read_header(path)
+    except (BundleError, ValueError, struct.error):
+        return False
+    return (header.get("format") == FORMAT_VERSION
+            and header.get("code_digest") == code_digest()
+            and header.get("source_digest") == source_digest(rule_dir))
+
+
+def load_or_build(rule_dir: str = RULE_DIR, path: str = BUNDLE_PATH, verify: bool = True) -> Bundle:
+    """Load the bundle, rebuilding it first if missing or (when verify) out of date."""
+    if os.path.exists(path) and (not verify or is_current(path, rule_dir)):
+        return load_bundle(path)
+    return build_bundle(rule_dir, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect the precompiled rule bundle")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Compile the rule tree into a bundle")
+    build.add_argument("--rules", default=RULE_DIR)
+    build.add_argument("--out", default=BUNDLE_PATH)
+    build.add_argument("--stats", default=STATS_PATH, help="Plan statistics to bake in")
+    info = sub.add_parser("info", help="Show a bundle header and check it against the rule tree")
+    info.add_argument("--rules", default=RULE_DIR)
+    info.add_argument("--bundle", default=BUNDLE_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        bundle = build_bundle(args.rules, args.out, args.stats)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"✅ Built {args.out} ({bundle.header['rules']} rules, "
+              f"{bundle.header['correlations']} correlations) in {elapsed:.0f} ms")
+    else:
+        start = time.perf_counter()
+        bundle = load_bundle(args.bundle)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(json.dumps(bundle.header, indent=2))
+        state = "current" if is_current(args.bundle, args.rules) else "stale"
+        print(f"Loaded in {elapsed:.1f} ms, bundle is {state}")
+
+
+if __name__ == "__main__":
+    main()
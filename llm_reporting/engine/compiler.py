@@ -0,0 +1,732 @@
+# compiler.py - Compile Sigma detection blocks and conditions into evaluation plans
+import fnmatch
+import re
+from time import perf_counter_ns
+from typing import Any, Dict, List, Optional
+
+from llm_reporting.engine.regex import compile_pattern
+
+# Minimum profiled evaluations before measured numbers replace the static priors
+MIN_SAMPLES = 50
+# Reject (rather than just log) regexes flagged for catastrophic backtracking
+REGEX_STRICT = False
+
+
+class RuleCompileError(ValueError):
+    pass
+
+
+# =============================================================================
+# Field tests (leaves of a plan)
+# =============================================================================
+
+def _text(value: Any) -> str:
+    return value.lower() if isinstance(value, str) else str(value).lower()
+
+
+class FieldTest:
+    """Base class for a single field comparison. Values are pre-lowered at compile time."""
+
+    __slots__ = ("field", "values")
+    op = "eq"
+    base_cost = 1.0
+    prior = 0.2
+
+    def __init__(self, field: str, values: tuple):
+        self.field = field
+        self.values = values
+
+    @property
+    def cost(self) -> float:
+        return self.base_cost + 0.1 * len(self.values)
+
+    def describe(self) -> str:
+        return f"{self.field}|{self.op}:{list(self.values)}"
+
+    def match(self, event: dict) -> bool:
+        value = event.get(self.field)
+        return value is not None and self.test(_text(value))
+
+    def test(self, text: str) -> bool:
+        raise NotImplementedError
+
+
+class EqualsTest(FieldTest):
+    __slots__ = ("lookup",)
+
+    def __init__(self, field, values):
+        super().__init__(field, values)
+        self.lookup = frozenset(values)
+
+    @property
+    def cost(self) -> float:
+        return self.base_cost
+
+    def test(self, text):
+        return text in self.lookup
+
+
+class StartsWithTest(FieldTest):
+    __slots__ = ()
+    op = "startswith"
+    base_cost = 1.5
+    prior = 0.25
+
+    def test(self, text):
+        return text.startswith(self.values)
+
+
+class EndsWithTest(FieldTest):
+    __slots__ = ()
+    op = "endswith"
+    base_cost = 1.5
+    prior = 0.25
+
+    def test(self, text):
+        return text.endswith(self.values)
+
+
+class ContainsTest(FieldTest):
+    __slots__ = ()
+    op = "contains"
+    base_cost = 2.0
+    prior = 0.3
+
+    @property
+    def cost(self) -> float:
+        return self.base_cost + 0.5 * len(self.values)
+
+    def test(self, text):
+        for value in self.values:
+            if value in text:
+                return True
+        return False
+
+
+class ContainsAllTest(ContainsTest):
+    __slots__ = ()
+    op = "contains|all"
+    prior = 0.1
+
+    def test(self, text):
+        for value in self.values:
+            if value not in text:
+                return False
+        return True
+
+
+class WildcardTest(FieldTest):
+    """Sigma '*'/'?' wildcards that are not a plain prefix/suffix/substring."""
+
+    __slots__ = ("pattern",)
+    op = "wildcard"
+    base_cost = 6.0
+
+    def __init__(self, field, values):
+        super().__init__(field, values)
+        self.pattern = re.compile("|".join(fnmatch.translate(v) for v in values), re.DOTALL)
+
+    def test(self, text):
+        return self.pattern.match(text) is not None
+
+
+class RegexTest(FieldTest):
+    """Sigma `|re`: patterns are matched against the original (non-lowered) value."""
+
+    __slots__ = ("patterns",)
+    op = "re"
+    prior = 0.1
+
+    def __init__(self, field, values, flags: int = 0):
+        super().__init__(field, values)
+        self.patterns = tuple(compile_pattern(v, flags, strict=REGEX_STRICT) for v in values)
+
+    @property
+    def cost(self) -> float:
+        # Patterns with a literal prefilter mostly cost a substring scan
+        return sum(3.0 if p.literals else 10.0 for p in self.patterns)
+
+    def match(self, event):
+        value = event.get(self.field)
+        if value is None:
+            return False
+        text = value if isinstance(value, str) else str(value)
+        for pattern in self.patterns:
+            if pattern.search(text):
+                return True
+        return False
+
+
+REGEX_FLAGS = {"i": re.IGNORECASE, "m": re.MULTILINE, "s": re.DOTALL}
+
+
+class NullTest(FieldTest):
+    """Matches when the field is absent or empty (Sigma `field: null`)."""
+
+    __slots__ = ()
+    op = "null"
+    base_cost = 0.5
+    prior = 0.5
+
+    def match(self, event):
+        value = event.get(self.field)
+        return value is None or value == ""
+
+
+class ExistsTest(FieldTest):
+    __slots__ = ("expected",)
+    op = "exists"
+    base_cost = 0.5
+    prior = 0.5
+
+    def __init__(self, field, expected: bool):
+        super().__init__(field, ())
+        self.expected = expected
+
+    def describe(self):
+        return f"{self.field}|exists:{self.expected}"
+
+    def match(self, event):
+        return (event.get(self.field) is not None) == self.expected
+
+
+class KeywordTest(FieldTest):
+    """Sigma keyword lists: the value may appear in any field of the event."""
+
+    __slots__ = ()
+    op = "keywords"
+    base_cost = 20.0
+    prior = 0.05
+
+    def __init__(self, values):
+        super().__init__("*", values)
+
+    def match(self, event):
+        for value in event.values():
+            if isinstance(value, (str, int)) and self.test(_text(value)):
+                return True
+        return False
+
+    def test(self, text):
+        for value in self.values:
+            if value in text:
+                return True
+        return False
+
+
+# =============================================================================
+# Plan nodes
+# =============================================================================
+
+class Node:
+    """A plan node with profiling counters (evaluations, hits, nanoseconds)."""
+
+    __slots__ = ("evals", "hits", "ns")
+
+    def __init__(self):
+        self.evals = 0
+        self.hits = 0
+        self.ns = 0
+
+    def key(self) -> str:
+        raise NotImplementedError
+
+    def match(self, event: dict) -> bool:
+        raise NotImplementedError
+
+    def profile(self, event: dict) -> bool:
+        start = perf_counter_ns()
+        result = self._profile(event)
+        self.ns += perf_counter_ns() - start
+        self.evals += 1
+        if result:
+            self.hits += 1
+        return result
+
+    def _profile(self, event: dict) -> bool:
+        return self.match(event)
+
+    @property
+    def static_cost(self) -> float:
+        raise NotImplementedError
+
+    @property
+    def static_prior(self) -> float:
+        raise NotImplementedError
+
+    def pass_rate(self) -> float:
+        if self.evals >= MIN_SAMPLES:
+            # Laplace smoothing keeps never/always-matching tests off the 0/1 extremes
+            return (self.hits + 1) / (self.evals + 2)
+        return self.static_prior
+
+    def cost(self) -> float:
+        if self.evals >= MIN_SAMPLES:
+            return max(self.ns / self.evals, 1.0)
+        return self.static_cost * 100.0  # rough ns-per-unit so priors and measurements mix
+
+    def nodes(self):
+        yield self
+
+    def optimize(self):
+        pass
+
+    def label(self) -> str:
+        return self.key()
+
+    def explain(self, depth: int = 0) -> List[str]:
+        line = "  " * depth + self.label()
+        if self.evals:
+            line += f"  [pass={self.pass_rate():.3f} cost={self.cost():.0f}ns n={self.evals}]"
+        return [line]
+
+
+class Leaf(Node):
+    __slots__ = ("test",)
+
+    def __init__(self, test: FieldTest):
+        super().__init__()
+        self.test = test
+
+    def key(self):
+        return self.test.describe()
+
+    def match(self, event):
+        return self.test.match(event)
+
+    @property
+    def static_cost(self):
+        return self.test.cost
+
+    @property
+    def static_prior(self):
+        return self.test.prior
+
+
+class Not(Node):
+    __slots__ = ("child",)
+
+    def __init__(self, child: Node):
+        super().__init__()
+        self.child = child
+
+    def key(self):
+        return f"not({self.child.key()})"
+
+    def label(self):
+        return "not"
+
+    def match(self, event):
+        return not self.child.match(event)
+
+    def _profile(self, event):
+        return not self.child.profile(event)
+
+    @property
+    def static_cost(self):
+        return self.child.static_cost
+
+    @property
+    def static_prior(self):
+        return 1.0 - self.child.static_prior
+
+    def nodes(self):
+        yield self
+        yield from self.child.nodes()
+
+    def optimize(self):
+        self.child.optimize()
+
+    def explain(self, depth=0):
+        return super().explain(depth) + self.child.explain(depth + 1)
+
+
+class Group(Node):
+    __slots__ = ("children",)
+    joiner = ""
+
+    def __init__(self, children: List[Node]):
+        super().__init__()
+        self.children = children
+
+    def key(self):
+        return f"{self.joiner}({', '.join(sorted(c.key() for c in self.children))})"
+
+    @property
+    def static_cost(self):
+        return sum(c.static_cost for c in self.children)
+
+    def nodes(self):
+        yield self
+        for child in self.children:
+            yield from child.nodes()
+
+    def rank(self, child: Node) -> float:
+        raise NotImplementedError
+
+    def optimize(self):
+        for child in self.children:
+            child.optimize()
+        self.children.sort(key=self.rank)
+
+    def label(self):
+        return self.joiner
+
+    def explain(self, depth=0):
+        lines = super().explain(depth)
+        for child in self.children:
+            lines.extend(child.explain(depth + 1))
+        return lines
+
+
+class And(Group):
+    __slots__ = ()
+    joiner = "and"
+
+    def match(self, event):
+        for child in self.children:
+            if not child.match(event):
+                return False
+        return True
+
+    def _profile(self, event):
+        # Evaluate every child so each gets an unconditional selectivity estimate
+        result = True
+        for child in self.children:
+            if not child.profile(event):
+                result = False
+        return result
+
+    @property
+    def static_prior(self):
+        prior = 1.0
+        for child in self.children:
+            prior *= child.static_prior
+        return prior
+
+    def rank(self, child):
+        # Cheapest test most likely to reject the event goes first
+        return child.cost() / max(1.0 - child.pass_rate(), 1e-6)
+
+
+class Or(Group):
+    __slots__ = ()
+    joiner = "or"
+
+    def match(self, event):
+        for child in self.children:
+            if child.match(event):
+                return True
+        return False
+
+    def _profile(self, event):
+        result = False
+        for child in self.children:
+            if child.profile(event):
+                result = True
+        return result
+
+    @property
+    def static_prior(self):
+        miss = 1.0
+        for child in self.children:
+            miss *= 1.0 - child.static_prior
+        return 1.0 - miss
+
+    def rank(self, child):
+        # Cheapest test most likely to accept the event goes first
+        return child.cost() / max(child.pass_rate(), 1e-6)
+
+
+def flatten(node: Node) -> Node:
+    """Merge nested and/or groups of the same kind so ordering works across them."""
+    if isinstance(node, Not):
+        node.child = flatten(node.child)
+        return node
+    if not isinstance(node, Group):
+        return node
+    children = []
+    for child in node.children:
+        child = flatten(child)
+        if type(child) is type(node):
+            children.extend(child.children)
+        else:
+            children.append(child)
+    if len(children) == 1:
+        return children[0]
+    node.children = children
+    return node
+
+
+# =============================================================================
+# Detection block compilation
+# =============================================================================
+
+def _values(raw) -> list:
+    return list(raw) if isinstance(raw, (list, tuple)) else [raw]
+
+
+def _split_wildcards(field: str, values: list) -> List[FieldTest]:
+    """Turn plain Sigma values into the cheapest equivalent string tests."""
+    groups: Dict[type, list] = {}
+    for value in values:
+        text = _text(value)
+        inner = text.strip("*")
+        plain = "*" not in inner and "?" not in inner
+        if "?" not in text and "*" not in text:
+            groups.setdefault(EqualsTest, []).append(text)
+        elif plain and text.startswith("*") and text.endswith("*") and inner:
+            groups.setdefault(ContainsTest, []).append(inner)
+        elif plain and text.endswith("*") and not text.startswith("*"):
+            groups.setdefault(StartsWithTest, []).append(inner)
+        elif plain and text.startswith("*") and not text.endswith("*"):
+            groups.setdefault(EndsWithTest, []).append(inner)
+        else:
+            groups.setdefault(WildcardTest, []).append(text)
+    return [cls(field, tuple(vals)) for cls, vals in groups.items()]
+
+
+MODIFIER_TESTS = {
+    "contains": ContainsTest,
+    "startswith": StartsWithTest,
+    "endswith": EndsWithTest,
+}
+
+
+def compile_field(spec: str, raw) -> Node:
+    """Compile one `Field|modifier|...: value(s)` entry of a selection."""
+    field, *modifiers = spec.split("|")
+    values = _values(raw)
+
+    if "exists" in modifiers:
+        return Leaf(ExistsTest(field, bool(values[0])))
+    if values == [None]:
+        return Leaf(NullTest(field, ()))
+
+    match_all = "all" in modifiers
+    if "re" in modifiers:
+        return compile_regex_field(field, modifiers, values)
+    unknown = [m for m in modifiers if m not in MODIFIER_TESTS and m != "all"]
+    if unknown:
+        raise RuleCompileError(f"Unsupported modifier(s) {unknown} on field {field}")
+
+    op = next((m for m in modifiers if m in MODIFIER_TESTS), None)
+    lowered = tuple(_text(v) for v in values if v is not None)
+    if op is None and match_all:
+        return And([Leaf(t) for v in lowered for t in _split_wildcards(field, [v])])
+    if op is None:
+        tests = _split_wildcards(field, list(lowered))
+    elif op == "contains" and match_all:
+        tests = [ContainsAllTest(field, lowered)]
+    elif match_all:
+        return And([Leaf(MODIFIER_TESTS[op](field, (v,))) for v in lowered])
+    else:
+        tests = [MODIFIER_TESTS[op](field, lowered)]
+
+    leaves = [Leaf(t) for t in tests]
+    return leaves[0] if len(leaves) == 1 else Or(leaves)
+
+
+def compile_regex_field(field: str, modifiers: List[str], values: list) -> Node:
+    flags = 0
+    for modifier in modifiers:
+        if modifier in REGEX_FLAGS:
+            flags |= REGEX_FLAGS[modifier]
+        elif modifier not in ("re", "all"):
+            raise RuleCompileError(f"Modifier '{modifier}' cannot be combined with 're' on field {field}")
+    patterns = tuple(str(v) for v in values if v is not None)
+    try:
+        if "all" in modifiers:
+            return And([Leaf(RegexTest(field, (p,), flags)) for p in patterns])
+        return Leaf(RegexTest(field, patterns, flags))
+    except ValueError as e:
+        raise RuleCompileError(str(e)) from None
+
+
+def compile_selection(name: str, block) -> Node:
+    if isinstance(block, dict):
+        children = [compile_field(spec, raw) for spec, raw in block.items()]
+        return And(children) if len(children) != 1 else children[0]
+    if isinstance(block, list):
+        if all(isinstance(item, dict) for item in block):
+            return Or([compile_selection(name, item) for item in block])
+        return Leaf(KeywordTest(tuple(_text(v) for v in block)))
+    if isinstance(block, (str, int)):
+        return Leaf(KeywordTest((_text(block),)))
+    raise RuleCompileError(f"Unsupported detection block '{name}'")
+
+
+# =============================================================================
+# Condition parsing
+# =============================================================================
+
+_TOKEN_RE = re.compile(r"\s*(\(|\)|[^\s()]+)")
+
+
+def _tokenize(condition: str) -> List[str]:
+    tokens = []
+    pos = 0
+    condition = condition.strip()
+    while pos < len(condition):
+        m = _TOKEN_RE.match(condition, pos)
+        if not m:
+            break
+        tokens.append(m.group(1))
+        pos = m.end()
+    return tokens
+
+
+class ConditionParser:
+    """Recursive-descent parser: or_expr := and_expr ('or' and_expr)* ...
+
+    Node constructors are class attributes so other front-ends (e.g. the SIEM
+    backends) can reuse the grammar to build their own trees.
+    """
+
+    make_and = And
+    make_or = Or
+    make_not = Not
+
+    def __init__(self, condition: str, selections: Dict[str, Node]):
+        self.tokens = _tokenize(condition)
+        self.pos = 0
+        self.selections = selections
+        self.condition = condition
+
+    def error(self, message: str):
+        return RuleCompileError(f"{message} in condition '{self.condition}'")
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self) -> str:
+        token = self.peek()
+        if token is None:
+            raise self.error("Unexpected end")
+        self.pos += 1
+        return token
+
+    def parse(self) -> Node:
+        if "|" in self.tokens:
+            raise self.error("Aggregation pipes are not supported, use a correlation rule")
+        node = self.or_expr()
+        if self.peek() is not None:
+            raise self.error(f"Unexpected token '{self.peek()}'")
+        return node
+
+    def or_expr(self) -> Node:
+        children = [self.and_expr()]
+        while self.peek() is not None and self.peek().lower() == "or":
+            self.take()
+            children.append(self.and_expr())
+        return children[0] if len(children) == 1 else self.make_or(children)
+
+    def and_expr(self) -> Node:
+        children = [self.not_expr()]
+        while self.peek() is not None and self.peek().lower() == "and":
+            self.take()
+            children.append(self.not_expr())
+        return children[0] if len(children) == 1 else self.make_and(children)
+
+    def not_expr(self) -> Node:
+        if self.peek() is not None and self.peek().lower() == "not":
+            self.take()
+            return self.make_not(self.not_expr())
+        return self.primary()
+
+    def primary(self) -> Node:
+        token = self.take()
+        if token == "(":
+            node = self.or_expr()
+            if self.take() != ")":
+                raise self.error("Missing ')'")
+            return node
+        if token.lower() in ("1", "all", "any") and (self.peek() or "").lower() == "of":
+            self.take()
+            return self.quantified(token.lower(), self.take())
+        if token not in self.selections:
+            raise self.error(f"Unknown selection '{token}'")
+        return self.selections[token]
+
+    def quantified(self, quantifier: str, target: str) -> Node:
+        if target.lower() == "them":
+            names = [n for n in self.selections if not n.startswith("_")]
+        else:
+            names = [n for n in self.selections if fnmatch.fnmatchcase(n, target)]
+        if not names:
+            raise self.error(f"No selection matches '{target}'")
+        children = [self.selections[n] for n in names]
+        if len(children) == 1:
+            return children[0]
+        return self.make_and(children) if quantifier == "all" else self.make_or(children)
+
+
+def compile_detection(detection: dict) -> Node:
+    """Compile a rule's detection section into a single flattened, ordered plan."""
+    if not isinstance(detection, dict) or "condition" not in detection:
+        raise RuleCompileError("Detection section has no condition")
+    names = [name for name in detection if name not in ("condition", "timeframe")]
+    conditions = detection["condition"]
+    if isinstance(conditions, str):
+        conditions = [conditions]
+    plans = []
+    for condition in conditions:
+        # Fresh subtrees per condition so reordering one never reorders another
+        selections = {name: compile_selection(name, detection[name]) for name in names}
+        plans.append(ConditionParser(condition, selections).parse())
+    plan = plans[0] if len(plans) == 1 else Or(plans)
+    plan = flatten(plan)
+    plan.optimize()
+    return plan
+
+
+# =============================================================================
+# Compiled rules
+# =============================================================================
+
+class CompiledRule:
+    __slots__ = ("id", "name", "title", "level", "tags", "logsource", "fields", "path", "plan")
+
+    def __init__(self, rule: dict, plan: Node):
+        self.id = str(rule.get("id"))
+        self.name = rule.get("name") or self.id
+        self.title = rule.get("title", "")
+        self.level = rule.get("level", "medium")
+        self.tags = tuple(rule.get("tags") or ())
+        self.logsource = dict(rule.get("logsource") or {})
+        self.fields = tuple(rule.get("fields") or ())
+        self.path = rule.get("path")
+        self.plan = plan
+
+    def __repr__(self):
+        return f"<CompiledRule {self.name}>"
+
+    def match(self, event: dict) -> bool:
+        return self.plan.match(event)
+
+    def profile(self, event: dict) -> bool:
+        return self.plan.profile(event)
+
+    def optimize(self):
+        self.plan.optimize()
+
+    def explain(self) -> str:
+        return "\n".join([f"{self.name} ({self.id})"] + self.plan.explain(1))
+
+    def export_stats(self) -> Dict[str, list]:
+        return {node.key(): [node.evals, node.hits, node.ns] for node in self.plan.nodes() if node.evals}
+
+    def apply_stats(self, stats: Dict[str, list]):
+        for node in self.plan.nodes():
+            counters = stats.get(node.key())
+            if counters:
+                node.evals, node.hits, node.ns = counters
+        self.plan.optimize()
+
+
+def compile_rule(rule: dict) -> CompiledRule:
+    try:
+        plan = compile_detection(rule.get("detection"))
+    except RuleCompileError as e:
+        raise RuleCompileError(f"{rule.get('name') or rule.get('id')}: {e}") from None
+    return CompiledRule(rule, plan)
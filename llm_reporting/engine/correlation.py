@@ -0,0 +1,273 @@
+# correlation.py - Sigma correlation rules evaluated on a stream of base-rule alerts
+import re
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+from llm_reporting.engine.events import event_time
+
+CORRELATION_TYPES = ("event_count", "value_count", "temporal", "temporal_ordered")
+# Streaming evaluation can only decide "at least N" conditions as events arrive
+CONDITION_OPS = {"gte": 0, "gt": 1}
+# Default cap on live group-by keys per correlation rule
+MAX_GROUPS = 100_000
+
+_TIMESPAN_RE = re.compile(r"^\s*(\d+)\s*([smhd])\s*$")
+_TIMESPAN_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+class CorrelationError(ValueError):
+    pass
+
+
+def parse_timespan(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    m = _TIMESPAN_RE.match(str(value))
+    if not m:
+        raise CorrelationError(f"Invalid timespan '{value}'")
+    return float(int(m.group(1)) * _TIMESPAN_UNITS[m.group(2)])
+
+
+class CorrelationRule:
+    __slots__ = ("id", "name", "title", "level", "tags", "type", "rules", "group_by",
+                 "timespan", "threshold", "field", "path")
+
+    def __init__(self, rule: dict):
+        spec = rule.get("correlation") or {}
+        self.id = str(rule.get("id"))
+        self.name = rule.get("name") or self.id
+        self.title = rule.get("title", "")
+        self.level = rule.get("level", "medium")
+        self.tags = tuple(rule.get("tags") or ())
+        self.path = rule.get("path")
+        self.type = spec.get("type")
+        if self.type not in CORRELATION_TYPES:
+            raise CorrelationError(f"{self.name}: unsupported correlation type '{self.type}'")
+        rules = spec.get("rules") or []
+        self.rules = tuple(str(r) for r in (rules if isinstance(rules, list) else [rules]))
+        if not self.rules:
+            raise CorrelationError(f"{self.name}: correlation references no rules")
+        group_by = spec.get("group-by") or []
+        self.group_by = tuple(group_by if isinstance(group_by, list) else [group_by])
+        self.timespan = parse_timespan(spec.get("timespan", "5m"))
+
+        condition = spec.get("condition") or {}
+        self.field = condition.get("field")
+        self.threshold = None
+        if self.type in ("event_count", "value_count"):
+            ops = [op for op in condition if op != "field"]
+            if len(ops) != 1 or ops[0] not in CONDITION_OPS:
+                raise CorrelationError(f"{self.name}: condition must be a single gte/gt threshold")
+            # Normalise to "count >= threshold"
+            self.threshold = int(condition[ops[0]]) + CONDITION_OPS[ops[0]]
+            if self.type == "value_count" and not self.field:
+                raise CorrelationError(f"{self.name}: value_count needs condition.field")
+        elif len(self.rules) < 2:
+            raise CorrelationError(f"{self.name}: temporal correlation needs two or more rules")
+
+    def __repr__(self):
+        return f"<CorrelationRule {self.name} {self.type}>"
+
+
+# =============================================================================
+# Per-group window state
+# =============================================================================
+
+class EventCountState:
+    """Only the newest `threshold` timestamps are kept: older ones cannot change the outcome."""
+
+    __slots__ = ("times", "last")
+
+    def __init__(self, rule: CorrelationRule):
+        self.times = deque(maxlen=rule.threshold)
+        self.last = 0.0
+
+    def add(self, rule: CorrelationRule, ref: str, ts: float, event: dict) -> Optional[int]:
+        self.last = ts
+        times = self.times
+        times.append(ts)
+        horizon = ts - rule.timespan
+        while times and times[0] < horizon:
+            times.popleft()
+        if len(times) >= rule.threshold:
+            count = len(times)
+            times.clear()
+            return count
+        return None
+
+
+class ValueCountState:
+    """Distinct values with their last-seen time, capped at `threshold` entries."""
+
+    __slots__ = ("values", "last")
+
+    def __init__(self, rule: CorrelationRule):
+        self.values: Dict[str, float] = {}
+        self.last = 0.0
+
+    def add(self, rule, ref, ts, event):
+        value = event.get(rule.field)
+        if value is None:
+            return None
+        self.last = ts
+        values = self.values
+        values.pop(value, None)
+        values[value] = ts  # re-insert so dict order stays oldest-first
+        horizon = ts - rule.timespan
+        for old, seen in list(values.items()):
+            if seen >= horizon:
+                break
+            del values[old]
+        if len(values) >= rule.threshold:
+            count = len(values)
+            values.clear()
+            return count
+        return None
+
+
+class TemporalState:
+    """Last time each referenced rule fired for the group (one slot per rule)."""
+
+    __slots__ = ("seen", "last")
+
+    def __init__(self, rule: CorrelationRule):
+        self.seen: List[Optional[float]] = [None] * len(rule.rules)
+        self.last = 0.0
+
+    def add(self, rule, ref, ts, event):
+        self.last = ts
+        seen = self.seen
+        horizon = ts - rule.timespan
+        for i, when in enumerate(seen):
+            if when is not None and when < horizon:
+                seen[i] = None
+        for position, name in enumerate(rule.rules):
+            if name != ref:
+                continue
+            if rule.type == "temporal_ordered" and position and seen[position - 1] is None:
+                continue  # out of order: predecessor has not fired inside the window
+            seen[position] = ts
+        if all(when is not None for when in seen):
+            count = len(seen)
+            self.seen = [None] * len(seen)
+            return count
+        return None
+
+
+STATE_TYPES = {
+    "event_count": EventCountState,
+    "value_count": ValueCountState,
+    "temporal": TemporalState,
+    "temporal_ordered": TemporalState,
+}
+
+
+class CorrelationStats:
+    def __init__(self):
+        self.alerts_in = 0
+        self.fired = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def summary(self, groups: int) -> dict:
+        return {
+            "alerts_in": self.alerts_in,
+            "correlations_fired": self.fired,
+            "live_groups": groups,
+            "groups_expired": self.expired,
+            "groups_evicted": self.evicted,
+        }
+
+
+class CorrelationEngine:
+    """Feeds base-rule alerts through correlation windows.
+
+    Each correlation rule keeps an LRU-ordered map of group key -> window state.
+    Groups idle for longer than the timespan are dropped as the stream advances,
+    and the least recently active group is evicted once `max_groups` is reached,
+    so memory stays bounded under high-cardinality group-by fields.
+    """
+
+    def __init__(self, rules: List[CorrelationRule], max_groups: int = MAX_GROUPS):
+        self.rules = list(rules)
+        self.max_groups = max_groups
+        self.stats = CorrelationStats()
+        self._groups: Dict[str, OrderedDict] = {rule.id: OrderedDict() for rule in self.rules}
+        self._by_ref: Dict[str, List[CorrelationRule]] = {}
+        for rule in self.rules:
+            for ref in rule.rules:
+                self._by_ref.setdefault(ref, []).append(rule)
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def adopt(self, other: "CorrelationEngine"):
+        """Carry open windows over from a previous engine for rules that did not change."""
+        previous = {rule.id: rule for rule in other.rules}
+        for rule in self.rules:
+            if previous.get(rule.id) is rule:
+                self._groups[rule.id] = other._groups[rule.id]
+        self.stats = other.stats
+
+    def live_groups(self) -> int:
+        return sum(len(groups) for groups in self._groups.values())
+
+    def _expire(self, rule: CorrelationRule, groups: OrderedDict, now: float):
+        horizon = now - rule.timespan
+        while groups:
+            key, state = next(iter(groups.items()))
+            if state.last >= horizon:
+                break
+            del groups[key]
+            self.stats.expired += 1
+
+    def process(self, alert: dict) -> List[dict]:
+        """Consume one base alert, returning any correlation alerts it completes."""
+        targets = self._by_ref.get(alert.get("rule_id"), []) + self._by_ref.get(alert.get("rule_name"), [])
+        if not targets:
+            return []
+        self.stats.alerts_in += 1
+        event = alert.get("event") or {}
+        ts = event_time(event)
+        out = []
+        for rule in targets:
+            ref = alert["rule_id"] if alert.get("rule_id") in rule.rules else alert.get("rule_name")
+            groups = self._groups[rule.id]
+            self._expire(rule, groups, ts)
+            key: Tuple = tuple(event.get(field) for field in rule.group_by)
+            state = groups.get(key)
+            if state is None:
+                if len(groups) >= self.max_groups:
+                    groups.popitem(last=False)
+                    self.stats.evicted += 1
+                state = groups[key] = STATE_TYPES[rule.type](rule)
+            else:
+                groups.move_to_end(key)
+            count = state.add(rule, ref, ts, event)
+            if count is not None:
+                self.stats.fired += 1
+                out.append(make_correlation_alert(rule, key, count, ts, event))
+        return out
+
+    def summary(self) -> dict:
+        return self.stats.summary(self.live_groups())
+
+
+def make_correlation_alert(rule: CorrelationRule, key: Tuple, count: int, ts: float, event: dict) -> dict:
+    return {
+        "rule_id": rule.id,
+        "rule_name": rule.name,
+        "title": rule.title,
+        "level": rule.level,
+        "tags": list(rule.tags),
+        "correlation_type": rule.type,
+        "group": dict(zip(rule.group_by, key)),
+        "count": count,
+        "timespan": rule.timespan,
+        "ts": ts,
+        "event": event,
+    }
+
+
+def compile_correlations(rules: List[dict]) -> List[CorrelationRule]:
+    return [CorrelationRule(rule) for rule in rules if "correlation" in rule]
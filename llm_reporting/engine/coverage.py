@@ -0,0 +1,228 @@
+# coverage.py - ATT&CK coverage matrix (technique x tactic x rule) built from rule tags
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import yaml
+
+from llm_reporting.engine.rules import RULE_DIR, list_rule_files, load_rule_file, normalize_rule
+
+TECHNIQUE_TAG_RE = re.compile(r"^attack\.(t\d{4}(?:\.\d{3})?)$")
+
+# Sigma tactic tag -> ATT&CK tactic name
+TACTICS = {
+    "reconnaissance": "Reconnaissance",
+    "resource_development": "Resource Development",
+    "initial_access": "Initial Access",
+    "execution": "Execution",
+    "persistence": "Persistence",
+    "privilege_escalation": "Privilege Escalation",
+    "defense_evasion": "Defense Evasion",
+    "credential_access": "Credential Access",
+    "discovery": "Discovery",
+    "lateral_movement": "Lateral Movement",
+    "collection": "Collection",
+    "command_and_control": "Command and Control",
+    "exfiltration": "Exfiltration",
+    "impact": "Impact",
+}
+UNMAPPED_TACTIC = "Unmapped"
+
+FULL = "Full"
+PARTIAL = "Partial"
+NONE = "None"
+
+LEVEL_ORDER = {"informational": 0, "low": 1, "medium": 2, "high": 3, "critical": 4}
+
+
+def parse_tags(tags: Iterable[str]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """Split Sigma tags into (technique ids like 'T1055.001', tactic names)."""
+    techniques, tactics = [], []
+    for tag in tags or []:
+        tag = str(tag).lower()
+        m = TECHNIQUE_TAG_RE.match(tag)
+        if m:
+            techniques.append(m.group(1).upper())
+        elif tag.startswith("attack.") and tag[7:] in TACTICS:
+            tactics.append(TACTICS[tag[7:]])
+    return tuple(dict.fromkeys(techniques)), tuple(dict.fromkeys(tactics))
+
+
+def parent_technique(technique: str) -> Optional[str]:
+    return technique.split(".", 1)[0] if "." in technique else None
+
+
+class RuleCoverage:
+    __slots__ = ("key", "id", "title", "level", "techniques", "tactics")
+
+    def __init__(self, key: str, rule: dict):
+        self.key = key
+        self.id = str(rule.get("id") or key)
+        self.title = rule.get("title") or rule.get("name") or key
+        self.level = rule.get("level") or "medium"
+        self.techniques, self.tactics = parse_tags(rule.get("tags"))
+
+
+class CoverageIndex:
+    """Technique x tactic x rule matrix, maintained rule by rule.
+
+    Every lookup a dashboard needs (coverage level, rules and tactics of one
+    technique) is a dict access; adding, changing or removing a rule touches
+    only the entries of the techniques it is tagged with.
+    """
+
+    def __init__(self, rule_dir: Optional[str] = RULE_DIR):
+        self.rule_dir = rule_dir
+        self.version = 0
+        self._rules: Dict[str, RuleCoverage] = {}
+        self._by_technique: Dict[str, Set[str]] = {}
+        self._subtechniques: Dict[str, Set[str]] = {}
+        self._tactic_counts: Dict[str, Dict[str, int]] = {}
+        self._cells: Dict[Tuple[str, str], Set[str]] = {}
+        self._signatures: Dict[str, Tuple[int, int]] = {}
+        self._errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        if rule_dir is not None:
+            self.refresh()
+
+    # -------------------------------------------------------------------------
+    # Updates
+    # -------------------------------------------------------------------------
+
+    def add_rule(self, key: str, rule: dict):
+        """Index (or re-index) one rule under key."""
+        self.remove_rule(key)
+        entry = RuleCoverage(key, rule)
+        if not entry.techniques:
+            return
+        self._rules[key] = entry
+        tactics = entry.tactics or (UNMAPPED_TACTIC,)
+        for technique in entry.techniques:
+            self._by_technique.setdefault(technique, set()).add(key)
+            parent = parent_technique(technique)
+            if parent:
+                self._subtechniques.setdefault(parent, set()).add(technique)
+            counts = self._tactic_counts.setdefault(technique, {})
+            for tactic in tactics:
+                counts[tactic] = counts.get(tactic, 0) + 1
+                self._cells.setdefault((technique, tactic), set()).add(key)
+
+    def remove_rule(self, key: str):
+        entry = self._rules.pop(key, None)
+        if entry is None:
+            return
+        tactics = entry.tactics or (UNMAPPED_TACTIC,)
+        for technique in entry.techniques:
+            rules = self._by_technique[technique]
+            rules.discard(key)
+            if not rules:
+                del self._by_technique[technique]
+                parent = parent_technique(technique)
+                if parent:
+                    subs = self._subtechniques[parent]
+                    subs.discard(technique)
+                    if not subs:
+                        del self._subtechniques[parent]
+            counts = self._tactic_counts[technique]
+            for tactic in tactics:
+                counts[tactic] -= 1
+                if not counts[tactic]:
+                    del counts[tactic]
+                cell = self._cells[(technique, tactic)]
+                cell.discard(key)
+                if not cell:
+                    del self._cells[(technique, tactic)]
+            if not counts:
+                del self._tactic_counts[technique]
+
+    def refresh(self) -> bool:
+        """Re-index rule files whose (mtime, size) changed; returns True if anything did."""
+        if self.rule_dir is None:
+            return False
+        with self._lock:
+            changed = False
+            seen = set()
+            for path in list_rule_files(self.rule_dir):
+                seen.add(path)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                signature = (st.st_mtime_ns, st.st_size)
+                if self._signatures.get(path) == signature:
+                    continue
+                self._signatures[path] = signature
+                changed = True
+                try:
+                    data = load_rule_file(path)
+                except (OSError, ValueError, yaml.YAMLError) as e:
+                    # Keep the last good coverage of a file that no longer parses
+                    self._errors[path] = str(e)
+                    continue
+                self._errors.pop(path, None)
+                if isinstance(data, dict):
+                    self.add_rule(path, normalize_rule(data, path))
+                else:
+                    self.remove_rule(path)
+            for path in [p for p in self._signatures if p not in seen]:
+                del self._signatures[path]
+                self._errors.pop(path, None)
+                self.remove_rule(path)
+                changed = True
+            if changed:
+                self.version += 1
+            return changed
+
+    # -------------------------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------------------------
+
+    def level(self, technique: str) -> str:
+        """Full: rules target the technique itself. Partial: only its parent technique
+        or some of its sub-techniques are covered. None: nothing."""
+        technique = technique.upper()
+        if technique in self._by_technique:
+            return FULL
+        parent = parent_technique(technique)
+        if (parent and parent in self._by_technique) or technique in self._subtechniques:
+            return PARTIAL
+        return NONE
+
+    def rules(self, technique: str) -> List[RuleCoverage]:
+        return [self._rules[key] for key in self._by_technique.get(technique.upper(), ())]
+
+    def tactics(self, technique: str) -> List[str]:
+        return sorted(self._tactic_counts.get(technique.upper(), ()))
+
+    def coverage(self, technique: str) -> dict:
+        technique = technique.upper()
+        rules = self.rules(technique)
+        top = max(rules, key=lambda r: LEVEL_ORDER.get(r.level, 2)) if rules else None
+        return {
+            "technique": technique,
+            "coverage": self.level(technique),
+            "tactics": self.tactics(technique),
+            "rules": sorted(r.title for r in rules),
+            "max_level": top.level if top else None,
+            "subtechniques": sorted(self._subtechniques.get(technique, ())),
+        }
+
+    def techniques(self) -> List[str]:
+        return sorted(self._by_technique)
+
+    def matrix(self) -> Dict[str, Dict[str, List[str]]]:
+        """{tactic: {technique: [rule titles]}}"""
+        out: Dict[str, Dict[str, List[str]]] = {}
+        for (technique, tactic), keys in self._cells.items():
+            out.setdefault(tactic, {})[technique] = sorted(self._rules[k].title for k in keys)
+        return {tactic: dict(sorted(cells.items())) for tactic, cells in sorted(out.items())}
+
+    def summary(self) -> dict:
+        return {
+            "version": self.version,
+            "rules": len(self._rules),
+            "techniques": len(self._by_technique),
+            "tactics": len({tactic for _, tactic in self._cells}),
+            "errors": dict(self._errors),
+        }
@@ -0,0 +1,117 @@
+# dispatch.py - Route events to the rules whose logsource can match them
+from collections import Counter
+from itertools import product as cartesian
+from typing import Any, Dict, List, Optional, Tuple
+
+from llm_reporting.engine.events import event_logsource
+from llm_reporting.engine.rules import logsource_key
+
+Key = Tuple[Optional[str], ...]
+
+
+class DispatchStats:
+    """Rules-per-event fan-out counters collected while routing."""
+
+    def __init__(self):
+        self.events = 0
+        self.candidates = 0
+        self.unrouted = 0
+        self.fanout = Counter()
+        self.by_logsource = Counter()
+
+    def record(self, key: Key, fanout: int):
+        self.events += 1
+        self.candidates += fanout
+        self.fanout[fanout] += 1
+        self.by_logsource[key] += 1
+        if not fanout:
+            self.unrouted += 1
+
+    def percentile(self, pct: float) -> int:
+        if not self.events:
+            return 0
+        threshold = self.events * pct / 100.0
+        seen = 0
+        for fanout in sorted(self.fanout):
+            seen += self.fanout[fanout]
+            if seen >= threshold:
+                return fanout
+        return max(self.fanout)
+
+    def summary(self) -> dict:
+        return {
+            "events": self.events,
+            "rule_evaluations": self.candidates,
+            "unrouted_events": self.unrouted,
+            "mean_fanout": round(self.candidates / self.events, 3) if self.events else 0.0,
+            "p50_fanout": self.percentile(50),
+            "p95_fanout": self.percentile(95),
+            "max_fanout": max(self.fanout) if self.fanout else 0,
+            "fanout_histogram": {str(k): v for k, v in sorted(self.fanout.items())},
+            "events_by_logsource": {
+                "/".join(part or "*" for part in key): count
+                for key, count in self.by_logsource.most_common()
+            },
+        }
+
+    def reset(self):
+        self.__init__()
+
+
+class LogsourceIndex:
+    """Index of rules keyed by (product, category, service).
+
+    A rule key may leave any field as None (the rule does not constrain it), so an
+    event key can match up to eight rule keys. The merged candidate list for each
+    distinct event key is computed once and cached; routing an event afterwards is a
+    single dict lookup.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[Key, List[Any]] = {}
+        self._routes: Dict[Key, Tuple[Any, ...]] = {}
+        self.stats = DispatchStats()
+
+    def __len__(self):
+        return sum(len(items) for items in self._buckets.values())
+
+    def add(self, item: Any, logsource: Optional[dict]):
+        self._buckets.setdefault(logsource_key(logsource), []).append(item)
+        self._routes.clear()
+
+    def remove(self, item: Any):
+        for key, items in list(self._buckets.items()):
+            kept = [other for other in items if other is not item]
+            if len(kept) == len(items):
+                continue
+            if kept:
+                self._buckets[key] = kept
+            else:
+                del self._buckets[key]
+        self._routes.clear()
+
+    def keys(self) -> List[Key]:
+        return list(self._buckets)
+
+    def candidates(self, key: Key) -> Tuple[Any, ...]:
+        routed = self._routes.get(key)
+        if routed is None:
+            options = [(part, None) if part is not None else (None,) for part in key]
+            merged = []
+            for rule_key in cartesian(*options):
+                merged.extend(self._buckets.get(rule_key, ()))
+            routed = self._routes[key] = tuple(merged)
+        return routed
+
+    def route(self, event: dict) -> Tuple[Any, ...]:
+        key = event_logsource(event)
+        routed = self.candidates(key)
+        self.stats.record(key, len(routed))
+        return routed
+
+
+def build_index(rules: List[dict]) -> LogsourceIndex:
+    index = LogsourceIndex()
+    for rule in rules:
+        index.add(rule, rule.get("logsource"))
+    return index
@@ -0,0 +1,179 @@
+# engine.py - Detection engine: logsource dispatch + compiled rule plans
+import argparse
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+from llm_reporting.engine.compiler import CompiledRule, compile_rule
+from llm_reporting.engine.correlation import CorrelationEngine, CorrelationRule, compile_correlations
+from llm_reporting.engine.dispatch import LogsourceIndex
+from llm_reporting.engine.fieldmap import FieldMappings, default_mappings
+from llm_reporting.engine.regex import regex_stats, unevaluated_searches
+from llm_reporting.engine.rules import BASE_DIR, RULE_DIR, load_rules
+
+STATS_PATH = os.path.join(BASE_DIR, "data", "plan_stats.json")
+
+
+def make_alert(rule: CompiledRule, event: dict, unevaluated: bool = False) -> dict:
+    alert = {
+        "rule_id": rule.id,
+        "rule_name": rule.name,
+        "title": rule.title,
+        "level": rule.level,
+        "tags": list(rule.tags),
+        "event": event,
+    }
+    if unevaluated:
+        # Not a match: a risky regex of the rule could not be run over a whole (over-long) value
+        alert["unevaluated"] = True
+    return alert
+
+
+class DetectionEngine:
+    def __init__(self, rules: List[CompiledRule], correlations: Optional[List[CorrelationRule]] = None,
+                 field_mappings: Optional[FieldMappings] = None):
+        self.rules = list(rules)
+        self.correlations = list(correlations or [])
+        self.correlator = CorrelationEngine(self.correlations)
+        self.index = LogsourceIndex()
+        for rule in self.rules:
+            self.index.add(rule, rule.logsource)
+        # None = the shared mappings file, looked up at run time so a pickled engine
+        # (rule bundle) does not carry a stale copy
+        self.field_mappings = field_mappings
+
+    @property
+    def fields(self) -> FieldMappings:
+        return self.field_mappings or default_mappings()
+
+    def match(self, event: dict) -> List[CompiledRule]:
+        event = self.fields.normalize(event)
+        return [rule for rule in self.index.route(event) if rule.plan.match(event)]
+
+    def process(self, event: dict) -> List[dict]:
+        return self.process_batch((event,))
+
+    def process_batch(self, events: Iterable[dict], normalized: bool = False) -> List[dict]:
+        """Base-rule alerts for a batch, each followed by any correlation it completes.
+
+        normalized=True skips field normalization for events that already went
+        through FieldMappings.normalize_batch (e.g. in an ingest pipeline stage).
+        """
+        alerts = []
+        route = self.index.route
+        correlate = self.correlator.process if self.correlator else None
+        # Raw field names are mapped to canonical ones once per batch, not per rule
+        for event in (events if normalized else self.fields.normalize_batch(events)):
+            unevaluated = unevaluated_searches()
+            for rule in route(event):
+                if rule.plan.match(event):
+                    alert = make_alert(rule, event)
+                    alerts.append(alert)
+                    if correlate is not None:
+                        alerts.extend(correlate(alert))
+            if unevaluated_searches() != unevaluated:
+                alerts.extend(make_alert(rule, event, unevaluated=True) for rule in self.unevaluated_rules(event))
+        return alerts
+
+    def unevaluated_rules(self, event: dict) -> List[CompiledRule]:
+        """Rules that did not match an event only because a risky regex could not be run
+        over the whole of an over-long value. Re-checks the event's rules, so callers only
+        ask when unevaluated_searches() moved while matching it."""
+        rules = []
+        for rule in self.index.route(event):
+            before = unevaluated_searches()
+            if not rule.plan.match(event) and unevaluated_searches() != before:
+                rules.append(rule)
+        return rules
+
+    # -------------------------------------------------------------------------
+    # Selectivity statistics
+    # -------------------------------------------------------------------------
+
+    def calibrate(self, events: Iterable[dict]) -> int:
+        """Profile every plan node on replayed events, then reorder all plans."""
+        count = 0
+        normalize = self.fields.normalize
+        for event in events:
+            event = normalize(event)
+            for rule in self.index.route(event):
+                rule.profile(event)
+            count += 1
+        for rule in self.rules:
+            rule.optimize()
+        return count
+
+    def export_stats(self) -> Dict[str, dict]:
+        return {rule.id: rule.export_stats() for rule in self.rules}
+
+    def apply_stats(self, stats: Dict[str, dict]):
+        for rule in self.rules:
+            if rule.id in stats:
+                rule.apply_stats(stats[rule.id])
+
+    def save_stats(self, path: str = STATS_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.export_stats(), f, indent=2)
+
+    def load_stats(self, path: str = STATS_PATH) -> bool:
+        if not os.path.exists(path):
+            return False
+        with open(path, "r", encoding="utf-8") as f:
+            self.apply_stats(json.load(f))
+        return True
+
+    def explain(self) -> str:
+        return "\n\n".join(rule.explain() for rule in self.rules)
+
+
+def compile_rules(rules: List[dict]) -> List[CompiledRule]:
+    # Correlation rules carry no detection section and are handled separately
+    return [compile_rule(rule) for rule in rules if "detection" in rule]
+
+
+def load_engine(rule_dir: str = RULE_DIR, stats_path: Optional[str] = STATS_PATH) -> DetectionEngine:
+    rules = load_rules(rule_dir)
+    engine = DetectionEngine(compile_rules(rules), compile_correlations(rules))
+    if stats_path:
+        engine.load_stats(stats_path)
+    return engine
+
+
+def read_ndjson(path: str) -> Iterable[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detection engine utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    calibrate = sub.add_parser("calibrate", help="Measure plan selectivity on NDJSON telemetry")
+    calibrate.add_argument("events", nargs="+", help="NDJSON telemetry files to replay")
+    calibrate.add_argument("--rules", default=RULE_DIR)
+    calibrate.add_argument("--stats", default=STATS_PATH, help="Where to store the statistics")
+
+    explain = sub.add_parser("explain", help="Print the compiled evaluation plans")
+    explain.add_argument("--rules", default=RULE_DIR)
+    explain.add_argument("--stats", default=STATS_PATH)
+
+    args = parser.parse_args()
+    engine = load_engine(args.rules, args.stats)
+
+    if args.command == "calibrate":
+        total = sum(engine.calibrate(read_ndjson(path)) for path in args.events)
+        engine.save_stats(args.stats)
+        print(f"✅ Profiled {total} events, statistics saved to {args.stats}")
+        print(json.dumps(engine.index.stats.summary(), indent=2))
+        if regex_stats():
+            print("Regex CPU accounting:")
+            print(json.dumps(regex_stats(), indent=2))
+    print(engine.explain())
+
+
+if __name__ == "__main__":
+    main()
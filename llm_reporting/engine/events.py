@@ -0,0 +1,156 @@
+# events.py - Helpers for reading Windows/Sysmon event records
+import time
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from llm_reporting.engine.rules import logsource_key
+
+SYSMON_CHANNEL = "microsoft-windows-sysmon/operational"
+
+# Sysmon EventID -> Sigma logsource category
+SYSMON_CATEGORIES = {
+    1: "process_creation",
+    3: "network_connection",
+    5: "process_termination",
+    6: "driver_load",
+    7: "image_load",
+    8: "create_remote_thread",
+    10: "process_access",
+    11: "file_event",
+    12: "registry_add",
+    13: "registry_set",
+    14: "registry_rename",
+    15: "create_stream_hash",
+    17: "pipe_created",
+    18: "pipe_created",
+    22: "dns_query",
+    23: "file_delete",
+}
+
+# Event log channel -> Sigma logsource service
+CHANNEL_SERVICES = {
+    "security": "security",
+    "system": "system",
+    "application": "application",
+    "microsoft-windows-powershell/operational": "powershell",
+    "powershellcore/operational": "powershell",
+    "windows powershell": "powershell-classic",
+    SYSMON_CHANNEL: "sysmon",
+}
+
+# Used when a record carries an EventID but no channel (e.g. Splunk-style EventCode exports);
+# other IDs are looked up in SYSMON_CATEGORIES, then the Security audit range
+EVENT_ID_SERVICES = {
+    4103: "powershell",
+    4104: "powershell",
+}
+
+# Splunk source/sourcetype values naming the channel, e.g. XmlWinEventLog:Microsoft-Windows-Sysmon/Operational
+SOURCE_FIELDS = ("source", "sourcetype")
+SOURCE_PREFIXES = ("xmlwineventlog:", "wineventlog:")
+
+# Bounded so hostile or very diverse channel values cannot grow it without limit
+LOGSOURCE_CACHE_SIZE = 4096
+_logsource_cache = {}
+
+# Timestamp fields in the order they are tried
+TIME_FIELDS = ("ts", "UtcTime", "TimeCreated", "@timestamp", "_time")
+
+
+def event_id(event: dict) -> Optional[int]:
+    value = event.get("EventID", event.get("EventCode"))
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _source_channel(event: dict) -> Optional[str]:
+    """Channel named by a Splunk source/sourcetype field, for records without Channel."""
+    for field in SOURCE_FIELDS:
+        value = event.get(field)
+        if not isinstance(value, str):
+            continue
+        value_lc = value.lower()
+        for prefix in SOURCE_PREFIXES:
+            if value_lc.startswith(prefix):
+                return value_lc[len(prefix):]
+        if "sysmon" in value_lc:
+            return SYSMON_CHANNEL
+    return None
+
+
+def event_logsource(event: dict) -> Tuple[Optional[str], ...]:
+    """Derive the (product, category, service) key of an event record.
+
+    Results are memoized on (product, channel, EventID) so the per-event cost is a
+    couple of dict lookups once the key has been seen.
+    """
+    explicit = event.get("logsource")
+    if isinstance(explicit, dict):
+        return logsource_key(explicit)
+
+    product = event.get("product")
+    channel = event.get("Channel")
+    if channel is None:
+        channel = _source_channel(event)
+    eid = event_id(event)
+    cache_key = (product, channel, eid)
+    key = _logsource_cache.get(cache_key)
+    if key is not None:
+        return key
+
+    category = service = None
+    channel_lc = str(channel).lower() if channel is not None else None
+    if channel_lc is not None:
+        service = CHANNEL_SERVICES.get(channel_lc)
+        if channel_lc == SYSMON_CHANNEL:
+            category = SYSMON_CATEGORIES.get(eid)
+    elif eid is not None:
+        service = EVENT_ID_SERVICES.get(eid)
+        if service is None:
+            category = SYSMON_CATEGORIES.get(eid)
+            if category is not None:
+                service = "sysmon"
+            elif 4600 <= eid < 5200:
+                service = "security"
+    if product is None and (channel is not None or eid is not None):
+        product = "windows"
+
+    key = (str(product).lower() if product is not None else None, category, service)
+    if len(_logsource_cache) >= LOGSOURCE_CACHE_SIZE:
+        _logsource_cache.clear()
+    _logsource_cache[cache_key] = key
+    return key
+
+
+def parse_time(value) -> Optional[float]:
+    """Parse an epoch number or ISO-8601 / Sysmon 'YYYY-MM-DD HH:MM:SS.fff' string (UTC)."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str) or not value:
+        return None
+    text = value.strip().replace("Z", "+00:00")
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def event_time(event: dict, default: Optional[float] = None) -> float:
+    """Epoch seconds of an event, falling back to `default` (or now) when it has none."""
+    for field in TIME_FIELDS:
+        value = event.get(field)
+        if value is not None:
+            parsed = parse_time(value)
+            if parsed is not None:
+                return parsed
+    return time.time() if default is None else default
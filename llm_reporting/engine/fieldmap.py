@@ -0,0 +1,136 @@
+# fieldmap.py - Configurable field mappings compiled into flat lookup tables
+#
+# The rules are written against canonical (Sigma/Sysmon) field names. Raw events
+# name the same fields differently depending on where they came from, and each
+# SIEM has its own spelling. The mapping file is compiled once into:
+#   aliases  {raw name: canonical name}       used to normalize event batches
+#   profiles {profile: {canonical: name}}     used by query/telemetry generators
+import hashlib
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import yaml
+
+from llm_reporting.engine.rules import BASE_DIR, YamlLoader
+
+MAPPINGS_PATH = os.path.join(BASE_DIR, "data", "field_mappings.yml")
+
+
+class FieldMappingError(ValueError):
+    pass
+
+
+class FieldMappings:
+    def __init__(self, config: Optional[dict] = None, digest: str = ""):
+        config = config or {}
+        self.digest = digest
+        self.profiles: Dict[str, Dict[str, str]] = {}
+        self.aliases: Dict[str, str] = {}
+        for profile, fields in (config.get("profiles") or {}).items():
+            self.profiles[str(profile)] = {str(k): str(v) for k, v in (fields or {}).items()}
+            for canonical, name in self.profiles[str(profile)].items():
+                self._add_alias(name, canonical)
+        for canonical, names in (config.get("aliases") or {}).items():
+            for name in names if isinstance(names, list) else [names]:
+                self._add_alias(str(name), str(canonical))
+
+        # Dotted names also address nested objects (ECS/Winlogbeat JSON): index them
+        # by top-level key so one set intersection finds everything an event needs
+        self.paths: Dict[str, List[Tuple[Tuple[str, ...], str]]] = {}
+        for name, canonical in self.aliases.items():
+            if "." in name:
+                path = tuple(name.split("."))
+                self.paths.setdefault(path[0], []).append((path, canonical))
+        self.prefixes: Dict[str, List[Tuple[str, ...]]] = {}
+        for prefix in config.get("strip_prefixes") or []:
+            path = tuple(str(prefix).split("."))
+            self.prefixes.setdefault(path[0], []).append(path)
+        self.triggers = frozenset(self.aliases) | frozenset(self.paths) | frozenset(self.prefixes)
+
+    def _add_alias(self, name: str, canonical: str):
+        if name == canonical:
+            return
+        existing = self.aliases.get(name)
+        if existing is not None and existing != canonical:
+            raise FieldMappingError(f"'{name}' maps to both {existing} and {canonical}")
+        self.aliases[name] = canonical
+
+    # -------------------------------------------------------------------------
+    # Generators: canonical -> source/backend names
+    # -------------------------------------------------------------------------
+
+    def profile(self, name: str) -> Dict[str, str]:
+        """The {canonical: name} table of a profile (empty for unknown profiles)."""
+        return dict(self.profiles.get(name, {}))
+
+    def to_profile(self, event: dict, profile: str) -> dict:
+        """Rename an event's canonical fields the way the given source writes them."""
+        table = self.profiles.get(profile)
+        if not table:
+            return dict(event)
+        return {table.get(key, key): value for key, value in event.items()}
+
+    # -------------------------------------------------------------------------
+    # Normalization: raw names -> canonical
+    # -------------------------------------------------------------------------
+
+    def normalize(self, event: dict) -> dict:
+        """Return the event with canonical fields added; the event itself if none apply."""
+        triggers = self.triggers
+        if triggers.isdisjoint(event):
+            return event
+        out = dict(event)
+        aliases = self.aliases
+        for key in triggers.intersection(event):
+            canonical = aliases.get(key)
+            if canonical is not None and canonical not in out:
+                out[canonical] = event[key]
+            value = event[key]
+            if not isinstance(value, dict):
+                continue
+            for path, canonical in self.paths.get(key, ()):
+                found = _dig(value, path[1:])
+                if found is not None and canonical not in out:
+                    out[canonical] = found
+            for path in self.prefixes.get(key, ()):
+                container = _dig(value, path[1:])
+                if isinstance(container, dict):
+                    for name, found in container.items():
+                        if name not in out:
+                            out[name] = found
+        return out
+
+    def normalize_batch(self, events: Iterable[dict]) -> List[dict]:
+        normalize = self.normalize
+        return [normalize(event) for event in events]
+
+
+def _dig(value, path: Tuple[str, ...]):
+    for part in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def load_field_mappings(path: str = MAPPINGS_PATH) -> FieldMappings:
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return FieldMappings()
+    config = yaml.load(data, Loader=YamlLoader)
+    if config is not None and not isinstance(config, dict):
+        raise FieldMappingError(f"{os.path.basename(path)} does not contain a mapping")
+    return FieldMappings(config, hashlib.sha256(data).hexdigest())
+
+
+_default: Optional[FieldMappings] = None
+
+
+def default_mappings() -> FieldMappings:
+    """The mappings from MAPPINGS_PATH, loaded once per process."""
+    global _default
+    if _default is None:
+        _default = load_field_mappings()
+    return _default
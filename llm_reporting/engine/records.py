@@ -0,0 +1,222 @@
+# records.py - Compact event records and batched NDJSON decoding
+#
+# Decoding: json.loads per line pays the call overhead per event and gives every
+# event its own copies of the key strings (the decoder only memoizes keys within
+# one call). decode_lines() decodes a whole batch as one JSON array instead, so
+# keys are shared across the batch and the per-call cost is paid once.
+#
+# Records: an EventRecord is a tuple of values; the field names live on its
+# class, one class per key layout ("shape"). Telemetry from a source has few
+# layouts (one per Sysmon/Security event type), so shapes are learned from the
+# data rather than declared. A record is a fraction of the size of a dict with
+# the same fields and supports the read-only mapping interface the engine uses
+# (get, [], in, keys/values/items). Field lookups are a Python call rather than
+# dict.get in C, so detection keeps using dicts; records are for events held in
+# bulk, such as the hour buffers of the telemetry store writer (up to 200k rows
+# waiting for a segment). They are not JSON serializable as-is: use to_dict()
+# (json would write the tuple as an array).
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from collections.abc import Mapping
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Distinct key layouts turned into classes; events of further layouts stay dicts
+MAX_SHAPES = 1024
+
+_tuple_getitem = tuple.__getitem__
+_tuple_iter = tuple.__iter__
+
+
+class EventRecord(tuple):
+    __slots__ = ()
+    fields: Tuple[str, ...] = ()
+    index: Dict[str, int] = {}
+
+    def get(self, name, default=None):
+        i = self.index.get(name)
+        return default if i is None else _tuple_getitem(self, i)
+
+    def __getitem__(self, name):
+        return _tuple_getitem(self, self.index[name])
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def keys(self):
+        return self.fields
+
+    def values(self):
+        return _tuple_iter(self)
+
+    def items(self):
+        return zip(self.fields, _tuple_iter(self))
+
+    def to_dict(self) -> dict:
+        return dict(zip(self.fields, _tuple_iter(self)))
+
+    def __eq__(self, other):
+        if isinstance(other, EventRecord):
+            other = other.to_dict()
+        return isinstance(other, Mapping) and self.to_dict() == dict(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def __reduce__(self):
+        # Shape classes are created at run time: pickle by field names and values
+        return make_record, (self.fields, tuple(_tuple_iter(self)))
+
+
+Mapping.register(EventRecord)
+
+_shapes: Dict[Tuple[str, ...], type] = {}
+
+
+def record_class(fields: Tuple[str, ...]) -> Optional[type]:
+    """The EventRecord class for a key layout (None once MAX_SHAPES are in use)."""
+    cls = _shapes.get(fields)
+    if cls is None:
+        if len(_shapes) >= MAX_SHAPES:
+            return None
+        cls = type(f"EventRecord{len(_shapes)}", (EventRecord,), {
+            "__slots__": (),
+            "fields": fields,
+            "index": {name: i for i, name in enumerate(fields)},
+        })
+        _shapes[fields] = cls
+    return cls
+
+
+def make_record(fields: Sequence[str], values: Sequence):
+    cls = record_class(tuple(fields))
+    return dict(zip(fields, values)) if cls is None else cls(values)
+
+
+def to_record(event: dict):
+    """A record with the event's fields (nested objects stay dicts)."""
+    cls = _shapes.get(tuple(event)) or record_class(tuple(event))
+    return event if cls is None else cls(event.values())
+
+
+def to_dict(event) -> dict:
+    return event.to_dict() if isinstance(event, EventRecord) else event
+
+
+# =============================================================================
+# Decoding
+# =============================================================================
+
+def _decode_each(lines: List[bytes], numbers: List[int]) -> Tuple[List[int], List[dict], int]:
+    kept, events, errors = [], [], 0
+    loads = json.loads
+    for i in numbers:
+        try:
+            event = loads(lines[i])
+        except ValueError:
+            errors += 1
+            continue
+        if isinstance(event, dict):
+            kept.append(i)
+            events.append(event)
+        else:
+            errors += 1
+    return kept, events, errors
+
+
+def decode_lines(lines: List[bytes], records: bool = False) -> Tuple[List[int], list, int]:
+    """(line numbers, events, errors) for a batch of NDJSON lines.
+
+    Blank lines are skipped silently; lines that are not JSON objects count as
+    errors. The batch is decoded as one array; if that fails (or does not yield
+    one object per line) it is decoded line by line to isolate the bad lines.
+    records=True returns EventRecords instead of dicts.
+    """
+    numbers = [i for i, line in enumerate(lines) if line and not line.isspace()]
+    errors = 0
+    try:
+        events = json.loads(b"[" + b",".join([lines[i] for i in numbers]) + b"]") if numbers else []
+        if len(events) != len(numbers) or not all(type(event) is dict for event in events):
+            raise ValueError("batch is not one object per line")
+    except ValueError:
+        numbers, events, errors = _decode_each(lines, numbers)
+    if records:
+        events = [to_record(event) for event in events]
+    return numbers, events, errors
+
+
+# =============================================================================
+# Benchmark
+# =============================================================================
+
+def _per_line(lines: List[bytes]) -> List[dict]:
+    loads = json.loads
+    return [loads(line) for line in lines if line.strip()]
+
+
+def _measure(decode, lines: List[bytes], batch_size: int) -> Tuple[float, float, list]:
+    """(seconds, retained bytes per event, events) decoding all lines in batches."""
+    gc.collect()
+    start = time.perf_counter()
+    events = []
+    for i in range(0, len(lines), batch_size):
+        events.extend(decode(lines[i:i + batch_size]))
+    seconds = time.perf_counter() - start
+    del events
+    gc.collect()
+    tracemalloc.start()
+    events = []
+    for i in range(0, len(lines), batch_size):
+        events.extend(decode(lines[i:i + batch_size]))
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return seconds, retained / max(len(events), 1), events
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare dict and record event decoding on NDJSON telemetry")
+    parser.add_argument("events", help="NDJSON telemetry file")
+    parser.add_argument("--limit", type=int, default=200000, help="Lines to decode")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    from llm_reporting.engine.bundle import load_or_build
+
+    lines = []
+    with open(args.events, "rb") as f:
+        for line in f:
+            lines.append(line)
+            if len(lines) >= args.limit:
+                break
+    engine = load_or_build().engine
+    paths = [
+        ("json.loads per line (dicts)", _per_line),
+        ("batched decode (dicts)", lambda batch: decode_lines(batch)[1]),
+        ("batched decode (records)", lambda batch: decode_lines(batch, records=True)[1]),
+    ]
+    print(f"{len(lines)} lines, batches of {args.batch_size}")
+    print(f"{'path':<30} {'decode ev/s':>12} {'bytes/event':>12} {'detect ev/s':>12}")
+    baseline = None
+    for name, decode in paths:
+        seconds, per_event, events = _measure(decode, lines, args.batch_size)
+        start = time.perf_counter()
+        engine.process_batch(events)
+        detect = time.perf_counter() - start
+        rate = len(events) / seconds
+        baseline = baseline or (rate, per_event)
+        print(f"{name:<30} {rate:>12,.0f} {per_event:>12,.0f} {len(events) / detect:>12,.0f}"
+              f"   ({rate / baseline[0]:.2f}x speed, {per_event / baseline[1]:.2f}x memory)")
+
+
+if __name__ == "__main__":
+    main()
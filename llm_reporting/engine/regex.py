@@ -0,0 +1,416 @@
+# regex.py - Cached Sigma `|re` patterns with literal prefilters and CPU accounting
+import logging
+import re
+from time import perf_counter_ns
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+logger = logging.getLogger(__name__)
+
+# Risky patterns only ever run over this many characters at a time: longer values
+# are searched in windows overlapping by half, so any match up to half this long
+# is found wherever it sits in the value
+RISKY_INPUT_LIMIT = 4096
+# Beyond this many windows, or once the windows searched so far took this long,
+# the rest of a value is left unevaluated rather than searched
+MAX_RISKY_WINDOWS = 64
+RISKY_BUDGET_MS = 50
+# Repeats with a max above this are treated as unbounded
+UNBOUNDED = 64
+
+_LITERAL = sre_constants.LITERAL
+_NOT_LITERAL = sre_constants.NOT_LITERAL
+_ANY = sre_constants.ANY
+_IN = sre_constants.IN
+_NEGATE = sre_constants.NEGATE
+_RANGE = sre_constants.RANGE
+_CATEGORY = sre_constants.CATEGORY
+_SUBPATTERN = sre_constants.SUBPATTERN
+_BRANCH = sre_constants.BRANCH
+_AT = sre_constants.AT
+_REPEATS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT)
+_POSSESSIVE = getattr(sre_constants, "POSSESSIVE_REPEAT", None)
+_ATOMIC = getattr(sre_constants, "ATOMIC_GROUP", None)
+_ASSERTS = (sre_constants.ASSERT, sre_constants.ASSERT_NOT)
+# Zero-width tests that look at what follows the current position
+_END_ATS = {getattr(sre_constants, name) for name in (
+    "AT_END", "AT_END_LINE", "AT_END_STRING", "AT_BOUNDARY", "AT_NON_BOUNDARY",
+    "AT_LOC_BOUNDARY", "AT_LOC_NON_BOUNDARY", "AT_UNI_BOUNDARY", "AT_UNI_NON_BOUNDARY",
+) if hasattr(sre_constants, name)}
+
+# Searches of risky patterns that found no match in the windows they could run but
+# could not rule one out (a longer match, or too long a value); see unevaluated_searches()
+_unevaluated = 0
+
+
+class RegexRiskError(ValueError):
+    pass
+
+
+# =============================================================================
+# Load-time analysis
+# =============================================================================
+
+# Character sets are approximated over Latin-1 plus one stand-in for everything above it
+_OTHER = 256
+_ALL_CHARS = frozenset(range(_OTHER + 1))
+
+
+def _category_chars(pattern: str) -> FrozenSet[int]:
+    chars = {c for c in range(_OTHER) if re.match(pattern, chr(c))}
+    if re.match(pattern, "\u4e00"):
+        chars.add(_OTHER)
+    return frozenset(chars)
+
+
+_CATEGORIES = {getattr(sre_constants, name): _category_chars(pattern) for name, pattern in (
+    ("CATEGORY_DIGIT", r"\d"), ("CATEGORY_NOT_DIGIT", r"\D"),
+    ("CATEGORY_SPACE", r"\s"), ("CATEGORY_NOT_SPACE", r"\S"),
+    ("CATEGORY_WORD", r"\w"), ("CATEGORY_NOT_WORD", r"\W"),
+)}
+
+
+def _best(candidates: List[Set[str]]) -> Optional[Set[str]]:
+    """Pick the alternative set whose shortest literal is longest (most selective)."""
+    candidates = [c for c in candidates if c and all(c)]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda c: (min(len(s) for s in c), -len(c)))
+
+
+def _required(items) -> Optional[Set[str]]:
+    """Literals of which at least one must occur in any match of a parsed sequence."""
+    candidates: List[Set[str]] = []
+    run: List[str] = []
+
+    def close_run():
+        if run:
+            candidates.append({"".join(run)})
+            run.clear()
+
+    for op, av in items:
+        if op == _LITERAL:
+            run.append(chr(av))
+            continue
+        if op == _AT:
+            continue  # zero-width, keeps neighbouring literals contiguous
+        close_run()
+        if op == _SUBPATTERN:
+            candidates.append(_required(av[-1]))
+        elif _ATOMIC is not None and op == _ATOMIC:
+            candidates.append(_required(av))
+        elif op == _BRANCH:
+            alternatives: Set[str] = set()
+            for branch in av[1]:
+                found = _required(branch)
+                if not found:
+                    alternatives = set()
+                    break
+                alternatives |= found
+            candidates.append(alternatives)
+        elif op in _REPEATS or (_POSSESSIVE is not None and op == _POSSESSIVE):
+            low, _high, body = av
+            if low >= 1:
+                candidates.append(_required(body))
+    close_run()
+    return _best(candidates)
+
+
+def required_literals(pattern: str, flags: int = 0) -> Tuple[str, ...]:
+    """Return literals such that every match contains at least one of them.
+
+    An empty tuple means no useful prefilter could be derived.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error:
+        return ()
+    found = _required(list(parsed))
+    if not found:
+        return ()
+    if (flags | parsed.state.flags) & re.IGNORECASE:
+        found = {s.lower() for s in found}
+    return tuple(sorted(found, key=len, reverse=True))
+
+
+def _is_unbounded(op, av) -> bool:
+    return op in _REPEATS and av[1] > UNBOUNDED
+
+
+def _first_items(items) -> list:
+    for op, av in items:
+        if op == _AT:
+            continue
+        if op == _SUBPATTERN:
+            return _first_items(av[-1])
+        return [(op, av)]
+    return []
+
+
+def _branches_overlap(branches) -> bool:
+    seen = set()
+    for branch in branches:
+        first = _first_items(branch)
+        if not first or first[0][0] != _LITERAL:
+            return True  # empty branch or a class/any: assume it can overlap
+        if first[0][1] in seen:
+            return True
+        seen.add(first[0][1])
+    return False
+
+
+def _contains_repeat(items) -> bool:
+    for op, av in items:
+        if _is_unbounded(op, av):
+            return True
+        if op == _SUBPATTERN and _contains_repeat(av[-1]):
+            return True
+        if op == _BRANCH and any(_contains_repeat(b) for b in av[1]):
+            return True
+    return False
+
+
+def _class_chars(items) -> FrozenSet[int]:
+    chars: Set[int] = set()
+    negate = False
+    for op, av in items:
+        if op == _NEGATE:
+            negate = True
+        elif op == _LITERAL:
+            chars.add(min(av, _OTHER))
+        elif op == _RANGE:
+            chars.update(range(av[0], min(av[1], _OTHER - 1) + 1))
+            if av[1] >= _OTHER:
+                chars.add(_OTHER)
+        elif op == _CATEGORY:
+            chars |= _CATEGORIES.get(av, _ALL_CHARS)
+    return _ALL_CHARS - chars if negate else frozenset(chars)
+
+
+def _chars(items, fold_case: bool) -> FrozenSet[int]:
+    """Characters a parsed sequence can consume (over-approximated)."""
+    chars: Set[int] = set()
+    for op, av in items:
+        if op == _LITERAL:
+            chars.add(min(av, _OTHER))
+        elif op == _NOT_LITERAL:
+            chars |= _ALL_CHARS - {av}
+        elif op == _IN:
+            chars |= _class_chars(av)
+        elif op == _SUBPATTERN:
+            chars |= _chars(av[-1], fold_case)
+        elif _ATOMIC is not None and op == _ATOMIC:
+            chars |= _chars(av, fold_case)
+        elif op == _BRANCH:
+            for branch in av[1]:
+                chars |= _chars(branch, fold_case)
+        elif op in _REPEATS or (_POSSESSIVE is not None and op == _POSSESSIVE):
+            chars |= _chars(av[2], fold_case)
+        elif op in (_AT, *_ASSERTS):
+            continue  # zero-width
+        else:
+            return _ALL_CHARS  # ., backreferences...
+    if fold_case:
+        for c in list(chars):
+            if c < _OTHER:
+                chars.update(min(ord(v), _OTHER) for v in (chr(c).lower(), chr(c).upper()) if len(v) == 1)
+    return frozenset(chars)
+
+
+def _scan_risks(items, inside_repeat: bool, fold_case: bool, risks: List[str]):
+    # Characters of the unbounded repeat right before the current item, if any
+    previous: Optional[FrozenSet[int]] = None
+    for op, av in items:
+        if op in _ASSERTS:
+            _scan_risks(av[1], inside_repeat, fold_case, risks)
+            continue
+        if op == _SUBPATTERN:
+            _scan_risks(av[-1], inside_repeat, fold_case, risks)
+            previous = None
+            continue
+        if op == _BRANCH:
+            if inside_repeat and _branches_overlap(av[1]):
+                risks.append("overlapping alternation inside an unbounded repeat")
+            for branch in av[1]:
+                _scan_risks(branch, inside_repeat, fold_case, risks)
+            previous = None
+            continue
+        if _is_unbounded(op, av):
+            body = list(av[2])
+            if _contains_repeat(body):
+                risks.append("nested unbounded quantifiers")
+            _scan_risks(body, True, fold_case, risks)
+            chars = _chars(body, fold_case)
+            # \w+\d+ can split a run of digits n ways; \w+\s+\w+ has one split only
+            if previous is not None and previous & chars:
+                risks.append("adjacent unbounded quantifiers over overlapping characters")
+            previous = chars
+        elif op != _AT:
+            previous = None
+
+
+def _looks_ahead(items) -> bool:
+    """Whether a match can depend on the text after it ($, \\b, lookahead...)."""
+    for op, av in items:
+        if op == _AT and av in _END_ATS:
+            return True
+        if op in _ASSERTS and (av[0] >= 0 or _looks_ahead(av[1])):
+            return True
+        if op == _SUBPATTERN and _looks_ahead(av[-1]):
+            return True
+        if _ATOMIC is not None and op == _ATOMIC and _looks_ahead(av):
+            return True
+        if op == _BRANCH and any(_looks_ahead(b) for b in av[1]):
+            return True
+        if (op in _REPEATS or (_POSSESSIVE is not None and op == _POSSESSIVE)) and _looks_ahead(av[2]):
+            return True
+    return False
+
+
+def backtracking_risks(pattern: str, flags: int = 0) -> List[str]:
+    """Heuristically flag patterns prone to catastrophic backtracking."""
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except re.error as e:
+        return [f"invalid pattern: {e}"]
+    risks: List[str] = []
+    _scan_risks(list(parsed), False, bool((flags | parsed.state.flags) & re.IGNORECASE), risks)
+    return sorted(set(risks))
+
+
+# =============================================================================
+# Compiled patterns
+# =============================================================================
+
+def unevaluated_searches() -> int:
+    """Running count of searches that could neither find nor rule out a match.
+
+    The engine compares it around an event to raise "unevaluated" alerts instead
+    of silently missing a match hidden deep in an over-long value.
+    """
+    return _unevaluated
+
+
+class CompiledPattern:
+    """A compiled regex with its literal prefilter and per-pattern CPU counters."""
+
+    __slots__ = ("pattern", "flags", "regex", "literals", "fold_case", "risks", "looks_ahead",
+                 "calls", "skipped", "matches", "windowed", "unevaluated", "ns")
+
+    def __init__(self, pattern: str, flags: int = 0):
+        self.pattern = pattern
+        self.flags = flags
+        self.regex = re.compile(pattern, flags)
+        self.fold_case = bool(self.regex.flags & re.IGNORECASE)
+        self.literals = required_literals(pattern, flags)
+        self.risks = tuple(backtracking_risks(pattern, flags))
+        self.looks_ahead = bool(self.risks) and _looks_ahead(list(sre_parse.parse(pattern, flags)))
+        self.calls = self.skipped = self.matches = self.windowed = self.unevaluated = self.ns = 0
+
+    def __reduce__(self):
+        # Unpickled patterns (e.g. from a rule bundle) go back through the shared cache
+        return (compile_pattern, (self.pattern, self.flags))
+
+    def search(self, text: str) -> bool:
+        self.calls += 1
+        if self.literals:
+            haystack = text.lower() if self.fold_case else text
+            for literal in self.literals:
+                if literal in haystack:
+                    break
+            else:
+                self.skipped += 1
+                return False
+        start = perf_counter_ns()
+        if self.risks and len(text) > RISKY_INPUT_LIMIT:
+            found = self._search_windows(text)
+        else:
+            found = self.regex.search(text) is not None
+        self.ns += perf_counter_ns() - start
+        if found:
+            self.matches += 1
+        return found
+
+    def _search_windows(self, text: str) -> bool:
+        # pos/endpos keep ^, \A and lookbehinds seeing the real text before a window;
+        # only what follows its end is cut off
+        global _unevaluated
+        self.windowed += 1
+        search = self.regex.search
+        size = len(text)
+        step = RISKY_INPUT_LIMIT // 2
+        deadline = perf_counter_ns() + RISKY_BUDGET_MS * 1_000_000
+        starts = range(0, size - step, step)
+        for pos in starts[:MAX_RISKY_WINDOWS]:
+            end = min(pos + RISKY_INPUT_LIMIT, size)
+            m = search(text, pos, end)
+            # A match ending at a cut may depend on it ($, \b...): a real one that
+            # short is found again by the next window
+            if m is not None and (end == size or m.end() < end or not self.looks_ahead):
+                return True
+            if end == size:
+                return False
+            if perf_counter_ns() > deadline:
+                break
+        if not self.unevaluated:
+            logger.warning("Regex %r: a %d-character value could not be fully evaluated (windows of %d, "
+                           "%d ms budget); affected events raise unevaluated alerts, counted in regex_stats",
+                           self.pattern, size, RISKY_INPUT_LIMIT, RISKY_BUDGET_MS)
+        self.unevaluated += 1
+        _unevaluated += 1
+        return False
+
+    def stats(self) -> dict:
+        executed = self.calls - self.skipped
+        return {
+            "pattern": self.pattern,
+            "literals": list(self.literals),
+            "risks": list(self.risks),
+            "calls": self.calls,
+            "prefilter_skipped": self.skipped,
+            "executed": executed,
+            "matches": self.matches,
+            "windowed_inputs": self.windowed,
+            "unevaluated_inputs": self.unevaluated,
+            "cpu_ms": round(self.ns / 1e6, 3),
+            "ns_per_exec": round(self.ns / executed, 1) if executed else 0.0,
+        }
+
+    def reset_stats(self):
+        self.calls = self.skipped = self.matches = self.windowed = self.unevaluated = self.ns = 0
+
+
+_cache: Dict[Tuple[str, int], CompiledPattern] = {}
+
+
+def compile_pattern(pattern: str, flags: int = 0, strict: bool = False) -> CompiledPattern:
+    """Compile a pattern once per process; identical patterns share counters."""
+    key = (pattern, flags)
+    compiled = _cache.get(key)
+    if compiled is None:
+        try:
+            compiled = CompiledPattern(pattern, flags)
+        except re.error as e:
+            raise RegexRiskError(f"Invalid regex {pattern!r}: {e}") from None
+        if compiled.risks:
+            message = f"Regex {pattern!r} may backtrack catastrophically: {', '.join(compiled.risks)}"
+            if strict:
+                raise RegexRiskError(message)
+            logger.warning(message)
+        _cache[key] = compiled
+    return compiled
+
+
+def cached_patterns() -> List[CompiledPattern]:
+    return list(_cache.values())
+
+
+def regex_stats() -> List[dict]:
+    """Per-pattern accounting, most expensive first."""
+    return sorted((p.stats() for p in _cache.values()), key=lambda s: s["cpu_ms"], reverse=True)
@@ -0,0 +1,183 @@
+# reload.py - Hot reload of the rule tree with incremental recompilation
+import hashlib
+import logging
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from llm_reporting.engine.compiler import RuleCompileError, compile_rule
+from llm_reporting.engine.correlation import CorrelationRule
+from llm_reporting.engine.engine import DetectionEngine
+from llm_reporting.engine.rules import RULE_DIR, list_rule_files, load_rule_file, normalize_rule
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 2.0
+
+# (mtime_ns, size) is checked first; the content hash only when that changes
+Signature = Tuple[int, int, str]
+
+
+class RuleSet:
+    """An immutable, versioned snapshot the matcher serves from."""
+
+    __slots__ = ("version", "engine", "errors")
+
+    def __init__(self, version: int, engine: DetectionEngine, errors: Dict[str, str]):
+        self.version = version
+        self.engine = engine
+        self.errors = errors
+
+
+def _digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def compile_file(path: str):
+    data = load_rule_file(path)
+    if not isinstance(data, dict):
+        raise RuleCompileError("File does not contain a rule mapping")
+    rule = normalize_rule(data, path)
+    if "correlation" in rule:
+        return CorrelationRule(rule)
+    return compile_rule(rule)
+
+
+class LiveEngine:
+    """Serves detections while watching the rule tree for edits.
+
+    A background thread polls the tree; only files whose content changed are
+    re-parsed and recompiled. The new engine is assembled off to the side and
+    published with a single reference swap, so in-flight batches finish on the
+    old rule set and no batch ever sees a half-built one. Every alert carries
+    the `ruleset_version` that produced it.
+    """
+
+    def __init__(self, rule_dir: str = RULE_DIR, poll_interval: float = POLL_INTERVAL,
+                 bundle_path: Optional[str] = None):
+        self.rule_dir = rule_dir
+        self.poll_interval = poll_interval
+        self._signatures: Dict[str, Signature] = {}
+        self._compiled: Dict[str, object] = {}
+        self._errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._current = RuleSet(0, DetectionEngine([]), {})
+        if bundle_path:
+            self._seed_from_bundle(bundle_path)
+        self.reload(force=True)
+
+    @property
+    def ruleset(self) -> RuleSet:
+        return self._current
+
+    @property
+    def version(self) -> int:
+        return self._current.version
+
+    @property
+    def engine(self) -> DetectionEngine:
+        return self._current.engine
+
+    # -------------------------------------------------------------------------
+    # Matching
+    # -------------------------------------------------------------------------
+
+    def process_batch(self, events: Iterable[dict], normalized: bool = False) -> List[dict]:
+        ruleset = self._current  # read once: the whole batch uses one snapshot
+        alerts = ruleset.engine.process_batch(events, normalized)
+        for alert in alerts:
+            alert["ruleset_version"] = ruleset.version
+        return alerts
+
+    def process(self, event: dict) -> List[dict]:
+        return self.process_batch((event,))
+
+    # -------------------------------------------------------------------------
+    # Reloading
+    # -------------------------------------------------------------------------
+
+    def _seed_from_bundle(self, bundle_path: str):
+        from llm_reporting.engine.bundle import is_current, load_bundle
+
+        if not is_current(bundle_path, self.rule_dir):
+            return
+        engine = load_bundle(bundle_path).engine
+        for rule in list(engine.rules) + list(engine.correlations):
+            if rule.path and os.path.exists(rule.path):
+                st = os.stat(rule.path)
+                self._signatures[rule.path] = (st.st_mtime_ns, st.st_size, _digest(rule.path))
+                self._compiled[rule.path] = rule
+
+    def _scan(self) -> Tuple[List[str], List[str]]:
+        """Return (changed_or_new, removed) paths since the last scan."""
+        changed = []
+        seen = set()
+        for path in list_rule_files(self.rule_dir):
+            seen.add(path)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            old = self._signatures.get(path)
+            if old and old[0] == st.st_mtime_ns and old[1] == st.st_size:
+                continue
+            digest = _digest(path)
+            self._signatures[path] = (st.st_mtime_ns, st.st_size, digest)
+            if old is None or old[2] != digest or path in self._errors:
+                changed.append(path)
+        removed = [path for path in self._signatures if path not in seen]
+        for path in removed:
+            del self._signatures[path]
+        return changed, removed
+
+    def reload(self, force: bool = False) -> bool:
+        """Recompile changed files and publish a new rule set if anything changed."""
+        with self._lock:
+            changed, removed = self._scan()
+            if not changed and not removed and not force:
+                return False
+            for path in removed:
+                self._compiled.pop(path, None)
+                self._errors.pop(path, None)
+            for path in changed:
+                try:
+                    self._compiled[path] = compile_file(path)
+                    self._errors.pop(path, None)
+                except Exception as e:
+                    # Keep serving the last good version of a broken file (half-saved YAML,
+                    # bad structure, risky regex...) without losing the other edits of this poll
+                    self._errors[path] = str(e)
+                    logger.error(f"❌ Rule {path} not reloaded: {e}")
+
+            rules = [c for c in self._compiled.values() if not isinstance(c, CorrelationRule)]
+            correlations = [c for c in self._compiled.values() if isinstance(c, CorrelationRule)]
+            engine = DetectionEngine(rules, correlations)
+            old = self._current
+            engine.correlator.adopt(old.engine.correlator)
+            self._current = RuleSet(old.version + 1, engine, dict(self._errors))
+            logger.info(f"✅ Rule set v{self._current.version}: {len(changed)} recompiled, "
+                        f"{len(removed)} removed, {len(rules)} rules live")
+            return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"❌ Rule reload failed: {e}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="rule-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,66 @@
+# rules.py - Load and normalize Sigma rules from the detection rule tree
+import os
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RULE_DIR = os.path.join(BASE_DIR, "detection_rules")
+RULE_EXTENSIONS = (".yml", ".yaml")
+
+# Logsource fields that take part in event routing, in key order
+LOGSOURCE_FIELDS = ("product", "category", "service")
+
+# Use the libyaml-backed loader when PyYAML was built with it
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def list_rule_files(rule_dir: str = RULE_DIR) -> List[str]:
+    """Return every Sigma YAML file below rule_dir, sorted for stable ordering."""
+    paths = []
+    for root, _dirs, files in os.walk(rule_dir):
+        for name in files:
+            if name.endswith(RULE_EXTENSIONS):
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def load_rule_file(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return yaml.load(f, Loader=YamlLoader)
+
+
+def logsource_key(logsource: Optional[dict]) -> Tuple[Optional[str], ...]:
+    """Reduce a logsource mapping to a (product, category, service) tuple, None = any."""
+    logsource = logsource or {}
+    key = []
+    for field in LOGSOURCE_FIELDS:
+        value = logsource.get(field)
+        key.append(str(value).lower() if value is not None else None)
+    return tuple(key)
+
+
+def normalize_rule(data: dict, path: Optional[str] = None) -> dict:
+    """Return a copy of a parsed rule with the fields the engine relies on filled in."""
+    rule = dict(data)
+    rule["logsource"] = {k: str(v).lower() for k, v in (rule.get("logsource") or {}).items()}
+    rule["tags"] = [str(t).lower() for t in rule.get("tags") or []]
+    rule["fields"] = list(rule.get("fields") or [])
+    rule["level"] = str(rule.get("level") or "medium").lower()
+    if path is not None:
+        rule["path"] = path
+        rule.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    return rule
+
+
+def load_rules(rule_dir: str = RULE_DIR) -> List[dict]:
+    rules = []
+    for path in list_rule_files(rule_dir):
+        data = load_rule_file(path)
+        if isinstance(data, dict):
+            rules.append(normalize_rule(data, path))
+    return rules
+
+
+def rules_by_id(rules: List[dict]) -> Dict[str, dict]:
+    return {str(rule.get("id")): rule for rule in rules}
@@ -0,0 +1,348 @@
+# shard.py - Sharded multi-process detection across CPU cores
+#
+# The parent partitions each batch by a stable key (host by default, or e.g.
+# process GUID) and hands shard i to worker process i over a pipe. Workers hold
+# the compiled engine - inherited copy-on-write from the parent under fork, so
+# the rule bundle is loaded once and shared read-only - normalize and match
+# their shard, and return only (position, matched rule numbers, normalized
+# event) for events that hit. Batches travel as marshal data: events decoded
+# from JSON are plain dicts, lists, strings and numbers, which marshal encodes
+# several times faster than pickle (pickle remains the fallback for anything
+# else). The parent merges the shards back into input
+# order, builds the alerts and runs correlation itself, so the output is the
+# same ordered alert list DetectionEngine.process_batch produces, including
+# correlations whose group-by spans several shards.
+import argparse
+import gc
+import heapq
+import marshal
+import multiprocessing
+import os
+import pickle
+import re
+import time
+import traceback
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from llm_reporting.engine.bundle import BUNDLE_PATH, load_or_build
+from llm_reporting.engine.engine import DetectionEngine, make_alert
+from llm_reporting.engine.fieldmap import FieldMappings
+from llm_reporting.engine.records import decode_lines
+from llm_reporting.engine.regex import unevaluated_searches
+from llm_reporting.engine.rules import RULE_DIR
+
+DEFAULT_KEY = ("Computer",)
+# Batches smaller than this are matched in the parent: IPC would cost more than it saves
+INLINE_BELOW = 512
+# Distinct shard keys remembered (process GUIDs are high-cardinality)
+KEY_CACHE = 100_000
+
+
+class ShardError(RuntimeError):
+    pass
+
+
+def _parse_lines(data: bytes) -> Tuple[List[int], List[dict], int]:
+    """(line numbers, events, errors) for NDJSON lines; blank lines are skipped silently."""
+    return decode_lines(data.split(b"\n"))
+
+
+def _worker(conn, engine: DetectionEngine):
+    positions = {id(rule): i for i, rule in enumerate(engine.rules)}
+    route = engine.index.route
+    normalize_batch = engine.fields.normalize_batch
+    while True:
+        try:
+            data = conn.recv_bytes()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if not data:
+            return
+        try:
+            errors = 0
+            if data[:1] == b"L":
+                numbers, events, errors = _parse_lines(data[1:])
+                events = normalize_batch(events)
+            else:
+                events, normalized = _loads(data)
+                numbers = range(len(events))
+                if not normalized:
+                    events = normalize_batch(events)
+            hits = []
+            for i, event in zip(numbers, events):
+                unevaluated = unevaluated_searches()
+                matched = [positions[id(rule)] for rule in route(event) if rule.plan.match(event)]
+                if unevaluated_searches() != unevaluated:
+                    # Negative numbers carry unevaluated (not matched) rules
+                    matched += [~positions[id(rule)] for rule in engine.unevaluated_rules(event)]
+                if matched:
+                    hits.append((i, matched, event))
+            reply = (True, hits, errors)
+        except Exception:
+            reply = (False, traceback.format_exc(), 0)
+        conn.send_bytes(_dumps(reply))
+
+
+def _dumps(obj) -> bytes:
+    # Parent and workers run the same interpreter, so marshal's format is shared
+    try:
+        return b"M" + marshal.dumps(obj)
+    except ValueError:
+        return b"P" + pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _loads(data: bytes):
+    return marshal.loads(data[1:]) if data[:1] == b"M" else pickle.loads(data[1:])
+
+
+def _key_spellings(fields: FieldMappings, key_fields: Sequence[str]) -> List[Tuple[str, ...]]:
+    """Per key field, its canonical name and raw aliases, so unnormalized events shard the same."""
+    return [(canonical,) + tuple(raw for raw, name in fields.aliases.items() if name == canonical)
+            for canonical in key_fields]
+
+
+class ShardedEngine:
+    """Drop-in for DetectionEngine.process_batch that fans batches out to worker processes."""
+
+    def __init__(self, engine: Optional[DetectionEngine] = None, workers: Optional[int] = None,
+                 key_fields: Sequence[str] = DEFAULT_KEY, inline_below: int = INLINE_BELOW):
+        self.engine = engine or load_or_build().engine
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        spellings = _key_spellings(self.engine.fields, key_fields)
+        self.key_fields = tuple(dict.fromkeys(name for group in spellings for name in group))
+        self.inline_below = inline_below
+        self.correlator = self.engine.correlator
+        self._shard_of: Dict[str, int] = {}
+        self._turn = 0
+        self._conns = []
+        self._procs = []
+        # One pattern per key field for raw NDJSON lines, tried in priority order
+        self._key_res = [re.compile(rb'"(?:' + b"|".join(re.escape(name.encode("utf-8")) for name in group)
+                                    + rb')"\s*:\s*"((?:[^"\\]|\\.)*)"') for group in spellings]
+        self.shard_events = [0] * self.workers
+        self.inline_events = 0
+        self.parse_errors = 0
+        self.batches = 0
+
+    @property
+    def fields(self) -> FieldMappings:
+        return self.engine.fields
+
+    @property
+    def rules(self):
+        return self.engine.rules
+
+    def start(self) -> "ShardedEngine":
+        if self._procs:
+            return self
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        # Move everything allocated so far (the engine included) out of the
+        # collector's reach, so forked workers do not dirty those pages
+        gc.freeze()
+        for n in range(self.workers):
+            parent, child = context.Pipe()
+            process = context.Process(target=_worker, args=(child, self.engine), name=f"detect-{n}", daemon=True)
+            process.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(process)
+        gc.unfreeze()
+        return self
+
+    def stop(self):
+        for conn in self._conns:
+            try:
+                conn.send_bytes(b"")
+            except OSError:
+                pass
+            conn.close()
+        for process in self._procs:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        self._conns, self._procs = [], []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def shard(self, event: dict) -> int:
+        for field in self.key_fields:
+            key = event.get(field)
+            if key is not None:
+                break
+        else:
+            # No key: spread evenly rather than piling onto one shard
+            self._turn = (self._turn + 1) % self.workers
+            return self._turn
+        key = str(key)
+        shard = self._shard_of.get(key)
+        if shard is None:
+            if len(self._shard_of) >= KEY_CACHE:
+                self._shard_of.clear()
+            # crc32, not hash(): str hashes are salted per process
+            shard = self._shard_of[key] = zlib.crc32(key.encode("utf-8")) % self.workers
+        return shard
+
+    def _line_key(self, line: bytes) -> int:
+        for pattern in self._key_res:
+            m = pattern.search(line)
+            if m is not None:
+                return zlib.crc32(m.group(1)) % self.workers
+        self._turn = (self._turn + 1) % self.workers
+        return self._turn
+
+    def process_batch(self, events: Iterable[dict], normalized: bool = False) -> List[dict]:
+        events = events if isinstance(events, list) else list(events)
+        self.batches += 1
+        if not self._procs or len(events) < self.inline_below:
+            self.inline_events += len(events)
+            return self.engine.process_batch(events, normalized)
+        shards: List[List[dict]] = [[] for _ in range(self.workers)]
+        origins: List[List[int]] = [[] for _ in range(self.workers)]
+        shard = self.shard
+        for position, event in enumerate(events):
+            n = shard(event)
+            shards[n].append(event)
+            origins[n].append(position)
+        return self._dispatch([_dumps((part, normalized)) if part else None for part in shards], shards, origins)
+
+    def process_lines(self, lines: List[bytes]) -> List[dict]:
+        """Alerts for raw NDJSON lines, parsed in the workers as well.
+
+        The shard key is read straight from the line bytes, so the parent does
+        no JSON decoding at all; invalid lines are counted in parse_errors.
+        """
+        self.batches += 1
+        shards: List[List[bytes]] = [[] for _ in range(self.workers)]
+        origins: List[List[int]] = [[] for _ in range(self.workers)]
+        line_key = self._line_key
+        for position, line in enumerate(lines):
+            if line[-1:] == b"\n":
+                # Lines are re-framed with "\n" for the worker
+                line = line[:-1]
+            n = line_key(line)
+            shards[n].append(line)
+            origins[n].append(position)
+        if not self._procs:
+            self.inline_events += len(lines)
+            numbers, events, errors = _parse_lines(b"\n".join(lines))
+            self.parse_errors += errors
+            return self.engine.process_batch(events)
+        return self._dispatch([b"L" + b"\n".join(part) if part else None for part in shards], shards, origins)
+
+    def _dispatch(self, messages: List[Optional[bytes]], shards: list, origins: List[List[int]]) -> List[dict]:
+        busy = []
+        for n, message in enumerate(messages):
+            if message is not None:
+                self.shard_events[n] += len(shards[n])
+                self._conns[n].send_bytes(message)
+                busy.append(n)
+
+        merged = []
+        error = None
+        for n in busy:
+            try:
+                ok, payload, errors = _loads(self._conns[n].recv_bytes())
+            except (EOFError, OSError) as e:
+                ok, payload, errors = False, f"worker exited ({e!r})", 0
+            if not ok:
+                error = error or f"Detection worker {n} failed: {payload}"
+                continue
+            self.parse_errors += errors
+            origin = origins[n]
+            merged.append([(origin[i], matched, event) for i, matched, event in payload])
+        if error:
+            raise ShardError(error)
+
+        # Each shard's hits are already in input order: a k-way merge restores the global order
+        alerts = []
+        rules = self.engine.rules
+        correlate = self.correlator.process if self.correlator else None
+        for _position, matched, event in heapq.merge(*merged, key=lambda hit: hit[0]):
+            for number in matched:
+                if number < 0:
+                    alerts.append(make_alert(rules[~number], event, unevaluated=True))
+                    continue
+                alert = make_alert(rules[number], event)
+                alerts.append(alert)
+                if correlate is not None:
+                    alerts.extend(correlate(alert))
+        return alerts
+
+    def stats(self) -> dict:
+        total = sum(self.shard_events)
+        return {
+            "workers": self.workers,
+            "key_fields": list(self.key_fields),
+            "batches": self.batches,
+            "inline_events": self.inline_events,
+            "parse_errors": self.parse_errors,
+            "shard_events": list(self.shard_events),
+            # Largest shard relative to a perfectly even split (1.0 = balanced)
+            "skew": round(max(self.shard_events) * self.workers / total, 3) if total else 0.0,
+        }
+
+
+# =============================================================================
+# Replay benchmark
+# =============================================================================
+
+def _replay(process, batches: list) -> Tuple[float, List[dict]]:
+    start = time.perf_counter()
+    alerts = []
+    for batch in batches:
+        alerts.extend(process(batch))
+    return time.perf_counter() - start, alerts
+
+
+def _fingerprint(alerts: List[dict]) -> list:
+    return [(alert["rule_id"], alert["event"].get("EventRecordID")) for alert in alerts]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay NDJSON telemetry through sharded detection")
+    parser.add_argument("events", nargs="+", help="NDJSON telemetry files to replay")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1],
+                        help="Worker counts to benchmark")
+    parser.add_argument("--key", action="append", default=None,
+                        help=f"Shard key field (repeatable, first present wins; default {DEFAULT_KEY[0]})")
+    parser.add_argument("--batch-size", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=500000, help="Lines loaded into memory for the replay")
+    parser.add_argument("--rules", default=RULE_DIR)
+    parser.add_argument("--bundle", default=BUNDLE_PATH)
+    args = parser.parse_args()
+
+    lines: List[bytes] = []
+    for path in args.events:
+        with open(path, "rb") as f:
+            for line in f:
+                lines.append(line.rstrip(b"\r\n"))
+                if len(lines) >= args.limit:
+                    break
+        if len(lines) >= args.limit:
+            break
+    batches = [lines[i:i + args.batch_size] for i in range(0, len(lines), args.batch_size)]
+    print(f"Replaying {len(lines)} lines in {len(batches)} batches on {os.cpu_count()} CPU(s)")
+
+    # Baseline: parse and detect in this process, as the single-process pipeline does
+    engine = load_or_build(args.rules, args.bundle).engine
+    baseline, expected = _replay(lambda batch: engine.process_batch(_parse_lines(b"\n".join(batch))[1]), batches)
+    print(f"  single process: {len(lines) / baseline:>10,.0f} events/s  ({len(expected)} alerts)")
+    for workers in dict.fromkeys(args.workers):
+        engine = load_or_build(args.rules, args.bundle).engine
+        with ShardedEngine(engine, workers, args.key or DEFAULT_KEY) as sharded:
+            seconds, alerts = _replay(sharded.process_lines, batches)
+            stats = sharded.stats()
+        same = _fingerprint(alerts) == _fingerprint(expected)
+        print(f"  {workers:>2} worker(s):   {len(lines) / seconds:>10,.0f} events/s  "
+              f"speedup {baseline / seconds:4.2f}x  skew {stats['skew']:.2f}  "
+              f"{'✅ same alerts' if same else '❌ alerts differ'}")
+
+
+if __name__ == "__main__":
+    main()
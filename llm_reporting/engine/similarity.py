@@ -0,0 +1,241 @@
+# similarity.py - Near-duplicate rule search: MinHash signatures + LSH banding
+#
+# A rule is reduced to a set of features (logsource, fields, modifiers, literal
+# values and character trigrams of those literals). Signatures use one-permutation
+# MinHash (one hash per feature, binned, then densified), so building one costs
+# O(features) rather than O(features x permutations). LSH bands over the
+# signature give candidate rules in O(bands); candidates are ranked by exact
+# Jaccard similarity of their feature sets.
+#
+# A pair with similarity s shares at least one band with probability
+# 1 - (1 - s^ROWS)^BANDS. 64 bands of 2 rows put the threshold of that S-curve,
+# (1/BANDS)^(1/ROWS), at 0.125 - below MIN_SIMILARITY - so a pair at 0.2 is found
+# 93% of the time and one at 0.3 over 99.7%. Fewer, wider bands (32x4, threshold
+# ~0.42) would silently miss most matches between 0.2 and 0.4.
+import hashlib
+import os
+import threading
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import yaml
+
+from llm_reporting.engine.rules import RULE_DIR, list_rule_files, load_rule_file, normalize_rule
+
+NUM_BINS = 128
+BANDS = 64
+ROWS = NUM_BINS // BANDS
+# Default cut-off on exact Jaccard similarity; keep it above the LSH threshold
+MIN_SIMILARITY = 0.2
+NGRAM = 3
+_EMPTY = (1 << 64) - 1
+
+
+def _hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _literal_features(field: str, value, out: Set[str]):
+    text = str(value).lower()
+    out.add(f"v:{field}={text}")
+    stripped = text.strip("*?")
+    for i in range(len(stripped) - NGRAM + 1):
+        out.add(f"g:{stripped[i:i + NGRAM]}")
+
+
+def rule_features(rule: dict) -> FrozenSet[str]:
+    """Feature set describing what a rule looks at and for."""
+    out: Set[str] = set()
+    for key, value in (rule.get("logsource") or {}).items():
+        out.add(f"ls:{key}={str(value).lower()}")
+    detection = rule.get("detection") or {}
+    for name, block in detection.items():
+        if name in ("condition", "timeframe"):
+            continue
+        items = block if isinstance(block, list) else [block]
+        for item in items:
+            if isinstance(item, dict):
+                for spec, raw in item.items():
+                    field, *modifiers = str(spec).split("|")
+                    field = field.lower()
+                    out.add(f"f:{field}")
+                    for modifier in modifiers:
+                        out.add(f"m:{field}|{modifier}")
+                    for value in raw if isinstance(raw, list) else [raw]:
+                        _literal_features(field, value, out)
+            elif item is not None:
+                _literal_features("keyword", item, out)
+    correlation = rule.get("correlation")
+    if isinstance(correlation, dict):
+        out.add(f"c:{correlation.get('type')}")
+        for ref in correlation.get("rules") or []:
+            out.add(f"c:rule={ref}")
+        for field in correlation.get("group-by") or []:
+            out.add(f"c:by={str(field).lower()}")
+    return frozenset(out)
+
+
+def signature(hashes: Iterable[int]) -> Tuple[int, ...]:
+    """One-permutation MinHash with rotation densification for empty bins."""
+    bins = [_EMPTY] * NUM_BINS
+    for h in hashes:
+        b = h % NUM_BINS
+        v = h // NUM_BINS
+        if v < bins[b]:
+            bins[b] = v
+    if all(v == _EMPTY for v in bins):
+        return tuple(bins)
+    # Borrow from the next non-empty bin (circularly), offset by the distance so
+    # a borrowed value differs from its donor's
+    source = list(bins)
+    for i in range(NUM_BINS):
+        if source[i] != _EMPTY:
+            continue
+        distance = 1
+        while source[(i + distance) % NUM_BINS] == _EMPTY:
+            distance += 1
+        bins[i] = (source[(i + distance) % NUM_BINS] + distance * 0x9E3779B97F4A7C15) & ((1 << 61) - 1)
+    return tuple(bins)
+
+
+def _band_keys(sig: Tuple[int, ...]) -> List[int]:
+    return [hash(sig[b * ROWS:(b + 1) * ROWS]) for b in range(BANDS)]
+
+
+class _Entry:
+    __slots__ = ("key", "id", "title", "path", "features", "hashes", "bands")
+
+    def __init__(self, key: str, rule: dict):
+        self.key = key
+        self.id = str(rule.get("id") or key)
+        self.title = rule.get("title") or rule.get("name") or key
+        self.path = rule.get("path")
+        self.features = rule_features(rule)
+        self.hashes = frozenset(_hash(f) for f in self.features)
+        self.bands = _band_keys(signature(self.hashes))
+
+
+def jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    if not a and not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class SimilarityIndex:
+    """Top-k similar-rule search over the rule tree, updated file by file."""
+
+    def __init__(self, rule_dir: Optional[str] = RULE_DIR):
+        self.rule_dir = rule_dir
+        self.version = 0
+        self._entries: Dict[str, _Entry] = {}
+        self._by_id: Dict[str, str] = {}
+        self._buckets: List[Dict[int, Set[str]]] = [{} for _ in range(BANDS)]
+        self._signatures: Dict[str, Tuple[int, int]] = {}
+        self._errors: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        if rule_dir is not None:
+            self.refresh()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # -------------------------------------------------------------------------
+    # Updates
+    # -------------------------------------------------------------------------
+
+    def add_rule(self, key: str, rule: dict):
+        with self._lock:
+            self.remove_rule(key)
+            entry = _Entry(key, rule)
+            self._entries[key] = entry
+            self._by_id[entry.id] = key
+            for band, bucket_key in enumerate(entry.bands):
+                self._buckets[band].setdefault(bucket_key, set()).add(key)
+
+    def remove_rule(self, key: str):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return
+            if self._by_id.get(entry.id) == key:
+                del self._by_id[entry.id]
+            for band, bucket_key in enumerate(entry.bands):
+                bucket = self._buckets[band][bucket_key]
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band][bucket_key]
+
+    def refresh(self) -> bool:
+        """Re-index rule files whose (mtime, size) changed; returns True if anything did."""
+        if self.rule_dir is None:
+            return False
+        with self._lock:
+            changed = False
+            seen = set()
+            for path in list_rule_files(self.rule_dir):
+                seen.add(path)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                sig = (st.st_mtime_ns, st.st_size)
+                if self._signatures.get(path) == sig:
+                    continue
+                self._signatures[path] = sig
+                changed = True
+                try:
+                    data = load_rule_file(path)
+                except (OSError, ValueError, yaml.YAMLError) as e:
+                    self._errors[path] = str(e)
+                    continue
+                self._errors.pop(path, None)
+                if isinstance(data, dict):
+                    self.add_rule(path, normalize_rule(data, path))
+                else:
+                    self.remove_rule(path)
+            for path in [p for p in self._signatures if p not in seen]:
+                del self._signatures[path]
+                self._errors.pop(path, None)
+                self.remove_rule(path)
+                changed = True
+            if changed:
+                self.version += 1
+            return changed
+
+    # -------------------------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------------------------
+
+    def _query(self, probe: _Entry, k: int, min_similarity: float, exclude: Optional[str]) -> List[dict]:
+        with self._lock:
+            candidates: Set[str] = set()
+            for band, bucket_key in enumerate(probe.bands):
+                candidates.update(self._buckets[band].get(bucket_key, ()))
+            candidates.discard(exclude)
+            scored = []
+            for key in candidates:
+                entry = self._entries[key]
+                score = jaccard(probe.hashes, entry.hashes)
+                if score >= min_similarity:
+                    scored.append((score, entry))
+        scored.sort(key=lambda item: (-item[0], item[1].key))
+        return [{
+            "id": entry.id,
+            "title": entry.title,
+            "path": os.path.relpath(entry.path, self.rule_dir) if entry.path and self.rule_dir else entry.path,
+            "similarity": round(score, 4),
+            "shared": sorted(f for f in probe.features & entry.features if not f.startswith("g:"))[:20],
+        } for score, entry in scored[:k]]
+
+    def similar_to_id(self, rule_id: str, k: int = 5, min_similarity: float = MIN_SIMILARITY) -> Optional[List[dict]]:
+        """Rules similar to an indexed rule, or None if the id is unknown."""
+        key = self._by_id.get(str(rule_id))
+        if key is None:
+            return None
+        return self._query(self._entries[key], k, min_similarity, exclude=key)
+
+    def similar_to_rule(self, rule: dict, k: int = 5, min_similarity: float = MIN_SIMILARITY) -> List[dict]:
+        """Rules similar to a (possibly unsaved) rule mapping."""
+        return self._query(_Entry("<query>", normalize_rule(rule)), k, min_similarity, exclude=None)
+
+    def summary(self) -> dict:
+        return {"version": self.version, "rules": len(self._entries), "errors": dict(self._errors)}
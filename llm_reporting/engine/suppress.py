@@ -0,0 +1,228 @@
+# suppress.py - Alert deduplication and suppression over time-bucketed key state
+#
+# Each policy (window + key fields, see data/suppression.yml) keeps its keys in
+# a ring of time buckets: a key lives in the bucket of its first alert, and a
+# whole bucket is retired once it falls out of the window, emitting one summary
+# per key that had duplicates. Keys are the built-in hash of (rule, values) -
+# one int per live key - and per key only the first/last time, a count and the
+# summary fields are kept, never the alert event. Expiry is one deque pop per
+# bucket rather than per key, and max_keys retires buckets early so memory
+# stays bounded whatever the alert rate.
+import os
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import yaml
+
+from llm_reporting.engine.correlation import parse_timespan
+from llm_reporting.engine.events import event_time
+from llm_reporting.engine.rules import BASE_DIR, YamlLoader
+
+SUPPRESSION_PATH = os.path.join(BASE_DIR, "data", "suppression.yml")
+DEFAULT_WINDOW = 300.0
+DEFAULT_FIELDS = ("Computer",)
+MAX_KEYS = 100_000
+# Buckets per window: a key is released between window and window * (1 + 1/BUCKETS) after its first alert
+BUCKETS = 8
+
+SUMMARY_TYPE = "suppression_summary"
+
+
+class SuppressionError(ValueError):
+    pass
+
+
+class Policy:
+    __slots__ = ("window", "fields", "span")
+
+    def __init__(self, window=DEFAULT_WINDOW, fields=DEFAULT_FIELDS):
+        self.window = parse_timespan(window)
+        self.fields = tuple(fields if isinstance(fields, (list, tuple)) else [fields])
+        self.span = self.window / BUCKETS if self.window > 0 else 0.0
+
+    def __repr__(self):
+        return f"<Policy {self.window:g}s by {', '.join(self.fields) or 'rule'}>"
+
+
+class _Window:
+    """Live keys of one policy and the time buckets they expire in."""
+
+    __slots__ = ("policy", "max_keys", "live", "buckets")
+
+    def __init__(self, policy: Policy, max_keys: int):
+        self.policy = policy
+        self.max_keys = max_keys
+        # key -> [bucket, first_ts, last_ts, suppressed, summary fields]
+        self.live: Dict[int, list] = {}
+        # (bucket number, keys first seen in it), oldest first
+        self.buckets: deque = deque()
+
+    def retire(self, until: Optional[int], out: List[dict], stats: "SuppressionStats") -> int:
+        """Close buckets numbered below `until` (all when None); returns keys dropped."""
+        dropped = 0
+        live = self.live
+        buckets = self.buckets
+        while buckets and (until is None or buckets[0][0] < until):
+            _number, keys = buckets.popleft()
+            for key in keys:
+                entry = live.pop(key, None)
+                if entry is not None:
+                    dropped += 1
+                    if entry[3]:
+                        out.append(_summary(entry, self.policy))
+                        stats.summaries += 1
+        return dropped
+
+
+def _summary(entry: list, policy: Policy) -> dict:
+    _bucket, first, last, suppressed, (rule_id, rule_name, title, level, values) = entry
+    return {
+        "type": SUMMARY_TYPE,
+        "rule_id": rule_id,
+        "rule_name": rule_name,
+        "title": title,
+        "level": level,
+        "group": dict(zip(policy.fields, values)),
+        "suppressed": suppressed,
+        "first_ts": first,
+        "last_ts": last,
+        "window": policy.window,
+    }
+
+
+class SuppressionStats:
+    def __init__(self):
+        self.alerts_in = 0
+        self.passed = 0
+        self.suppressed = 0
+        self.summaries = 0
+        self.evicted = 0
+
+    def summary(self, live: int) -> dict:
+        return {
+            "alerts_in": self.alerts_in,
+            "passed": self.passed,
+            "suppressed": self.suppressed,
+            "summaries": self.summaries,
+            "live_keys": live,
+            "keys_evicted": self.evicted,
+        }
+
+
+class Suppressor:
+    """Drops repeated alerts per (rule, key fields) within a window.
+
+    process() returns the alerts that pass - the first per key, tagged with
+    "suppression" - with a summary record ({"type": SUMMARY_TYPE, "suppressed":
+    n, ...}) placed where a key's window closed, if it had duplicates. Time is the alert event's
+    own clock, so replays suppress exactly like live streams. flush() closes
+    every open window at the end of a stream.
+    """
+
+    def __init__(self, default: Optional[Policy] = None, rules: Optional[Dict[str, Policy]] = None,
+                 max_keys: int = MAX_KEYS):
+        self.default = default or Policy()
+        self.rules = dict(rules or {})
+        self.max_keys = max_keys
+        self.stats = SuppressionStats()
+        self._windows: Dict[Tuple, _Window] = {}
+        self._policy_of: Dict[Tuple, Policy] = {}
+
+    def policy(self, alert: dict) -> Policy:
+        ref = (alert.get("rule_id"), alert.get("rule_name"))
+        policy = self._policy_of.get(ref)
+        if policy is None:
+            policy = self.rules.get(ref[1]) or self.rules.get(ref[0]) or self.default
+            self._policy_of[ref] = policy
+        return policy
+
+    def _window(self, policy: Policy) -> _Window:
+        key = (policy.window, policy.fields)
+        window = self._windows.get(key)
+        if window is None:
+            window = self._windows[key] = _Window(policy, self.max_keys)
+        return window
+
+    def process(self, alerts: Iterable[dict]) -> List[dict]:
+        out: List[dict] = []
+        stats = self.stats
+        for alert in alerts:
+            stats.alerts_in += 1
+            policy = self.policy(alert)
+            if policy.window <= 0:
+                out.append(alert)
+                continue
+            window = self._window(policy)
+            event = alert.get("event") or {}
+            group = alert.get("group") or {}
+            ts = alert.get("ts")
+            if ts is None:
+                ts = event_time(event)
+            number = int(ts // policy.span)
+            # Summaries of closed windows go out ahead of later alerts for the same key
+            window.retire(number - BUCKETS, out, stats)
+
+            values = tuple(group.get(f, event.get(f)) for f in policy.fields)
+            try:
+                key = hash((alert.get("rule_id"), values))
+            except TypeError:
+                key = hash((alert.get("rule_id"), repr(values)))
+            entry = window.live.get(key)
+            if entry is not None:
+                entry[3] += 1
+                if ts > entry[2]:
+                    entry[2] = ts
+                stats.suppressed += 1
+                continue
+
+            if len(window.live) >= window.max_keys:
+                # Out of room: close the oldest bucket ahead of time
+                stats.evicted += window.retire(window.buckets[0][0] + 1, out, stats)
+            # Late alerts join the newest bucket so buckets stay in time order
+            if window.buckets and window.buckets[-1][0] >= number:
+                bucket = window.buckets[-1]
+            else:
+                bucket = (number, [])
+                window.buckets.append(bucket)
+            bucket[1].append(key)
+            window.live[key] = [bucket[0], ts, ts, 0, (alert.get("rule_id"), alert.get("rule_name"),
+                                                       alert.get("title"), alert.get("level"), values)]
+            out.append(dict(alert, suppression={"window": policy.window, "fields": list(policy.fields)}))
+            stats.passed += 1
+        return out
+
+    def flush(self) -> List[dict]:
+        """Summaries for every open window (end of stream)."""
+        out: List[dict] = []
+        for window in self._windows.values():
+            window.retire(None, out, self.stats)
+        return out
+
+    def live_keys(self) -> int:
+        return sum(len(window.live) for window in self._windows.values())
+
+    def summary(self) -> dict:
+        return self.stats.summary(self.live_keys())
+
+
+def _policy(spec, name: str) -> Policy:
+    if not isinstance(spec, dict):
+        raise SuppressionError(f"Suppression policy '{name}' must be a mapping")
+    try:
+        return Policy(spec.get("window", DEFAULT_WINDOW), spec.get("fields", DEFAULT_FIELDS))
+    except ValueError as e:
+        raise SuppressionError(f"Suppression policy '{name}': {e}") from e
+
+
+def load_suppressor(path: str = SUPPRESSION_PATH) -> Suppressor:
+    """A Suppressor configured from path (defaults when the file does not exist)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = yaml.load(f, Loader=YamlLoader) or {}
+    except FileNotFoundError:
+        return Suppressor()
+    if not isinstance(config, dict):
+        raise SuppressionError(f"{os.path.basename(path)} does not contain a mapping")
+    default = _policy(config.get("default") or {}, "default")
+    rules = {str(name): _policy(spec, str(name)) for name, spec in (config.get("rules") or {}).items()}
+    return Suppressor(default, rules, int(config.get("max_keys", MAX_KEYS)))
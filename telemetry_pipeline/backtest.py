@@ -0,0 +1,360 @@
+# backtest.py - Run the rule corpus over stored telemetry: hits, labels and cost per rule
+#
+# Events are read from store runs (optionally limited to a time range, hosts or
+# EventIDs) or NDJSON captures, normalized once, and routed exactly as the
+# detection engine routes them. Every (rule, event) evaluation is then timed on
+# its own, so each rule is charged for the events its logsource sends it and
+# the CPU its plan spends on them; the timer's own overhead is measured up
+# front and subtracted. Correlation rules each get their own correlation
+# engine and are charged for the base alerts they consume.
+#
+# Hits are labelled when the telemetry carries ground truth (the generator's
+# LABEL_FIELD on technique events): a hit on an event of one of the rule's
+# ATT&CK techniques is a true positive, a hit on another technique's event is
+# counted apart, and a hit on an unlabelled event is a false positive.
+import argparse
+import fnmatch
+import json
+import os
+import sys
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from llm_reporting.engine.correlation import CorrelationEngine, parse_timespan
+from llm_reporting.engine.coverage import LEVEL_ORDER, parent_technique, parse_tags
+from llm_reporting.engine.engine import DetectionEngine, make_alert
+from llm_reporting.engine.events import event_logsource
+from telemetry_pipeline.generator import LABEL_FIELD
+from telemetry_pipeline.replay import ReplayError, file_recording, store_recording
+from telemetry_pipeline.store import STORE_DIR, TelemetryStore
+
+# Without ground truth, a rule is flagged noisy above this many hits per
+# thousand events scanned. With it, only false positives count: above this many
+# per thousand events...
+NOISY_HITS_PER_1K = 1.0
+NOISY_FP_PER_1K = 1.0
+# ...or when more than this share of its hits are false positives
+NOISY_FP_SHARE = 0.5
+# A rule is flagged expensive above this share of all rule CPU (if that is at
+# least twice its fair share)...
+EXPENSIVE_SHARE = 0.4
+# ...or (base rules) above this many microseconds per event examined
+EXPENSIVE_US = 10.0
+
+SORT_KEYS = ("cost", "hits", "fp", "examined", "name")
+
+
+class RuleResult:
+    __slots__ = ("id", "name", "title", "level", "kind", "techniques", "examined", "hits",
+                 "true_positives", "other_techniques", "false_positives", "cpu_ns")
+
+    def __init__(self, rule, kind: str):
+        self.id = rule.id
+        self.name = rule.name
+        self.title = rule.title
+        self.level = rule.level
+        self.kind = kind
+        self.techniques = parse_tags(rule.tags)[0]
+        self.examined = 0
+        self.hits = 0
+        self.true_positives = 0
+        self.other_techniques = 0
+        self.false_positives = 0
+        self.cpu_ns = 0
+
+    def covers(self, technique: str) -> bool:
+        technique = technique.upper()
+        return any(technique == own or parent_technique(technique) == own or parent_technique(own) == technique
+                   for own in self.techniques)
+
+    def label(self, technique: Optional[str]):
+        if technique is None:
+            self.false_positives += 1
+        elif self.covers(technique):
+            self.true_positives += 1
+        else:
+            self.other_techniques += 1
+
+
+def timer_overhead(samples: int = 20000) -> int:
+    """Nanoseconds one perf_counter_ns() pair adds to a timed call (the median of many)."""
+    clock = time.perf_counter_ns
+    deltas = []
+    for _ in range(samples):
+        start = clock()
+        deltas.append(clock() - start)
+    deltas.sort()
+    return deltas[len(deltas) // 2]
+
+
+def select_engine(engine: DetectionEngine, rules: Sequence[str] = (), tags: Sequence[str] = (),
+                  min_level: Optional[str] = None) -> DetectionEngine:
+    """An engine with the chosen subset of rules (all when no filter is given).
+
+    rules are names, ids or glob patterns over either; tags select rules with
+    any of the given tags; min_level drops lower levels. A selected correlation
+    brings along the base rules it consumes, so it can still fire.
+    """
+    floor = LEVEL_ORDER.get(str(min_level).lower(), 0) if min_level else None
+    wanted_tags = {str(tag).lower() for tag in tags}
+
+    def chosen(rule) -> bool:
+        if floor is not None and LEVEL_ORDER.get(str(rule.level).lower(), 0) < floor:
+            return False
+        if not rules and not wanted_tags:
+            return True
+        if any(fnmatch.fnmatchcase(rule.name, p) or fnmatch.fnmatchcase(rule.id, p) for p in rules):
+            return True
+        return bool(wanted_tags & {str(tag).lower() for tag in rule.tags})
+
+    correlations = [rule for rule in engine.correlations if chosen(rule)]
+    needed = {ref for rule in correlations for ref in rule.rules}
+    base = [rule for rule in engine.rules if chosen(rule) or rule.name in needed or rule.id in needed]
+    return DetectionEngine(base, correlations, engine.field_mappings)
+
+
+class Backtest:
+    """Per-rule hits, ground-truth labels, events examined and CPU over a set of event batches."""
+
+    def __init__(self, engine: DetectionEngine, label_field: str = LABEL_FIELD):
+        self.engine = engine
+        self.label_field = label_field
+        self.results: Dict[int, RuleResult] = {id(rule): RuleResult(rule, "rule") for rule in engine.rules}
+        # One correlation engine per correlation rule, so each one's cost is its own
+        self._correlations = []
+        self._consumers: Dict[str, list] = {}
+        for rule in engine.correlations:
+            result = self.results[id(rule)] = RuleResult(rule, "correlation")
+            entry = (CorrelationEngine([rule]), result)
+            self._correlations.append(entry)
+            for ref in rule.rules:
+                self._consumers.setdefault(ref, []).append(entry)
+        self.overhead = timer_overhead()
+        self.events = 0
+        self.labeled = 0
+        self.technique_events: Counter = Counter()
+        self.technique_detected: Counter = Counter()
+        self.normalize_ns = 0
+        self.route_ns = 0
+        self.seconds = 0.0
+
+    def run(self, batches: Iterable[List[dict]]) -> "Backtest":
+        started = time.perf_counter()
+        for batch in batches:
+            self.process(batch)
+        self.seconds += time.perf_counter() - started
+        return self
+
+    def process(self, events: List[dict]):
+        clock = time.perf_counter_ns
+        overhead = self.overhead
+        results = self.results
+        label_field = self.label_field
+        route = self.engine.index.candidates
+
+        start = clock()
+        events = self.engine.fields.normalize_batch(events)
+        self.normalize_ns += clock() - start
+        self.events += len(events)
+        for event in events:
+            technique = event.get(label_field)
+            if technique is not None:
+                technique = str(technique).upper()
+                self.labeled += 1
+                self.technique_events[technique] += 1
+            start = clock()
+            rules = route(event_logsource(event))
+            self.route_ns += clock() - start
+            detected = False
+            for rule in rules:
+                result = results[id(rule)]
+                start = clock()
+                hit = rule.plan.match(event)
+                result.cpu_ns += max(0, clock() - start - overhead)
+                result.examined += 1
+                if not hit:
+                    continue
+                result.hits += 1
+                result.label(technique)
+                if technique is not None and result.covers(technique):
+                    detected = True
+                consumers = self._consumers.get(rule.id, []) + self._consumers.get(rule.name, [])
+                if consumers:
+                    alert = make_alert(rule, event)
+                    for correlator, correlated in consumers:
+                        start = clock()
+                        fired = correlator.process(alert)
+                        correlated.cpu_ns += max(0, clock() - start - overhead)
+                        correlated.examined += 1
+                        for _ in fired:
+                            correlated.hits += 1
+                            correlated.label(technique)
+            if detected:
+                self.technique_detected[technique] += 1
+
+    # Reporting ---------------------------------------------------------------
+
+    def flags(self, result: RuleResult, total_ns: int) -> List[str]:
+        flags = []
+        if self.labeled:
+            # A rule that fires often on its own technique's events is doing its job
+            if result.false_positives * 1000.0 / self.events > NOISY_FP_PER_1K or (
+                    result.hits and result.false_positives / result.hits > NOISY_FP_SHARE):
+                flags.append("noisy")
+        elif self.events and result.hits * 1000.0 / self.events > NOISY_HITS_PER_1K:
+            flags.append("noisy")
+        share = result.cpu_ns / total_ns if total_ns else 0.0
+        if share > EXPENSIVE_SHARE and share * len(self.results) >= 2:
+            flags.append("expensive")
+        elif result.kind == "rule" and result.examined and result.cpu_ns / result.examined / 1000.0 > EXPENSIVE_US:
+            flags.append("expensive")
+        return flags
+
+    def report(self, sort: str = "cost") -> dict:
+        total_ns = sum(result.cpu_ns for result in self.results.values())
+        ground_truth = self.labeled > 0
+        rows = []
+        for result in self.results.values():
+            rows.append({
+                "id": result.id,
+                "name": result.name,
+                "title": result.title,
+                "level": result.level,
+                "kind": result.kind,
+                "techniques": list(result.techniques),
+                "examined": result.examined,
+                "hits": result.hits,
+                "hits_per_1k_events": round(result.hits * 1000.0 / self.events, 3) if self.events else 0.0,
+                "true_positives": result.true_positives if ground_truth else None,
+                "other_techniques": result.other_techniques if ground_truth else None,
+                "false_positives": result.false_positives if ground_truth else None,
+                "precision": round(result.true_positives / result.hits, 3) if ground_truth and result.hits else None,
+                "cpu_ms": round(result.cpu_ns / 1e6, 3),
+                "us_per_event": round(result.cpu_ns / result.examined / 1000.0, 3) if result.examined else 0.0,
+                "cpu_share": round(result.cpu_ns / total_ns, 4) if total_ns else 0.0,
+                "flags": self.flags(result, total_ns),
+            })
+        order = {
+            "cost": lambda row: (-row["cpu_ms"], row["name"]),
+            "hits": lambda row: (-row["hits"], row["name"]),
+            "fp": lambda row: (-(row["false_positives"] or 0), -row["hits"], row["name"]),
+            "examined": lambda row: (-row["examined"], row["name"]),
+            "name": lambda row: row["name"],
+        }[sort]
+        # Flagged rules first: they are the ones to look at before production
+        rows.sort(key=lambda row: (not row["flags"], order(row)))
+        return {
+            "events": self.events,
+            "seconds": round(self.seconds, 3),
+            "events_per_second": round(self.events / self.seconds, 1) if self.seconds else 0.0,
+            "rules": len(self.engine.rules),
+            "correlations": len(self.engine.correlations),
+            "rule_cpu_ms": round(total_ns / 1e6, 3),
+            "normalize_ms": round(self.normalize_ns / 1e6, 3),
+            "route_ms": round(self.route_ns / 1e6, 3),
+            "timer_overhead_ns": self.overhead,
+            "ground_truth": {
+                "labeled_events": self.labeled,
+                "techniques": {
+                    technique: {"events": count, "detected": self.technique_detected[technique]}
+                    for technique, count in sorted(self.technique_events.items())
+                },
+            } if ground_truth else None,
+            "results": rows,
+        }
+
+
+def format_report(report: dict, top: Optional[int] = None) -> str:
+    rows = report["results"][:top] if top else report["results"]
+    truth = report["ground_truth"] is not None
+    width = max([len(row["name"]) for row in rows] + [4])
+    header = (f"{'rule':<{width}} {'level':<8} {'examined':>9} {'hits':>7} {'/1k ev':>7}"
+              + (f" {'TP':>6} {'other':>6} {'FP':>6} {'prec':>5}" if truth else "")
+              + f" {'cpu ms':>9} {'us/ev':>7} {'cpu%':>6}  flags")
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        line = (f"{row['name']:<{width}} {row['level']:<8} {row['examined']:>9} {row['hits']:>7} "
+                f"{row['hits_per_1k_events']:>7.2f}")
+        if truth:
+            precision = "-" if row["precision"] is None else f"{row['precision']:.2f}"
+            line += (f" {row['true_positives']:>6} {row['other_techniques']:>6} {row['false_positives']:>6}"
+                     f" {precision:>5}")
+        line += (f" {row['cpu_ms']:>9.1f} {row['us_per_event']:>7.2f} {row['cpu_share'] * 100:>5.1f}%"
+                 f"  {','.join(row['flags'])}")
+        lines.append(line)
+    lines.append("")
+    lines.append(f"{report['events']} events in {report['seconds']:.1f}s ({report['events_per_second']:.0f}/s): "
+                 f"rules {report['rule_cpu_ms']:.0f} ms, normalize {report['normalize_ms']:.0f} ms, "
+                 f"route {report['route_ms']:.0f} ms")
+    if truth:
+        techniques = report["ground_truth"]["techniques"]
+        lines.append(f"{report['ground_truth']['labeled_events']} labelled events; detected by a rule of their technique: "
+                     + ", ".join(f"{t} {counts['detected']}/{counts['events']}" for t, counts in techniques.items()))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest detection rules over stored telemetry")
+    parser.add_argument("--run", action="append", default=[], help="Store run to scan (repeatable; default all runs)")
+    parser.add_argument("--file", action="append", default=[], help="NDJSON capture to scan instead (repeatable)")
+    parser.add_argument("--store", default=STORE_DIR, help="Columnar store directory")
+    parser.add_argument("--since", default=None, help="Only events newer than this, e.g. 7d or 12h (store runs)")
+    parser.add_argument("--host", action="append", default=None, help="Only these hosts (store runs)")
+    parser.add_argument("--event-id", action="append", type=int, default=None, help="Only these EventIDs (store runs)")
+    parser.add_argument("--rules-dir", default=None, help="Compile rules from this tree instead of the rule bundle")
+    parser.add_argument("--rule", action="append", default=[], help="Rule name, id or glob to include (repeatable)")
+    parser.add_argument("--tag", action="append", default=[], help="Include rules with this tag (repeatable)")
+    parser.add_argument("--min-level", default=None, choices=sorted(LEVEL_ORDER, key=LEVEL_ORDER.get))
+    parser.add_argument("--sort", default="cost", choices=SORT_KEYS)
+    parser.add_argument("--top", type=int, default=None, help="Only print the first N rules")
+    parser.add_argument("--json", default=None, metavar="PATH", help="Also write the full report as JSON")
+    args = parser.parse_args()
+
+    store = TelemetryStore(args.store)
+    filters = {"hosts": args.host, "event_ids": args.event_id}
+    if args.since:
+        try:
+            filters["start"] = time.time() - parse_timespan(args.since)
+        except ValueError as e:
+            parser.error(str(e))
+    try:
+        recordings = [file_recording(path) for path in args.file]
+        if args.run or not args.file:
+            runs = args.run or store.runs()
+            if not runs:
+                raise ReplayError(f"No runs in {store.root}")
+            recordings += [store_recording(run_id, store, **filters) for run_id in runs]
+    except ReplayError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        raise SystemExit(2)
+
+    if args.rules_dir:
+        from llm_reporting.engine.engine import load_engine
+        engine = load_engine(args.rules_dir)
+    else:
+        from llm_reporting.engine.bundle import load_or_build
+        engine = load_or_build().engine
+    engine = select_engine(engine, args.rule, args.tag, args.min_level)
+    if not engine.rules and not engine.correlations:
+        print("❌ No rules match the selection", file=sys.stderr)
+        raise SystemExit(2)
+
+    backtest = Backtest(engine)
+    for recording in recordings:
+        backtest.run(recording.batches())
+    report = backtest.report(args.sort)
+    print(format_report(report, args.top))
+    if args.json:
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.json}")
+    flagged = [row for row in report["results"] if row["flags"]]
+    if flagged:
+        print("⚠️ Review before production: "
+              + ", ".join(f"{row['name']} ({'/'.join(row['flags'])})" for row in flagged), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
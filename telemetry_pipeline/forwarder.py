@@ -0,0 +1,593 @@
+# forwarder.py - Batched SIEM forwarding to Splunk HEC and the Elastic _bulk API
+#
+# Events are encoded once into per-target records and accumulated into payloads
+# cut by size (batch_bytes) or age (flush_interval). A fixed set of sender
+# threads share a pool of keep-alive HTTP connections, gzip each payload and
+# retry transient failures (connection errors, 429, 5xx) with capped
+# exponential backoff and jitter. While deliveries succeed a full send queue
+# makes the producer wait for a sender; once the SIEM fails - a payload exhausts
+# its retries - payloads go to a disk spill buffer instead of blocking the
+# producer or being dropped. Idle senders drain the spill once deliveries succeed
+# again, including spill left by an earlier run, and close() empties it while
+# the SIEM keeps accepting.
+#
+# Load-test offline against the bundled stand-in receiver:
+#   python -m telemetry_pipeline.receiver --port 8088
+#   python -m telemetry_pipeline.forwarder --target splunk --url http://127.0.0.1:8088 --generate 500000
+import argparse
+import base64
+import gzip
+import http.client
+import json
+import os
+import queue
+import random
+import ssl
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from llm_reporting.engine.events import event_time
+from telemetry_pipeline.sinks import Sink
+
+BATCH_BYTES = 1024 * 1024
+FLUSH_INTERVAL = 1.0
+CONNECTIONS = 4
+# Payloads waiting for a sender; beyond this the producer waits up to
+# BLOCK_TIMEOUT for room, or spills to disk straight away while the SIEM is failing
+QUEUE_SIZE = 16
+BLOCK_TIMEOUT = 5.0
+# close() stops draining the spill after this long
+DRAIN_TIMEOUT = 60.0
+RETRIES = 5
+BACKOFF = 0.5
+BACKOFF_MAX = 30.0
+TIMEOUT = 30.0
+# Level 1: most of the size reduction of gzip at a fraction of the CPU
+COMPRESSION_LEVEL = 1
+SPILL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output", "spill")
+SPILL_MAX_BYTES = 1024 * 1024 * 1024
+
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+HOST_FIELDS = ("Computer", "host.name", "host", "Hostname")
+
+
+class ForwardError(Exception):
+    """A delivery failure; retryable ones are retried and then spilled, others are dropped."""
+
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+# =============================================================================
+# Connection pool
+# =============================================================================
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections to one host, reused LIFO across threads."""
+
+    def __init__(self, url: str, size: int = CONNECTIONS, timeout: float = TIMEOUT, verify: bool = True):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme in {url!r}")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.size = size
+        self.timeout = timeout
+        self._context = None
+        if self.scheme == "https":
+            self._context = ssl.create_default_context() if verify else ssl._create_unverified_context()
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self.opened = 0
+        self.requests = 0
+
+    def _connect(self) -> http.client.HTTPConnection:
+        self.opened += 1
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=self._context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method: str, path: str, body: bytes, headers: Dict[str, str]) -> Tuple[int, bytes]:
+        """(status, body) of one request; a stale pooled connection is retried once on a fresh one."""
+        try:
+            conn, reused = self._idle.get_nowait(), True
+        except queue.Empty:
+            conn, reused = self._connect(), False
+        while True:
+            try:
+                conn.request(method, self.base_path + path, body, headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if not reused:
+                    raise
+                # The server closed an idle keep-alive connection
+                conn, reused = self._connect(), False
+                continue
+            except BaseException:
+                conn.close()
+                raise
+            self.requests += 1
+            if response.will_close or self._idle.qsize() >= self.size:
+                conn.close()
+            else:
+                self._idle.put(conn)
+            return response.status, data
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+# =============================================================================
+# Targets
+# =============================================================================
+
+def _host(event: dict) -> Optional[str]:
+    for field in HOST_FIELDS:
+        value = event.get(field)
+        if isinstance(value, str):
+            return value
+    return None
+
+
+class SplunkHEC:
+    """Splunk HTTP Event Collector: one JSON envelope per event on /services/collector/event."""
+
+    name = "splunk"
+    path = "/services/collector/event"
+
+    def __init__(self, token: str, index: Optional[str] = None, sourcetype: str = "_json", source: str = "detection-lab"):
+        self.headers = {"Authorization": f"Splunk {token}", "Content-Type": "application/json"}
+        self._envelope = {"sourcetype": sourcetype, "source": source}
+        if index:
+            self._envelope["index"] = index
+        self._encode = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+
+    def encode(self, event: dict) -> bytes:
+        envelope = dict(self._envelope, time=event_time(event, time.time()), event=event)
+        host = _host(event)
+        if host:
+            envelope["host"] = host
+        return self._encode(envelope).encode("utf-8")
+
+    def body(self, records: List[bytes]) -> bytes:
+        return b"\n".join(records)
+
+    def failed(self, records: List[bytes], status: int, data: bytes) -> Tuple[List[bytes], int]:
+        """(records to retry, records rejected) after a 200 response (HEC accepts or rejects whole requests)."""
+        return [], 0
+
+
+class ElasticBulk:
+    """Elasticsearch / OpenSearch _bulk API; items rejected with 429/5xx are retried individually.
+
+    Items failing with any other status (mapping conflicts, malformed fields...)
+    would fail again, so they are counted as rejected.
+    """
+
+    name = "elastic"
+
+    def __init__(self, index: str = "detection-lab", api_key: Optional[str] = None,
+                 username: Optional[str] = None, password: Optional[str] = None):
+        self.path = f"/{index}/_bulk"
+        self.headers = {"Content-Type": "application/x-ndjson"}
+        if api_key:
+            self.headers["Authorization"] = f"ApiKey {api_key}"
+        elif username:
+            credentials = base64.b64encode(f"{username}:{password or ''}".encode("utf-8")).decode("ascii")
+            self.headers["Authorization"] = f"Basic {credentials}"
+        self._encode = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+
+    def encode(self, event: dict) -> bytes:
+        if "@timestamp" not in event:
+            ts = event_time(event, time.time())
+            event = dict(event, **{"@timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ts)) +
+                                   f".{int(ts % 1 * 1000):03d}Z"})
+        return self._encode(event).encode("utf-8")
+
+    def body(self, records: List[bytes]) -> bytes:
+        action = b'{"index":{}}\n'
+        return b"".join(action + record + b"\n" for record in records)
+
+    def failed(self, records: List[bytes], status: int, data: bytes) -> Tuple[List[bytes], int]:
+        try:
+            response = json.loads(data)
+        except ValueError:
+            return [], 0
+        if not response.get("errors"):
+            return [], 0
+        retry = []
+        rejected = 0
+        for record, item in zip(records, response.get("items", [])):
+            result = next(iter(item.values()), {})
+            item_status = result.get("status", 200)
+            if item_status in RETRY_STATUS:
+                retry.append(record)
+            elif item_status >= 300:
+                rejected += 1
+        return retry, rejected
+
+
+TARGETS = {"splunk": SplunkHEC, "elastic": ElasticBulk}
+
+
+# =============================================================================
+# Spill buffer
+# =============================================================================
+
+class SpillBuffer:
+    """FIFO of payloads on disk, one gzip file of records per payload.
+
+    Files are named spill-<time>-<seq>-<count>.gz so a restart picks up the
+    backlog in order. When max_bytes is exceeded the oldest payloads are dropped.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = SPILL_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._seq = 0
+        os.makedirs(directory, exist_ok=True)
+        self._files: List[Tuple[str, int, int]] = []
+        for name in sorted(os.listdir(directory)):
+            if name.startswith("spill-") and name.endswith(".gz"):
+                path = os.path.join(directory, name)
+                self._files.append((path, self._count(name), os.path.getsize(path)))
+
+    @staticmethod
+    def _count(name: str) -> int:
+        try:
+            return int(name[:-3].rsplit("-", 1)[1])
+        except (IndexError, ValueError):
+            return 0
+
+    def write(self, records: List[bytes]):
+        data = gzip.compress(b"\n".join(records), COMPRESSION_LEVEL)
+        with self._lock:
+            self._seq += 1
+            path = os.path.join(self.directory, f"spill-{time.time_ns():020d}-{self._seq:06d}-{len(records)}.gz")
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            self._files.append((path, len(records), len(data)))
+            while len(self._files) > 1 and sum(size for _p, _n, size in self._files) > self.max_bytes:
+                oldest, count, _size = self._files.pop(0)
+                os.remove(oldest)
+                self.dropped += count
+
+    def pop(self) -> Optional[List[bytes]]:
+        with self._lock:
+            if not self._files:
+                return None
+            path, _count, _size = self._files.pop(0)
+        with gzip.open(path, "rb") as f:
+            data = f.read()
+        os.remove(path)
+        return data.split(b"\n") if data else []
+
+    def pending(self) -> Tuple[int, int]:
+        """(payloads, events) currently on disk."""
+        with self._lock:
+            return len(self._files), sum(count for _p, count, _s in self._files)
+
+
+# =============================================================================
+# Forwarder
+# =============================================================================
+
+_STOP = object()
+
+
+class Forwarder(Sink):
+    """Sink that batches events and delivers them to a SIEM target.
+
+    write() only encodes and enqueues; producers wait for a sender (at most
+    block_timeout) only while the queue is full and the SIEM keeps accepting.
+    close() delivers what is buffered, drains the spill for up to drain_timeout
+    while deliveries succeed (leaving on disk what cannot be delivered) and stops
+    the senders.
+    """
+
+    def __init__(self, target, url: str, connections: int = CONNECTIONS, batch_bytes: int = BATCH_BYTES,
+                 flush_interval: float = FLUSH_INTERVAL, compress: bool = True, retries: int = RETRIES,
+                 spill_dir: Optional[str] = None, queue_size: int = QUEUE_SIZE, verify: bool = True,
+                 timeout: float = TIMEOUT, block_timeout: float = BLOCK_TIMEOUT,
+                 drain_timeout: float = DRAIN_TIMEOUT):
+        super().__init__()
+        self.target = target
+        self.pool = ConnectionPool(url, connections, timeout, verify)
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self.compress = compress
+        self.retries = retries
+        self.block_timeout = block_timeout
+        self.drain_timeout = drain_timeout
+        self.spill = SpillBuffer(spill_dir or os.path.join(SPILL_DIR, target.name))
+        self.last_error: Optional[str] = None
+        self.counters = {name: 0 for name in ("sent", "payloads", "bytes_raw", "bytes_sent", "retries",
+                                              "spilled", "unspilled", "rejected")}
+        self._lock = threading.Lock()
+        self._buffer: List[bytes] = []
+        self._buffer_bytes = 0
+        self._buffer_since = 0.0
+        # Spill is drained by idle senders only after this time (monotonic)
+        self._resume_at = 0.0
+        # Set by close(): past it, failed payloads spill without retrying
+        self._deadline = float("inf")
+        self._queue: queue.Queue = queue.Queue(queue_size)
+        self._closing = threading.Event()
+        self._started = time.perf_counter()
+        self._senders = [threading.Thread(target=self._send_loop, name=f"forward-{i}", daemon=True)
+                         for i in range(connections)]
+        self._flusher = threading.Thread(target=self._flush_loop, name="forward-flush", daemon=True)
+        for thread in self._senders:
+            thread.start()
+        self._flusher.start()
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self.counters[name] += delta
+
+    # -------------------------------------------------------------------------
+    # Producer side
+    # -------------------------------------------------------------------------
+
+    def write(self, batch: List[dict]):
+        encode = self.target.encode
+        records = [encode(event) for event in batch]
+        payloads = []
+        with self._lock:
+            if not self._buffer:
+                self._buffer_since = time.monotonic()
+            for record in records:
+                self._buffer.append(record)
+                self._buffer_bytes += len(record) + 1
+                if self._buffer_bytes >= self.batch_bytes:
+                    payloads.append(self._cut())
+            self.events += len(batch)
+            self.batches += 1
+        for payload in payloads:
+            self._enqueue(payload)
+
+    def _cut(self) -> List[bytes]:
+        # Caller holds the lock
+        payload, self._buffer, self._buffer_bytes = self._buffer, [], 0
+        self._buffer_since = time.monotonic()
+        return payload
+
+    def _enqueue(self, payload: List[bytes]):
+        # Outside the lock, so stats() and the flusher are not held up by a full queue.
+        # A healthy SIEM gets backpressure; a failing one gets the spill right away
+        wait = self.block_timeout if time.monotonic() >= self._resume_at else 0
+        try:
+            self._queue.put(payload, timeout=wait)
+        except queue.Full:
+            self.spill.write(payload)
+            self._count(spilled=len(payload))
+
+    def flush(self):
+        with self._lock:
+            payload = self._cut() if self._buffer else None
+        if payload:
+            self._enqueue(payload)
+
+    def _flush_loop(self):
+        while not self._closing.wait(self.flush_interval / 2):
+            with self._lock:
+                stale = self._buffer and time.monotonic() - self._buffer_since >= self.flush_interval
+                payload = self._cut() if stale else None
+            if payload:
+                self._enqueue(payload)
+
+    # -------------------------------------------------------------------------
+    # Sender side
+    # -------------------------------------------------------------------------
+
+    def _send_loop(self):
+        while True:
+            try:
+                payload = self._queue.get_nowait()
+            except queue.Empty:
+                # Live payloads first; spilled ones whenever the queue is empty
+                payload = None
+                if not self._closing.is_set() and time.monotonic() >= self._resume_at:
+                    payload = self.spill.pop()
+                if payload is not None:
+                    self._count(unspilled=len(payload))
+                else:
+                    try:
+                        payload = self._queue.get(timeout=self.flush_interval)
+                    except queue.Empty:
+                        continue
+            if payload is _STOP:
+                self._drain_spill()
+                return
+            self._deliver(payload)
+
+    def _drain_spill(self):
+        # Closing: empty the spill while deliveries succeed (a failure moves
+        # _resume_at ahead and stops every sender) and the deadline allows
+        while time.monotonic() < self._deadline and time.monotonic() >= self._resume_at:
+            payload = self.spill.pop()
+            if payload is None:
+                return
+            self._count(unspilled=len(payload))
+            self._deliver(payload)
+
+    def _send(self, records: List[bytes]) -> List[bytes]:
+        """Send once; returns the records to retry (none on success)."""
+        body = self.target.body(records)
+        headers = dict(self.target.headers)
+        sent = body
+        if self.compress:
+            sent = gzip.compress(body, COMPRESSION_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+        status, data = self.pool.request("POST", self.target.path, sent, headers)
+        if status in RETRY_STATUS:
+            raise ForwardError(f"HTTP {status} from {self.target.name}")
+        if status >= 300:
+            # Bad credentials are kept (and spilled) until fixed; malformed data is dropped
+            raise ForwardError(f"HTTP {status} from {self.target.name}: {data[:200]!r}",
+                               retryable=status in (401, 403))
+        retry, rejected = self.target.failed(records, status, data)
+        if rejected:
+            self.last_error = f"{rejected} items rejected by {self.target.name}"
+        self._count(sent=len(records) - len(retry) - rejected, rejected=rejected, payloads=1,
+                    bytes_raw=len(body), bytes_sent=len(sent))
+        return retry
+
+    def _deliver(self, records: List[bytes]):
+        attempt = 0
+        while records:
+            try:
+                records = self._send(records)
+                if not records:
+                    self._resume_at = 0.0
+                    return
+                self.last_error = "Bulk items rejected as overloaded"
+            except ForwardError as e:
+                self.last_error = str(e)
+                if not e.retryable:
+                    self._count(rejected=len(records))
+                    return
+            except (OSError, http.client.HTTPException) as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+            attempt += 1
+            if attempt > self.retries or self._closing.is_set() or time.monotonic() >= self._deadline:
+                self._resume_at = time.monotonic() + BACKOFF_MAX
+                self.spill.write(records)
+                self._count(spilled=len(records))
+                return
+            self._count(retries=1)
+            # Full jitter keeps the senders from retrying in lockstep
+            time.sleep(random.uniform(0, min(BACKOFF_MAX, BACKOFF * 2 ** attempt)))
+
+    # -------------------------------------------------------------------------
+
+    def close(self):
+        if self._closing.is_set():
+            return
+        self._deadline = time.monotonic() + self.drain_timeout
+        self.flush()
+        # Sentinels queue behind the pending payloads, so these are delivered
+        # first; each sender then drains the spill before it stops
+        for _ in self._senders:
+            self._queue.put(_STOP)
+        for thread in self._senders:
+            thread.join()
+        self._closing.set()
+        self._flusher.join()
+        self.pool.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            buffered = len(self._buffer)
+        seconds = time.perf_counter() - self._started
+        payloads, spill_events = self.spill.pending()
+        return {
+            **counters,
+            "events": self.events,
+            "buffered": buffered,
+            "queued": self._queue.qsize(),
+            "spill_payloads": payloads,
+            "spill_events": spill_events,
+            "spill_dropped": self.spill.dropped,
+            "connections_opened": self.pool.opened,
+            "requests": self.pool.requests,
+            "seconds": round(seconds, 3),
+            "events_per_second": int(counters["sent"] / seconds) if seconds else 0,
+            "last_error": self.last_error,
+        }
+
+
+def format_stats(stats: dict) -> str:
+    ratio = stats["bytes_raw"] / stats["bytes_sent"] if stats["bytes_sent"] else 0
+    return (f"{stats['sent']}/{stats['events']} events sent in {stats['payloads']} payloads "
+            f"({stats['events_per_second']}/s, {stats['connections_opened']} connections, {ratio:.1f}x compression) | "
+            f"retries={stats['retries']} spilled={stats['spilled']} unspilled={stats['unspilled']} "
+            f"rejected={stats['rejected']} on disk={stats['spill_events']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Forward NDJSON telemetry to Splunk HEC or the Elastic bulk API")
+    parser.add_argument("--target", choices=sorted(TARGETS), required=True)
+    parser.add_argument("--url", required=True, help="Base URL, e.g. https://splunk:8088 or http://elastic:9200")
+    inputs = parser.add_mutually_exclusive_group(required=True)
+    inputs.add_argument("--file", action="append", help="NDJSON file to forward (repeatable, .gz supported)")
+    inputs.add_argument("--stdin", action="store_true", help="Forward NDJSON from standard input")
+    inputs.add_argument("--generate", type=int, metavar="N", help="Forward N synthetic events (load testing)")
+    parser.add_argument("--token", default=os.environ.get("SPLUNK_HEC_TOKEN", ""), help="Splunk HEC token")
+    parser.add_argument("--api-key", default=os.environ.get("ELASTIC_API_KEY"), help="Elastic API key")
+    parser.add_argument("--user", default=None, help="Elastic basic-auth user")
+    parser.add_argument("--password", default=os.environ.get("ELASTIC_PASSWORD"))
+    parser.add_argument("--index", default=None, help="Splunk index / Elastic index or data stream")
+    parser.add_argument("--sourcetype", default="_json", help="Splunk sourcetype")
+    parser.add_argument("--connections", type=int, default=CONNECTIONS)
+    parser.add_argument("--batch-bytes", type=int, default=BATCH_BYTES)
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL)
+    parser.add_argument("--retries", type=int, default=RETRIES)
+    parser.add_argument("--no-compress", action="store_true")
+    parser.add_argument("--insecure", action="store_true", help="Skip TLS certificate verification")
+    parser.add_argument("--spill-dir", default=None)
+    args = parser.parse_args()
+
+    if args.target == "splunk":
+        if not args.token:
+            print("❌ --token (or SPLUNK_HEC_TOKEN) is required for Splunk HEC", file=sys.stderr)
+            raise SystemExit(1)
+        target = SplunkHEC(args.token, args.index, args.sourcetype)
+    else:
+        target = ElasticBulk(args.index or "detection-lab", args.api_key, args.user, args.password)
+    forwarder = Forwarder(target, args.url, args.connections, args.batch_bytes, args.flush_interval,
+                          not args.no_compress, args.retries, args.spill_dir, verify=not args.insecure)
+
+    if args.generate is not None:
+        from telemetry_pipeline.generator import TelemetryGenerator
+        batches = TelemetryGenerator().stream(args.generate)
+    else:
+        from telemetry_pipeline.ingest import file_source, stdin_source
+
+        def parsed(sources):
+            for lines in sources:
+                batch = []
+                for line in lines:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(event, dict):
+                        batch.append(event)
+                yield batch
+
+        sources = stdin_source() if args.stdin else (lines for path in args.file for lines in file_source(path))
+        batches = parsed(sources)
+
+    try:
+        for batch in batches:
+            forwarder.write(batch)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        forwarder.close()
+    stats = forwarder.stats()
+    delivered = not stats["spill_events"] and not stats["rejected"]
+    print(f"{'✅' if delivered else '⚠️'} {format_stats(stats)}", file=sys.stderr)
+    if stats["last_error"] and not delivered:
+        print(f"❌ Last error: {stats['last_error']}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
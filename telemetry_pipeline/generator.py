@@ -0,0 +1,237 @@
+# generator.py - Synthetic Sysmon / Windows Security telemetry for APT simulations
+#
+# Technique executions are rendered from templates.TECHNIQUES and spliced into
+# benign background noise. Noise is the bulk of the volume, so its templates are
+# rendered once into a pool of concrete variants (hosts, users, pids...) up
+# front; a batch is then one weighted random.choices() call over the pool plus
+# a dict copy per event to stamp the time and record id. No per-event string
+# formatting happens on the hot path.
+import argparse
+import random
+import re
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+from llm_reporting.engine.fieldmap import FieldMappings, default_mappings
+from telemetry_pipeline.sinks import SINKS, Sink, open_sink
+from telemetry_pipeline.templates import NOISE, TECHNIQUES
+
+PLACEHOLDER_RE = re.compile(r"\{\{(\w+)\}\}")
+
+# Set on technique events (ground truth for detection tests), absent from noise
+LABEL_FIELD = "sim_technique"
+
+# Rendered variants kept per noise template
+VARIANTS = 64
+DEFAULT_BATCH = 10000
+
+DEFAULT_USERS = ("alice", "bob", "carol", "dave", "erin", "frank", "grace", "heidi", "ivan", "judy")
+
+
+def supported(techniques: Iterable[str]) -> List[str]:
+    """The techniques (in order, deduplicated) that have templates."""
+    return [t for t in dict.fromkeys(str(t).upper() for t in techniques) if t in TECHNIQUES]
+
+
+def render(template: dict, context: Dict[str, object]) -> dict:
+    """Fill {{placeholders}}; a value that is exactly one placeholder keeps the context type."""
+    out = {}
+    for key, value in template.items():
+        if isinstance(value, str) and "{{" in value:
+            m = PLACEHOLDER_RE.fullmatch(value)
+            if m:
+                value = context[m.group(1)]
+            else:
+                value = PLACEHOLDER_RE.sub(lambda m: str(context[m.group(1)]), value)
+        out[key] = value
+    return out
+
+
+class TelemetryGenerator:
+    """Batch generator of benign noise with technique executions mixed in.
+
+    Timestamps ("ts", epoch seconds) follow a simulated clock that advances by
+    1/rate per event, so a batch covers batch_size / rate seconds of activity.
+    profile renames canonical fields the way a source writes them (see
+    FieldMappings.to_profile); noise_weights overrides templates.NOISE weights
+    by name (0 disables a template).
+    """
+
+    def __init__(self, hosts: int = 50, users: Sequence[str] = DEFAULT_USERS, domain: str = "CORP",
+                 rate: float = 1000.0, start: Optional[float] = None, seed: Optional[int] = None,
+                 noise_weights: Optional[Dict[str, float]] = None, profile: Optional[str] = None,
+                 field_mappings: Optional[FieldMappings] = None, label: bool = True):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        unknown = set(noise_weights or ()) - set(NOISE)
+        if unknown:
+            raise ValueError(f"Unknown noise template(s) {sorted(unknown)}; available: {sorted(NOISE)}")
+        self.hosts = [f"WS-{i:04d}" for i in range(max(1, hosts))]
+        self.users = list(users) or list(DEFAULT_USERS)
+        self.domain = domain
+        self.rate = rate
+        self.clock = time.time() if start is None else start
+        self.record_id = 1
+        self._turn = 0
+        self.profile = profile
+        self.label = label
+        self._fields = field_mappings or default_mappings()
+        self._rng = random.Random(seed)
+
+        weights = {name: weight for name, (weight, _template) in NOISE.items()}
+        weights.update(noise_weights or {})
+        self._noise: List[dict] = []
+        cum_weights: List[float] = []
+        total = 0.0
+        for name, (_weight, template) in NOISE.items():
+            if weights[name] <= 0:
+                continue
+            share = weights[name] / VARIANTS
+            for _ in range(VARIANTS):
+                self._noise.append(self._finish(render(template, self._context())))
+                total += share
+                cum_weights.append(total)
+        self._noise_cum = cum_weights
+
+    def _context(self) -> Dict[str, object]:
+        rng = self._rng
+        host = rng.randrange(len(self.hosts))
+        return {
+            "host": self.hosts[host],
+            "domain": self.domain,
+            "user": rng.choice(self.users),
+            "dc": "DC01",
+            "ip": f"10.0.{host // 250}.{host % 250 + 2}",
+            "peer_ip": f"10.0.{rng.randrange(4)}.{rng.randrange(2, 252)}",
+            "ext_ip": f"{rng.randrange(11, 223)}.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}",
+            "pid": rng.randrange(1000, 65000, 4),
+            "ppid": rng.randrange(500, 65000, 4),
+            "logon_id": f"0x{rng.randrange(0x10000, 0xFFFFFF):x}",
+            "n": rng.randrange(100, 100000),
+        }
+
+    def _finish(self, event: dict) -> dict:
+        return self._fields.to_profile(event, self.profile) if self.profile else event
+
+    # -------------------------------------------------------------------------
+    # Generation
+    # -------------------------------------------------------------------------
+
+    def execution(self, technique: str) -> List[dict]:
+        """Unstamped events of one execution of a technique."""
+        spec = TECHNIQUES.get(technique.upper())
+        if spec is None:
+            raise ValueError(f"No telemetry template for technique {technique}")
+        context = self._context()
+        events = []
+        for template in spec["events"]:
+            event = render(template, context)
+            if self.label:
+                event[LABEL_FIELD] = technique.upper()
+            events.append(self._finish(event))
+        return events
+
+    def _stamp(self, events: List[dict]) -> List[dict]:
+        start, step, record_id = self.clock, 1.0 / self.rate, self.record_id
+        out = [{**event, "ts": start + i * step, "EventRecordID": record_id + i} for i, event in enumerate(events)]
+        self.clock = start + len(out) * step
+        self.record_id = record_id + len(out)
+        return out
+
+    def noise(self, count: int) -> List[dict]:
+        """count stamped benign events."""
+        if not self._noise:
+            return []
+        return self._stamp(self._rng.choices(self._noise, cum_weights=self._noise_cum, k=count))
+
+    def batch(self, count: int, techniques: Sequence[str] = (), executions: int = 0) -> List[dict]:
+        """count noise events with `executions` technique runs (round robin) spliced in."""
+        events = self._rng.choices(self._noise, cum_weights=self._noise_cum, k=count) if self._noise else []
+        if techniques and executions:
+            runs = [self.execution(techniques[(self._turn + i) % len(techniques)]) for i in range(executions)]
+            self._turn += executions
+            # Splice from the back so earlier insertion points stay valid
+            for position, run in sorted(((self._rng.randrange(len(events) + 1), run) for run in runs),
+                                        key=lambda item: -item[0]):
+                events[position:position] = run
+        return self._stamp(events)
+
+    def simulate(self, techniques: Sequence[str], noise: int = 0) -> List[dict]:
+        """One execution of each technique, in order, inside `noise` benign events."""
+        techniques = [t.upper() for t in techniques]
+        events = self._rng.choices(self._noise, cum_weights=self._noise_cum, k=noise) if self._noise else []
+        if techniques:
+            positions = sorted(self._rng.randrange(len(events) + 1) for _ in techniques)
+            for position, technique in reversed(list(zip(positions, techniques))):
+                events[position:position] = self.execution(technique)
+        return self._stamp(events)
+
+    def stream(self, total: int, batch_size: int = DEFAULT_BATCH, techniques: Sequence[str] = (),
+               attack_ratio: float = 0.0) -> Iterator[List[dict]]:
+        """Batches totalling about `total` noise events; attack_ratio is technique
+        executions per noise event (fractions carry over between batches)."""
+        techniques = supported(techniques) if techniques else []
+        carry, remaining = 0.0, total
+        while remaining > 0:
+            count = min(batch_size, remaining)
+            carry += count * attack_ratio
+            executions = int(carry)
+            carry -= executions
+            remaining -= count
+            yield self.batch(count, techniques, executions)
+
+    def emit(self, sink: Sink, total: int, batch_size: int = DEFAULT_BATCH, techniques: Sequence[str] = (),
+             attack_ratio: float = 0.0) -> dict:
+        """Generate into a sink; returns volume and throughput counters."""
+        started = time.perf_counter()
+        events = attack_events = batches = 0
+        for batch in self.stream(total, batch_size, techniques, attack_ratio):
+            sink.write(batch)
+            events += len(batch)
+            batches += 1
+            if self.label:
+                attack_events += sum(1 for event in batch if LABEL_FIELD in event)
+        seconds = time.perf_counter() - started
+        return {
+            "events": events,
+            "attack_events": attack_events,
+            "batches": batches,
+            "seconds": round(seconds, 4),
+            "events_per_minute": int(events / seconds * 60) if seconds else 0,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic Windows telemetry for APT simulations")
+    parser.add_argument("--technique", action="append", default=[],
+                        help=f"ATT&CK technique to simulate (repeatable); available: {', '.join(sorted(TECHNIQUES))}")
+    parser.add_argument("--events", type=int, default=100000, help="Benign background events to generate")
+    parser.add_argument("--attack-ratio", type=float, default=0.001,
+                        help="Technique executions per background event")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH)
+    parser.add_argument("--hosts", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=1000.0, help="Simulated events per second")
+    parser.add_argument("--profile", default=None, help="Field naming profile (e.g. splunk, elastic)")
+    parser.add_argument("--sink", choices=sorted(SINKS), default="ndjson")
+    parser.add_argument("--out", default=None, help="Output path for file sinks (.gz compresses)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    missing = [t for t in args.technique if t.upper() not in TECHNIQUES]
+    if missing:
+        print(f"❌ No templates for {', '.join(missing)}")
+        raise SystemExit(1)
+    try:
+        sink = open_sink(args.sink, args.out)
+    except ValueError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+    generator = TelemetryGenerator(hosts=args.hosts, rate=args.rate, seed=args.seed, profile=args.profile)
+    with sink:
+        stats = generator.emit(sink, args.events, args.batch_size, args.technique, args.attack_ratio)
+    print(f"✅ {stats['events']} events ({stats['attack_events']} from techniques) in {stats['seconds']:.2f}s "
+          f"- {stats['events_per_minute']:,} events/min")
+
+
+if __name__ == "__main__":
+    main()
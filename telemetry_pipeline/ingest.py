@@ -0,0 +1,540 @@
+# ingest.py - Streaming NDJSON ingestion: read -> parse -> normalize -> detect
+#
+# Each stage runs on its own thread and hands whole batches to the next through
+# a bounded queue. A full queue blocks the producer (backpressure), so a slow
+# detection stage throttles the reader instead of letting parsed events pile up:
+# memory is bounded by (queue_size + 1) batches per stage whatever the input size.
+import argparse
+import gzip
+import os
+import queue
+import selectors
+import socket
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from llm_reporting.engine.fieldmap import FieldMappings, default_mappings
+from llm_reporting.engine.records import decode_lines
+from telemetry_pipeline.sinks import NdjsonSink, NullSink, Sink, TeeSink
+from telemetry_pipeline.store import STORE_DIR, StoreWriter, TelemetryStore
+
+QUEUE_SIZE = 4
+# Raw bytes per batch read from a source (a batch always ends on a line boundary)
+BATCH_BYTES = 256 * 1024
+# Lines longer than this are dropped by the socket source rather than buffered
+# (up to the newline that ends them)
+MAX_LINE = 1024 * 1024
+# How long the socket source waits before flushing a partial batch
+FLUSH_INTERVAL = 0.2
+
+_END = object()
+
+
+# =============================================================================
+# Sources: iterators of raw line batches (lists of bytes)
+# =============================================================================
+
+def stream_source(stream, batch_bytes: int = BATCH_BYTES, stop: Optional[threading.Event] = None) -> Iterator[List[bytes]]:
+    while stop is None or not stop.is_set():
+        lines = stream.readlines(batch_bytes)
+        if not lines:
+            return
+        yield lines
+
+
+def file_source(path: str, batch_bytes: int = BATCH_BYTES,
+                stop: Optional[threading.Event] = None) -> Iterator[List[bytes]]:
+    """Lines of an NDJSON file; gzip-compressed when the path ends in .gz."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        yield from stream_source(f, batch_bytes, stop)
+
+
+def stdin_source(batch_bytes: int = BATCH_BYTES, stop: Optional[threading.Event] = None) -> Iterator[List[bytes]]:
+    yield from stream_source(sys.stdin.buffer, batch_bytes, stop)
+
+
+def socket_source(address: str, batch_bytes: int = BATCH_BYTES,
+                  stop: Optional[threading.Event] = None) -> Iterator[List[bytes]]:
+    """Lines sent by any number of clients to a local socket, until stop is set.
+
+    address is "host:port" for TCP or a filesystem path for a Unix socket. Partial
+    batches are flushed after FLUSH_INTERVAL so a slow sender still sees alerts.
+    """
+    stop = stop or threading.Event()
+    if ":" in address and os.path.sep not in address:
+        host, port = address.rsplit(":", 1)
+        server = socket.create_server((host or "127.0.0.1", int(port)))
+    else:
+        if os.path.exists(address):
+            os.unlink(address)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(address)
+        server.listen()
+    server.setblocking(False)
+    selector = selectors.DefaultSelector()
+    selector.register(server, selectors.EVENT_READ, None)
+    partial: Dict[socket.socket, bytes] = {}
+    # Connections in the middle of a dropped over-long line
+    discarding: Set[socket.socket] = set()
+    pending: List[bytes] = []
+    pending_bytes = 0
+    last_flush = time.monotonic()
+    try:
+        while not stop.is_set():
+            for key, _mask in selector.select(timeout=FLUSH_INTERVAL):
+                if key.fileobj is server:
+                    conn, _addr = server.accept()
+                    conn.setblocking(False)
+                    selector.register(conn, selectors.EVENT_READ, None)
+                    partial[conn] = b""
+                    continue
+                conn = key.fileobj
+                data = conn.recv(65536)
+                if not data:
+                    rest = partial.pop(conn)
+                    discarding.discard(conn)
+                    if rest.strip():
+                        pending.append(rest)
+                        pending_bytes += len(rest)
+                    selector.unregister(conn)
+                    conn.close()
+                    continue
+                if conn in discarding:
+                    end = data.find(b"\n")
+                    if end < 0:
+                        continue
+                    discarding.discard(conn)
+                    data = data[end + 1:]
+                *lines, rest = (partial[conn] + data).split(b"\n")
+                if len(rest) > MAX_LINE:
+                    rest = b""
+                    discarding.add(conn)
+                partial[conn] = rest
+                pending.extend(lines)
+                pending_bytes += len(data)
+            if pending and (pending_bytes >= batch_bytes or time.monotonic() - last_flush >= FLUSH_INTERVAL):
+                yield pending
+                pending, pending_bytes = [], 0
+                last_flush = time.monotonic()
+        if pending:
+            yield pending
+    finally:
+        for conn in list(partial):
+            conn.close()
+        selector.close()
+        server.close()
+        if server.family == getattr(socket, "AF_UNIX", None) and os.path.exists(address):
+            os.unlink(address)
+
+
+# =============================================================================
+# Stages
+# =============================================================================
+
+class Stage(threading.Thread):
+    """Applies fn to every batch from inbox and puts non-empty results on outbox.
+
+    Counters (all cumulative): batches, events in/out, busy seconds (in fn),
+    idle seconds (waiting for input), blocked seconds (waiting for room on
+    outbox, i.e. backpressure from the next stage) and the peak inbox depth;
+    `recent` is a moving average of the seconds fn takes per batch.
+    An exception sets `failed` (later batches are dropped) and `stop` (the
+    source stops reading).
+    """
+
+    def __init__(self, name: str, fn: Callable[[list], list], inbox: Optional[queue.Queue],
+                 outbox: Optional[queue.Queue], stop: threading.Event, failed: threading.Event):
+        super().__init__(name=f"ingest-{name}", daemon=True)
+        self.stage = name
+        self.fn = fn
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stop_event = stop
+        self.failed = failed
+        self.error: Optional[str] = None
+        self.peak_depth = 0
+        self.batches = 0
+        self.events_in = 0
+        self.events_out = 0
+        self.busy = 0.0
+        self.idle = 0.0
+        self.blocked = 0.0
+        self.recent = 0.0
+
+    def _fail(self, error: Exception):
+        self.error = f"{type(error).__name__}: {error}"
+        self.failed.set()
+        self.stop_event.set()
+
+    def _emit(self, item):
+        if self.outbox is None:
+            return
+        started = time.perf_counter()
+        self.outbox.put(item)
+        self.blocked += time.perf_counter() - started
+
+    def _apply(self, batch):
+        started = time.perf_counter()
+        try:
+            out = self.fn(batch)
+        except Exception as e:
+            self._fail(e)
+            return
+        took = time.perf_counter() - started
+        self.busy += took
+        self.recent = took if not self.batches else self.recent * 0.8 + took * 0.2
+        self.batches += 1
+        self.events_in += len(batch)
+        if out:
+            self.events_out += len(out)
+            self._emit(out)
+
+    def run(self):
+        while True:
+            depth = self.inbox.qsize()
+            if depth > self.peak_depth:
+                self.peak_depth = depth
+            started = time.perf_counter()
+            batch = self.inbox.get()
+            self.idle += time.perf_counter() - started
+            if batch is _END:
+                self._emit(_END)
+                return
+            # After a failure keep draining so upstream stages never block forever
+            if not self.failed.is_set():
+                self._apply(batch)
+
+    def stats(self, elapsed: float) -> dict:
+        return {
+            "batches": self.batches,
+            "events_in": self.events_in,
+            "events_out": self.events_out,
+            "events_per_second": round(self.events_in / elapsed, 1) if elapsed else 0.0,
+            "busy_seconds": round(self.busy, 3),
+            "idle_seconds": round(self.idle, 3),
+            "blocked_seconds": round(self.blocked, 3),
+            "queue_depth": self.inbox.qsize() if self.inbox is not None else 0,
+            "queue_peak": self.peak_depth,
+            "error": self.error,
+        }
+
+
+class SourceStage(Stage):
+    """The first stage: pulls line batches (or, parsed, event batches) from a source iterator."""
+
+    def __init__(self, source: Iterable[list], outbox: queue.Queue, stop: threading.Event,
+                 failed: threading.Event, parsed: bool = False):
+        super().__init__("read", None, None, outbox, stop, failed)
+        self.source = source
+        self.parsed = parsed
+        self.bytes = 0
+
+    def run(self):
+        try:
+            iterator = iter(self.source)
+            while not self.stop_event.is_set():
+                started = time.perf_counter()
+                try:
+                    lines = next(iterator)
+                except StopIteration:
+                    break
+                self.busy += time.perf_counter() - started
+                self.batches += 1
+                self.events_in += len(lines)
+                self.events_out += len(lines)
+                if not self.parsed:
+                    self.bytes += sum(map(len, lines))
+                self._emit(lines)
+        except Exception as e:
+            self._fail(e)
+        finally:
+            close = getattr(self.source, "close", None)
+            if close is not None:
+                close()
+            self._emit(_END)
+
+    def stats(self, elapsed: float) -> dict:
+        out = super().stats(elapsed)
+        out["bytes"] = self.bytes
+        return out
+
+
+# =============================================================================
+# Pipeline
+# =============================================================================
+
+class Pipeline:
+    """read -> parse -> normalize -> detect over bounded queues.
+
+    detector is anything with process_batch(events, normalized) (DetectionEngine,
+    LiveEngine, ShardedEngine) or None to only parse and normalize. Alerts go to
+    alert_sink and, if given, normalized events to event_sink. A detector with
+    process_lines (ShardedEngine) parses in its own worker processes, so without
+    an event_sink the raw lines go straight to it: read -> detect. A suppressor
+    (engine.suppress.Suppressor) thins repeated alerts before they reach the
+    alert sink; its last summaries are written when the pipeline finishes.
+    start(source, parsed=True) takes batches of event dicts instead of lines
+    (e.g. a replay) and skips the parse stage. A shedder (shed.LoadShedder)
+    samples low-value events ahead of detection when the detect stage falls
+    behind; it needs parsed events, so it turns off the raw-lines path.
+    """
+
+    def __init__(self, detector=None, alert_sink: Optional[Sink] = None, event_sink: Optional[Sink] = None,
+                 field_mappings: Optional[FieldMappings] = None, queue_size: int = QUEUE_SIZE, suppressor=None,
+                 shedder=None):
+        self.detector = detector
+        self.suppressor = suppressor
+        self.shedder = shedder
+        self.alert_sink = alert_sink if alert_sink is not None else NullSink()
+        self.event_sink = event_sink
+        self.fields = field_mappings or default_mappings()
+        self.queue_size = queue_size
+        self.parse_errors = 0
+        self.alerts = 0
+        # Set to stop reading (graceful: queued batches are still processed)
+        self.stop_event = threading.Event()
+        # Set when a stage fails: queued batches are dropped
+        self.failed = threading.Event()
+        self.stages: List[Stage] = []
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    # Stage functions ---------------------------------------------------------
+
+    def _parse(self, lines: List[bytes]) -> List[dict]:
+        _numbers, events, errors = decode_lines(lines)
+        self.parse_errors += errors
+        return events
+
+    def _normalize(self, events: List[dict]) -> List[dict]:
+        events = self.fields.normalize_batch(events)
+        if self.shedder is not None:
+            self.shedder.update(*self._load())
+            events = self.shedder.filter(events)
+        return events
+
+    def _load(self) -> Tuple[float, float]:
+        """(fill of the detect stage's queue, seconds of work queued ahead of it)."""
+        detect = self.stages[-1]
+        depth = detect.inbox.qsize()
+        return depth / self.queue_size, depth * detect.recent
+
+    def _detect(self, events: List[dict]) -> List[dict]:
+        if self.event_sink is not None:
+            self.event_sink.write(events)
+        if self.detector is None:
+            return []
+        self._emit_alerts(self.detector.process_batch(events, normalized=True))
+        return []
+
+    def _detect_lines(self, lines: List[bytes]) -> List[dict]:
+        alerts = self.detector.process_lines(lines)
+        self.parse_errors = self.detector.parse_errors
+        self._emit_alerts(alerts)
+        return []
+
+    def _emit_alerts(self, alerts: List[dict]):
+        if self.suppressor is not None and alerts:
+            alerts = self.suppressor.process(alerts)
+        if alerts:
+            self.alerts += len(alerts)
+            self.alert_sink.write(alerts)
+
+    # Control -----------------------------------------------------------------
+
+    def start(self, source: Iterable[list], parsed: bool = False) -> "Pipeline":
+        if self.stages:
+            raise RuntimeError("Pipeline already started")
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(3)]
+        if parsed:
+            self.stages = [
+                SourceStage(source, queues[1], self.stop_event, self.failed, parsed=True),
+                Stage("normalize", self._normalize, queues[1], queues[2], self.stop_event, self.failed),
+                Stage("detect", self._detect, queues[2], None, self.stop_event, self.failed),
+            ]
+        elif self.event_sink is None and self.shedder is None and hasattr(self.detector, "process_lines"):
+            self.stages = [
+                SourceStage(source, queues[0], self.stop_event, self.failed),
+                Stage("detect", self._detect_lines, queues[0], None, self.stop_event, self.failed),
+            ]
+        else:
+            self.stages = [
+                SourceStage(source, queues[0], self.stop_event, self.failed),
+                Stage("parse", self._parse, queues[0], queues[1], self.stop_event, self.failed),
+                Stage("normalize", self._normalize, queues[1], queues[2], self.stop_event, self.failed),
+                Stage("detect", self._detect, queues[2], None, self.stop_event, self.failed),
+            ]
+        self._started = time.perf_counter()
+        for stage in self.stages:
+            stage.start()
+        return self
+
+    def stop(self):
+        """Stop reading; batches already in flight are still processed."""
+        self.stop_event.set()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for stage in self.stages:
+            stage.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            if stage.is_alive():
+                return False
+        if self._finished is None:
+            self._finished = time.perf_counter()
+            if self.suppressor is not None and not self.failed.is_set():
+                summaries = self.suppressor.flush()
+                if summaries:
+                    self.alerts += len(summaries)
+                    self.alert_sink.write(summaries)
+        return True
+
+    def run(self, source: Iterable[list], parsed: bool = False) -> dict:
+        """Process a whole source and return the final counters."""
+        self.start(source, parsed)
+        self.join()
+        return self.stats()
+
+    @property
+    def error(self) -> Optional[str]:
+        for stage in self.stages:
+            if stage.error:
+                return f"{stage.stage}: {stage.error}"
+        return None
+
+    def stats(self) -> dict:
+        if self._started is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._finished or time.perf_counter()) - self._started
+        return {
+            "seconds": round(elapsed, 3),
+            "events": self.stages[-1].events_in if self.stages else 0,
+            "parse_errors": self.parse_errors,
+            "alerts": self.alerts,
+            "suppressed": self.suppressor.stats.suppressed if self.suppressor is not None else 0,
+            "shed": self.shedder.events_shed if self.shedder is not None else 0,
+            "shed_level": self.shedder.level if self.shedder is not None else 0,
+            "error": self.error,
+            "stages": {stage.stage: stage.stats(elapsed) for stage in self.stages},
+        }
+
+
+def open_detector(workers: int = 0, live: bool = False, shard_key: Optional[List[str]] = None):
+    """The detector for a pipeline: sharded across workers, hot-reloading, or a plain engine.
+
+    Sharded and live detectors run background workers: call stop() when done.
+    """
+    if workers:
+        from llm_reporting.engine.bundle import load_or_build
+        from llm_reporting.engine.shard import DEFAULT_KEY, ShardedEngine
+        return ShardedEngine(load_or_build().engine, workers, shard_key or DEFAULT_KEY).start()
+    if live:
+        from llm_reporting.engine.reload import LiveEngine
+        return LiveEngine().start()
+    from llm_reporting.engine.engine import load_engine
+    return load_engine()
+
+
+def format_stats(stats: dict) -> str:
+    suppressed = f" ({stats['suppressed']} duplicates suppressed)" if stats.get("suppressed") else ""
+    shed = f", {stats['shed']} shed (level {stats['shed_level']})" if stats.get("shed") else ""
+    parts = [f"{stats['events']} events{shed}, {stats['alerts']} alerts{suppressed} in {stats['seconds']:.1f}s"]
+    for name, stage in stats["stages"].items():
+        parts.append(f"{name}: {stage['events_per_second']:.0f}/s q={stage['queue_depth']}/{stage['queue_peak']} "
+                     f"busy={stage['busy_seconds']:.1f}s blocked={stage['blocked_seconds']:.1f}s")
+    return " | ".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream NDJSON telemetry through normalization and detection")
+    inputs = parser.add_mutually_exclusive_group(required=True)
+    inputs.add_argument("--file", action="append", help="NDJSON file to ingest (repeatable, .gz supported)")
+    inputs.add_argument("--stdin", action="store_true", help="Read NDJSON from standard input")
+    inputs.add_argument("--listen", metavar="ADDRESS", help="Accept NDJSON on host:port (TCP) or a Unix socket path")
+    parser.add_argument("--alerts", default="-", help="Where to write alerts as NDJSON ('-' = stdout)")
+    parser.add_argument("--events-out", default=None, help="Also write the normalized events here")
+    parser.add_argument("--store", nargs="?", const=STORE_DIR, default=None, metavar="DIR",
+                        help="Also write the normalized events to the columnar store (default dir if no value)")
+    parser.add_argument("--run", default=None, help="Run id for --store (default: a timestamp)")
+    parser.add_argument("--live", action="store_true", help="Hot-reload the rule tree while ingesting")
+    parser.add_argument("--no-detect", action="store_true", help="Only parse and normalize")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Shard detection (and parsing) across this many processes (0 = in-process)")
+    parser.add_argument("--no-suppress", action="store_true", help="Emit every alert, duplicates included")
+    parser.add_argument("--suppression", default=None, metavar="PATH",
+                        help="Suppression policy file (default: llm_reporting/data/suppression.yml)")
+    parser.add_argument("--shed", action="store_true",
+                        help="Sample low-value events when detection falls behind (default with --listen)")
+    parser.add_argument("--no-shed", action="store_true", help="Never shed: block the sources instead")
+    parser.add_argument("--shedding", default=None, metavar="PATH",
+                        help="Shedding policy file (default: llm_reporting/data/shedding.yml)")
+    parser.add_argument("--shard-key", action="append", default=None,
+                        help="Field events are sharded by (repeatable, first present wins; default Computer)")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--batch-bytes", type=int, default=BATCH_BYTES)
+    parser.add_argument("--stats-interval", type=float, default=5.0, help="Seconds between progress lines (0 = off)")
+    args = parser.parse_args()
+    if args.live and args.workers:
+        parser.error("--live and --workers cannot be combined")
+
+    detector = None if args.no_detect else open_detector(args.workers, args.live, args.shard_key)
+
+    event_sinks = []
+    if args.events_out:
+        event_sinks.append(NdjsonSink(args.events_out))
+    if args.store:
+        event_sinks.append(StoreWriter(TelemetryStore(args.store), args.run))
+    event_sink = event_sinks[0] if len(event_sinks) == 1 else TeeSink(*event_sinks) if event_sinks else None
+    suppressor = None
+    if detector is not None and not args.no_suppress:
+        from llm_reporting.engine.suppress import SUPPRESSION_PATH, load_suppressor
+        suppressor = load_suppressor(args.suppression or SUPPRESSION_PATH)
+    shedder = None
+    if detector is not None and not args.no_shed and (args.shed or args.listen):
+        from telemetry_pipeline.shed import SHEDDING_PATH, load_shedder
+        shedder = load_shedder(lambda: getattr(detector, "engine", detector), args.shedding or SHEDDING_PATH)
+    pipeline = Pipeline(detector, NdjsonSink(args.alerts), event_sink, queue_size=args.queue_size,
+                        suppressor=suppressor, shedder=shedder)
+    if args.file:
+        def source():
+            for path in args.file:
+                if pipeline.stop_event.is_set():
+                    return
+                yield from file_source(path, args.batch_bytes, pipeline.stop_event)
+        lines = source()
+    elif args.stdin:
+        lines = stdin_source(args.batch_bytes, pipeline.stop_event)
+    else:
+        lines = socket_source(args.listen, args.batch_bytes, pipeline.stop_event)
+
+    # Progress goes to stderr: stdout may be carrying the alerts
+    pipeline.start(lines)
+    try:
+        while not pipeline.join(args.stats_interval or None):
+            print(f"⏳ {format_stats(pipeline.stats())}", file=sys.stderr)
+    except KeyboardInterrupt:
+        pipeline.stop()
+        pipeline.join()
+    finally:
+        pipeline.alert_sink.close()
+        if pipeline.event_sink is not None:
+            pipeline.event_sink.close()
+        if args.live or args.workers:
+            detector.stop()
+    stats = pipeline.stats()
+    if stats["error"]:
+        print(f"❌ {stats['error']}", file=sys.stderr)
+    print(f"✅ {format_stats(stats)}", file=sys.stderr)
+    if stats["parse_errors"]:
+        print(f"⚠️ {stats['parse_errors']} unparseable lines skipped", file=sys.stderr)
+    if shedder is not None and shedder.events_shed:
+        from telemetry_pipeline.shed import format_shed
+        print(f"⚠️ Overload: {format_shed(shedder.summary())}", file=sys.stderr)
+    raise SystemExit(1 if stats["error"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# receiver.py - Local stand-in for Splunk HEC and the Elastic _bulk API
+#
+# Accepts what the forwarder sends (gzip or plain, keep-alive HTTP/1.1), counts
+# events and answers the way the real services do, so forwarding can be
+# load-tested offline. --latency and --busy-rate make it behave like a SIEM that
+# is slow or shedding load (HEC answers 503, Elastic 429), to exercise retries
+# and the spill buffer.
+import argparse
+import gzip
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from telemetry_pipeline.sinks import NdjsonSink, Sink
+
+SPLUNK_PATH = "/services/collector"
+BULK_SUFFIX = "/_bulk"
+
+
+def _splunk_events(body: bytes) -> list:
+    """HEC bodies are JSON envelopes back to back, separated by optional whitespace."""
+    decoder = json.JSONDecoder()
+    text = body.decode("utf-8")
+    events, pos = [], 0
+    while True:
+        while pos < len(text) and text[pos] in " \t\r\n":
+            pos += 1
+        if pos >= len(text):
+            return events
+        envelope, pos = decoder.raw_decode(text, pos)
+        events.append(envelope.get("event", envelope))
+
+
+def _bulk_events(body: bytes) -> list:
+    lines = [line for line in body.split(b"\n") if line.strip()]
+    # Action and source lines alternate (index/create actions only)
+    return [json.loads(line) for line in lines[1::2]]
+
+
+class Receiver:
+    """HTTP server thread; counters are readable while it runs."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8088, latency: float = 0.0, busy_rate: float = 0.0,
+                 token: Optional[str] = None, sink: Optional[Sink] = None):
+        self.latency = latency
+        self.busy_rate = busy_rate
+        self.token = token
+        self.sink = sink
+        self.counters = {"requests": 0, "events": 0, "bytes": 0, "busy": 0, "rejected": 0, "connections": 0}
+        self._lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                receiver._count(connections=1)
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status: int, payload: dict):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                receiver._count(requests=1, bytes=len(body))
+                splunk = self.path.startswith(SPLUNK_PATH)
+                if not splunk and not self.path.endswith(BULK_SUFFIX):
+                    self._reply(404, {"error": f"no handler for {self.path}"})
+                    return
+                if splunk and receiver.token and self.headers.get("Authorization") != f"Splunk {receiver.token}":
+                    receiver._count(rejected=1)
+                    self._reply(403, {"text": "Invalid token", "code": 4})
+                    return
+                if receiver.latency:
+                    time.sleep(receiver.latency)
+                if receiver.busy_rate and random.random() < receiver.busy_rate:
+                    receiver._count(busy=1)
+                    if splunk:
+                        self._reply(503, {"text": "Server is busy", "code": 9})
+                    else:
+                        self._reply(429, {"error": {"type": "es_rejected_execution_exception"}, "status": 429})
+                    return
+                try:
+                    if self.headers.get("Content-Encoding") == "gzip":
+                        body = gzip.decompress(body)
+                    events = _splunk_events(body) if splunk else _bulk_events(body)
+                except (OSError, ValueError) as e:
+                    receiver._count(rejected=1)
+                    self._reply(400, {"text": f"Invalid data format: {e}", "code": 6})
+                    return
+                receiver._count(events=len(events))
+                if receiver.sink is not None:
+                    with receiver._lock:
+                        receiver.sink.write(events)
+                if splunk:
+                    self._reply(200, {"text": "Success", "code": 0})
+                else:
+                    self._reply(200, {"took": 1, "errors": False,
+                                      "items": [{"index": {"status": 201}} for _ in events]})
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.address = self.server.server_address
+        self._thread = threading.Thread(target=self.server.serve_forever, name="receiver", daemon=True)
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self.counters[name] += delta
+
+    def start(self) -> "Receiver":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.sink is not None:
+            self.sink.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Splunk HEC / Elastic bulk stand-in for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--busy-rate", type=float, default=0.0, help="Fraction of requests answered 503/429")
+    parser.add_argument("--token", default=None, help="Require this HEC token")
+    parser.add_argument("--out", default=None, help="Write received events to this NDJSON file")
+    parser.add_argument("--stats-interval", type=float, default=5.0)
+    args = parser.parse_args()
+
+    receiver = Receiver(args.host, args.port, args.latency, args.busy_rate, args.token,
+                        NdjsonSink(args.out) if args.out else None).start()
+    print(f"✅ Listening on http://{args.host}:{receiver.address[1]} (HEC: {SPLUNK_PATH}/event, Elastic: <index>{BULK_SUFFIX})",
+          file=sys.stderr)
+    last, last_events = time.perf_counter(), 0
+    try:
+        while True:
+            time.sleep(args.stats_interval)
+            stats, now = receiver.stats(), time.perf_counter()
+            rate = (stats["events"] - last_events) / (now - last)
+            last, last_events = now, stats["events"]
+            print(f"⏳ {stats['events']} events ({rate:,.0f}/s) in {stats['requests']} requests over "
+                  f"{stats['connections']} connections, busy={stats['busy']} rejected={stats['rejected']}",
+                  file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.stop()
+
+
+if __name__ == "__main__":
+    main()
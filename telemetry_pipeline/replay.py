@@ -0,0 +1,328 @@
+# replay.py - Time-compressed, deterministic replay of recorded telemetry
+#
+# Recorded runs (columnar store runs or NDJSON files) are merged into one
+# timeline by event time and released at `speed` times real time: an event
+# recorded t seconds into the timeline goes out t / speed seconds after the
+# replay started, so order and the proportions between gaps are the same at
+# every speed (speed None = as fast as possible). Batch boundaries follow the
+# timeline, not the wall clock, and ties between runs are broken in an order
+# drawn from the seed, so the same recordings and seed give the same event
+# sequence - and the same alerts - whatever the speed or machine load.
+import argparse
+import heapq
+import os
+import random
+import sys
+import threading
+import time
+from itertools import chain
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from llm_reporting.engine.events import event_time, parse_time
+from llm_reporting.engine.records import decode_lines
+from telemetry_pipeline.ingest import Pipeline, file_source, format_stats, open_detector
+from telemetry_pipeline.sinks import NdjsonSink, TeeSink
+from telemetry_pipeline.store import STORE_DIR, TIME_COLUMN, StoreWriter, TelemetryStore, safe_run_id
+
+# Wall-clock seconds of timeline released together when paced
+TICK = 0.05
+# Largest batch handed to the pipeline
+BATCH_EVENTS = 2000
+
+
+class ReplayError(ValueError):
+    pass
+
+
+class Recording:
+    """A recorded run: a name and a callable returning its event batches in recorded order."""
+
+    __slots__ = ("name", "batches")
+
+    def __init__(self, name: str, batches: Callable[[], Iterable[List[dict]]]):
+        self.name = name
+        self.batches = batches
+
+    def __repr__(self):
+        return f"<Recording {self.name}>"
+
+
+def store_recording(run_id: str, store: Optional[TelemetryStore] = None, **filters) -> Recording:
+    """A run of the columnar store; filters are passed to TelemetryStore.scan (start, end, hosts, event_ids)."""
+    store = store or TelemetryStore()
+    if safe_run_id(run_id) not in store.runs():
+        raise ReplayError(f"No run '{run_id}' in {store.root}")
+    return Recording(f"run={run_id}", lambda: store.scan([run_id], **filters))
+
+
+def file_recording(path: str) -> Recording:
+    """An NDJSON (or .ndjson.gz) capture; unparseable lines are skipped."""
+    if not os.path.isfile(path):
+        raise ReplayError(f"No such file: {path}")
+
+    def batches():
+        for lines in file_source(path):
+            yield decode_lines(lines)[1]
+    return Recording(os.path.basename(path), batches)
+
+
+def parse_speed(value) -> Optional[float]:
+    """'max' or 0 -> None (as fast as possible); 100, '100' or '100x' -> 100.0."""
+    if value is None:
+        return None
+    text = str(value).strip().lower()
+    if text in ("max", "afap", "0", ""):
+        return None
+    try:
+        speed = float(text[:-1] if text.endswith("x") else text)
+    except ValueError:
+        raise ReplayError(f"Invalid replay speed: {value!r}") from None
+    if speed <= 0:
+        return None
+    return speed
+
+
+class Replay:
+    """Iterable of event batches merged from recordings and paced at `speed`.
+
+    align=True shifts every recording to start at the same moment (runs
+    recorded on different days play side by side); align=False keeps their
+    recorded offsets. start_at moves the whole timeline to begin at that epoch
+    (e.g. now, so replayed telemetry looks current), and stagger delays each
+    recording by a seeded random 0..stagger seconds. Shifted events get their
+    new time in TIME_COLUMN, which event_time() reads first; events without a
+    timestamp take the time of the event before them. stop (or close()) ends
+    the replay, also while it is waiting for the next batch to fall due.
+    """
+
+    def __init__(self, recordings: Sequence[Recording], speed: Optional[float] = None, seed: int = 0,
+                 align: bool = True, start_at: Optional[float] = None, stagger: float = 0.0,
+                 batch_events: int = BATCH_EVENTS, stop: Optional[threading.Event] = None):
+        if not recordings:
+            raise ReplayError("Nothing to replay")
+        if speed is not None and speed <= 0:
+            raise ReplayError("speed must be positive (None = as fast as possible)")
+        self.recordings = list(recordings)
+        self.speed = speed
+        self.seed = seed
+        self.align = align
+        self.start_at = start_at
+        self.stagger = max(0.0, stagger)
+        self.batch_events = max(1, batch_events)
+        self.stop_event = stop or threading.Event()
+        self.offsets: Dict[str, float] = {}
+        self.events = 0
+        self.batches = 0
+        self.max_lag = 0.0
+        self.first_ts: Optional[float] = None
+        self.last_ts: Optional[float] = None
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    def close(self):
+        self.stop_event.set()
+
+    # Timeline ----------------------------------------------------------------
+
+    @staticmethod
+    def _events(batches: Iterable[List[dict]], priority: int, offset: float) -> Iterator[tuple]:
+        last = None
+        seq = 0
+        for batch in batches:
+            for event in batch:
+                ts = last = event_time(event, last)
+                if offset:
+                    ts += offset
+                    event[TIME_COLUMN] = ts
+                yield ts, priority, seq, event
+                seq += 1
+
+    def _streams(self) -> List[Iterator[tuple]]:
+        rng = random.Random(self.seed)
+        priorities = list(range(len(self.recordings)))
+        rng.shuffle(priorities)
+        staggers = [rng.uniform(0.0, self.stagger) if self.stagger else 0.0 for _ in self.recordings]
+
+        heads = []
+        for recording in self.recordings:
+            iterator = iter(recording.batches())
+            first = next((batch for batch in iterator if batch), None)
+            heads.append((recording, iterator, first, None if first is None else event_time(first[0])))
+        starts = [start for _r, _i, _f, start in heads if start is not None]
+        if not starts:
+            return []
+        origin = min(starts)
+        base = origin if self.start_at is None else self.start_at
+
+        streams = []
+        for (recording, iterator, first, start), priority, stagger in zip(heads, priorities, staggers):
+            if first is None:
+                continue
+            offset = (base - start if self.align else base - origin) + stagger
+            self.offsets[recording.name] = offset
+            streams.append(self._events(chain((first,), iterator), priority, offset))
+        return streams
+
+    def _wait(self, due: float) -> bool:
+        """Sleep until `due` seconds after the start; False if stopped meanwhile."""
+        if self.stop_event.is_set():
+            return False
+        if self.speed is None:
+            return True
+        delay = self._started + due - time.perf_counter()
+        if delay > 0:
+            return not self.stop_event.wait(delay)
+        if -delay > self.max_lag:
+            self.max_lag = -delay
+        return True
+
+    def __iter__(self) -> Iterator[List[dict]]:
+        if self._started is not None:
+            raise ReplayError("A Replay can only be iterated once")
+        self._started = time.perf_counter()
+        speed = self.speed
+        # Timeline seconds per paced batch
+        span = TICK * speed if speed is not None else None
+        limit = self.batch_events
+        batch: List[dict] = []
+        due = 0.0
+        cut = None
+        origin = high = None
+        try:
+            for ts, _priority, _seq, event in heapq.merge(*self._streams()):
+                if origin is None:
+                    origin = high = self.first_ts = ts
+                elif ts > high:
+                    high = ts
+                if batch and (len(batch) >= limit or (span is not None and high >= cut)):
+                    if not self._wait(due):
+                        return
+                    self.events += len(batch)
+                    self.batches += 1
+                    self.last_ts = high
+                    yield batch
+                    batch = []
+                if not batch and span is not None:
+                    due = (high - origin) / speed
+                    cut = high + span
+                batch.append(event)
+            if batch and self._wait(due):
+                self.events += len(batch)
+                self.batches += 1
+                self.last_ts = high
+                yield batch
+        finally:
+            self._finished = time.perf_counter()
+
+    # Reporting ---------------------------------------------------------------
+
+    def stats(self) -> dict:
+        if self._started is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._finished or time.perf_counter()) - self._started
+        timeline = (self.last_ts - self.first_ts) if self.first_ts is not None and self.last_ts is not None else 0.0
+        return {
+            "recordings": [recording.name for recording in self.recordings],
+            "seed": self.seed,
+            "speed": self.speed,
+            "events": self.events,
+            "batches": self.batches,
+            "seconds": round(elapsed, 3),
+            "events_per_second": round(self.events / elapsed, 1) if elapsed else 0.0,
+            "timeline_seconds": round(timeline, 3),
+            "achieved_speed": round(timeline / elapsed, 2) if elapsed else 0.0,
+            "max_lag_seconds": round(self.max_lag, 3),
+            "offsets": dict(self.offsets),
+        }
+
+
+def format_replay_stats(stats: dict) -> str:
+    target = "max" if stats["speed"] is None else f"{stats['speed']:g}x"
+    return (f"replayed {stats['events']} events from {len(stats['recordings'])} recording(s) "
+            f"at {stats['events_per_second']:.0f} events/s: {stats['timeline_seconds']:.1f}s of timeline "
+            f"in {stats['seconds']:.1f}s ({stats['achieved_speed']:g}x, target {target}, "
+            f"max lag {stats['max_lag_seconds']:.2f}s, seed {stats['seed']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded telemetry through detection, faster than real time")
+    parser.add_argument("--run", action="append", default=[], help="Store run to replay (repeatable)")
+    parser.add_argument("--file", action="append", default=[], help="NDJSON capture to replay (repeatable, .gz supported)")
+    parser.add_argument("--store", default=STORE_DIR, help="Columnar store directory --run reads from")
+    parser.add_argument("--list", action="store_true", help="List the runs in the store and exit")
+    parser.add_argument("--speed", default="max", help="Replay speed: 1, 100 (or 100x), max (default)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for tie-breaking between runs and --stagger")
+    parser.add_argument("--no-align", action="store_true", help="Keep the recorded offsets between runs")
+    parser.add_argument("--stagger", type=float, default=0.0, help="Delay each run by a seeded random 0..N seconds")
+    parser.add_argument("--start-at", default=None, help="Rebase the timeline to start at 'now', an epoch or an ISO time")
+    parser.add_argument("--alerts", default="-", help="Where to write alerts as NDJSON ('-' = stdout)")
+    parser.add_argument("--events-out", default=None, help="Also write the replayed (normalized) events here")
+    parser.add_argument("--store-run", default=None, help="Also record the replay as a new store run")
+    parser.add_argument("--no-detect", action="store_true", help="Only replay and normalize")
+    parser.add_argument("--workers", type=int, default=0, help="Shard detection across this many processes")
+    parser.add_argument("--no-suppress", action="store_true", help="Emit every alert, duplicates included")
+    parser.add_argument("--suppression", default=None, metavar="PATH",
+                        help="Suppression policy file (default: llm_reporting/data/suppression.yml)")
+    parser.add_argument("--batch-events", type=int, default=BATCH_EVENTS)
+    parser.add_argument("--stats-interval", type=float, default=5.0, help="Seconds between progress lines (0 = off)")
+    args = parser.parse_args()
+
+    store = TelemetryStore(args.store)
+    if args.list:
+        for run_id, info in store.summary().items():
+            print(f"{run_id}: {info['rows']} events, {info['segments']} segments, hours {', '.join(info['hours'])}")
+        return
+    if not args.run and not args.file:
+        parser.error("nothing to replay: give --run and/or --file")
+    start_at = None
+    if args.start_at is not None:
+        start_at = time.time() if args.start_at == "now" else parse_time(args.start_at)
+        if start_at is None:
+            parser.error(f"invalid --start-at: {args.start_at}")
+    try:
+        speed = parse_speed(args.speed)
+        recordings = [store_recording(run_id, store) for run_id in args.run]
+        recordings += [file_recording(path) for path in args.file]
+    except ReplayError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        raise SystemExit(2)
+
+    detector = None if args.no_detect else open_detector(args.workers)
+    event_sinks = []
+    if args.events_out:
+        event_sinks.append(NdjsonSink(args.events_out))
+    if args.store_run:
+        event_sinks.append(StoreWriter(store, args.store_run))
+    event_sink = event_sinks[0] if len(event_sinks) == 1 else TeeSink(*event_sinks) if event_sinks else None
+    suppressor = None
+    if detector is not None and not args.no_suppress:
+        from llm_reporting.engine.suppress import SUPPRESSION_PATH, load_suppressor
+        suppressor = load_suppressor(args.suppression or SUPPRESSION_PATH)
+    pipeline = Pipeline(detector, NdjsonSink(args.alerts), event_sink, suppressor=suppressor)
+    replay = Replay(recordings, speed, args.seed, not args.no_align, start_at, args.stagger,
+                    args.batch_events, pipeline.stop_event)
+
+    pipeline.start(replay, parsed=True)
+    try:
+        while not pipeline.join(args.stats_interval or None):
+            print(f"⏳ {format_replay_stats(replay.stats())}", file=sys.stderr)
+    except KeyboardInterrupt:
+        pipeline.stop()
+        pipeline.join()
+    finally:
+        pipeline.alert_sink.close()
+        if pipeline.event_sink is not None:
+            pipeline.event_sink.close()
+        if args.workers and detector is not None:
+            detector.stop()
+    stats = pipeline.stats()
+    if stats["error"]:
+        print(f"❌ {stats['error']}", file=sys.stderr)
+    print(f"✅ {format_replay_stats(replay.stats())}", file=sys.stderr)
+    print(f"✅ {format_stats(stats)}", file=sys.stderr)
+    raise SystemExit(1 if stats["error"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+# shed.py - Adaptive load shedding for the ingest pipeline under overload
+#
+# Bounded queues keep memory flat, but when a burst outruns detection the only
+# relief they offer is blocking the sources - and a socket sender cannot be
+# slowed down forever. The shedder sits in front of the detect stage and, as the
+# load on it rises, samples events of the logsources least useful to detection:
+# first those no rule reads, then those only low-severity rules read. The value
+# of a logsource comes from the rules routed to it and the correlations that
+# consume those rules, so it follows the rule set (including hot reloads);
+# logsources feeding high-severity rules or correlations are never shed.
+# Sampling keeps every Nth event per logsource, so what survives is an even
+# spread rather than the head of the burst.
+import os
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import yaml
+
+from llm_reporting.engine.correlation import parse_timespan
+from llm_reporting.engine.events import event_logsource
+from llm_reporting.engine.rules import BASE_DIR, YamlLoader, logsource_key
+
+SHEDDING_PATH = os.path.join(BASE_DIR, "data", "shedding.yml")
+
+# Rule levels, lowest first; a logsource no rule reads is worth 0
+LEVEL_VALUES = {"informational": 1, "low": 2, "medium": 3, "high": 4, "critical": 5}
+PROTECTED = max(LEVEL_VALUES.values()) + 1
+
+HIGH_WATER = 0.75
+LOW_WATER = 0.25
+MAX_LAG = 2.0
+STEP_UP = 1.0
+STEP_DOWN = 5.0
+
+Key = Tuple[Optional[str], ...]
+
+
+class SheddingError(ValueError):
+    pass
+
+
+class ShedLevel:
+    __slots__ = ("below", "keep_one_in")
+
+    def __init__(self, below: str = "low", keep_one_in: int = 10):
+        if str(below).lower() not in LEVEL_VALUES:
+            raise SheddingError(f"Unknown rule level '{below}'")
+        if int(keep_one_in) < 1:
+            raise SheddingError("keep_one_in must be at least 1")
+        self.below = LEVEL_VALUES[str(below).lower()]
+        self.keep_one_in = int(keep_one_in)
+
+    def __repr__(self):
+        return f"<ShedLevel below {self.below} keep 1/{self.keep_one_in}>"
+
+
+def _covers(pattern: Key, key: Key) -> bool:
+    return all(part is None or part == other for part, other in zip(pattern, key))
+
+
+def _label(key: Key) -> str:
+    return "/".join(part or "*" for part in key)
+
+
+def _level_value(level) -> int:
+    return LEVEL_VALUES.get(str(level).lower(), 0)
+
+
+def consumer_levels(correlations: Sequence) -> Dict[str, int]:
+    """Highest level of the correlations consuming each rule name or id.
+
+    A correlation over another correlation passes its level down the chain.
+    """
+    levels: Dict[str, int] = {}
+    changed = True
+    while changed:
+        changed = False
+        for correlation in correlations:
+            value = max(_level_value(correlation.level), levels.get(correlation.id, 0),
+                        levels.get(correlation.name, 0))
+            for ref in correlation.rules:
+                if levels.get(ref, 0) < value:
+                    levels[ref] = value
+                    changed = True
+    return levels
+
+
+class LoadShedder:
+    """Samples low-value events ahead of detection while the pipeline is overloaded.
+
+    update(fill, lag) feeds the current load - fill is the fraction of the
+    detect stage's queue in use, lag the seconds of work queued ahead of it -
+    and moves the shed level; filter(events) drops what the level sheds. engine
+    is a callable returning the current DetectionEngine (its rules value the
+    logsources). Level 0 costs nothing per event.
+    """
+
+    def __init__(self, levels: Sequence[ShedLevel], engine: Callable[[], object],
+                 protect_level: str = "high", protected: Sequence[dict] = (),
+                 high_water: float = HIGH_WATER, low_water: float = LOW_WATER, max_lag: float = MAX_LAG,
+                 step_up: float = STEP_UP, step_down: float = STEP_DOWN):
+        if str(protect_level).lower() not in LEVEL_VALUES:
+            raise SheddingError(f"Unknown rule level '{protect_level}'")
+        if not 0 <= low_water < high_water:
+            raise SheddingError("low_water must be below high_water")
+        self.levels = list(levels)
+        self.engine = engine
+        self.protect_value = LEVEL_VALUES[str(protect_level).lower()]
+        self.protected = [logsource_key(spec) for spec in protected]
+        self.high_water = high_water
+        self.low_water = low_water
+        self.max_lag = max_lag
+        self.step_up = step_up
+        self.step_down = step_down
+        self.level = 0
+        self.peak_level = 0
+        self.load = 0.0
+        self.events_seen = 0
+        self.events_shed = 0
+        self.shed_by_logsource: Counter = Counter()
+        self.level_changes = 0
+        self._changed = time.monotonic()
+        self._calm_since: Optional[float] = None
+        self._shedding_since: Optional[float] = None
+        self.shedding_seconds = 0.0
+        self._values: Dict[Key, int] = {}
+        self._consumers: Dict[str, int] = {}
+        self._valued_engine = None
+        self._counters: Counter = Counter()
+
+    # Control -----------------------------------------------------------------
+
+    def update(self, fill: float, lag: float, now: Optional[float] = None) -> int:
+        now = time.monotonic() if now is None else now
+        self.load = max(fill, lag / self.max_lag if self.max_lag > 0 else 0.0)
+        if self.load > self.low_water:
+            self._calm_since = None
+        elif self._calm_since is None:
+            self._calm_since = now
+        if self.load >= self.high_water and self.level < len(self.levels) and now - self._changed >= self.step_up:
+            self._set_level(self.level + 1, now)
+        elif self._calm_since is not None and self.level > 0:
+            # One level per step_down spent calm, so a quiet spell between batches counts too
+            calm = now - max(self._calm_since, self._changed)
+            steps = int(calm // self.step_down) if self.step_down > 0 else self.level
+            if steps:
+                self._set_level(max(0, self.level - steps), now)
+        return self.level
+
+    def _set_level(self, level: int, now: float):
+        if self.level == 0 and level > 0:
+            self._shedding_since = now
+        elif level == 0 and self._shedding_since is not None:
+            self.shedding_seconds += now - self._shedding_since
+            self._shedding_since = None
+        self.level = level
+        self.peak_level = max(self.peak_level, level)
+        self.level_changes += 1
+        self._changed = now
+        # Sampling restarts per level so every logsource keeps its first event
+        self._counters.clear()
+
+    def _refresh(self):
+        # A hot reload brings a new engine: value its logsources afresh
+        engine = self.engine()
+        if engine is not self._valued_engine:
+            self._values.clear()
+            self._consumers = consumer_levels(getattr(engine, "correlations", ()) if engine is not None else ())
+            self._valued_engine = engine
+
+    def value(self, key: Key) -> int:
+        """Worth of a logsource to detection, PROTECTED if never shed.
+
+        Each rule routed to it counts at the higher of its own level and that
+        of the correlations consuming it; the logsource is worth the highest.
+        """
+        self._refresh()
+        value = self._values.get(key)
+        if value is None:
+            if any(_covers(pattern, key) for pattern in self.protected):
+                value = PROTECTED
+            else:
+                engine = self._valued_engine
+                rules = engine.index.candidates(key) if engine is not None else ()
+                consumers = self._consumers
+                value = max((max(_level_value(rule.level), consumers.get(rule.id, 0), consumers.get(rule.name, 0))
+                             for rule in rules), default=0)
+                if value >= self.protect_value:
+                    value = PROTECTED
+            self._values[key] = value
+        return value
+
+    def filter(self, events: List[dict]) -> List[dict]:
+        self.events_seen += len(events)
+        if not self.level:
+            return events
+        self._refresh()
+        level = self.levels[self.level - 1]
+        below = level.below
+        keep_one_in = level.keep_one_in
+        values = self._values
+        counters = self._counters
+        kept = []
+        shed = 0
+        for event in events:
+            key = event_logsource(event)
+            value = values.get(key)
+            if value is None:
+                value = self.value(key)
+            if value < below:
+                seen = counters[key]
+                counters[key] = seen + 1
+                if seen % keep_one_in:
+                    self.shed_by_logsource[key] += 1
+                    shed += 1
+                    continue
+            kept.append(event)
+        self.events_shed += shed
+        return kept
+
+    # Reporting ---------------------------------------------------------------
+
+    def summary(self) -> dict:
+        shedding = self.shedding_seconds
+        if self._shedding_since is not None:
+            shedding += time.monotonic() - self._shedding_since
+        return {
+            "level": self.level,
+            "peak_level": self.peak_level,
+            "load": round(self.load, 3),
+            "events_seen": self.events_seen,
+            "events_shed": self.events_shed,
+            "level_changes": self.level_changes,
+            "shedding_seconds": round(shedding, 3),
+            "shed_by_logsource": {_label(key): count for key, count in self.shed_by_logsource.most_common()},
+        }
+
+
+def _level(spec, i: int) -> ShedLevel:
+    if not isinstance(spec, dict):
+        raise SheddingError(f"Shed level {i + 1} must be a mapping")
+    return ShedLevel(spec.get("below", "low"), spec.get("keep_one_in", 10))
+
+
+def load_shedder(engine: Callable[[], object], path: str = SHEDDING_PATH) -> LoadShedder:
+    """A LoadShedder configured from path (one level sampling unread logsources if the file is missing)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = yaml.load(f, Loader=YamlLoader) or {}
+    except FileNotFoundError:
+        return LoadShedder([ShedLevel()], engine)
+    if not isinstance(config, dict):
+        raise SheddingError(f"{os.path.basename(path)} does not contain a mapping")
+    try:
+        return LoadShedder(
+            [_level(spec, i) for i, spec in enumerate(config.get("levels") or [{}])],
+            engine,
+            protect_level=config.get("protect_level", "high"),
+            protected=[spec for spec in (config.get("protected") or []) if isinstance(spec, dict)],
+            high_water=float(config.get("high_water", HIGH_WATER)),
+            low_water=float(config.get("low_water", LOW_WATER)),
+            max_lag=parse_timespan(config.get("max_lag", MAX_LAG)),
+            step_up=parse_timespan(config.get("step_up", STEP_UP)),
+            step_down=parse_timespan(config.get("step_down", STEP_DOWN)),
+        )
+    except ValueError as e:
+        raise SheddingError(f"{os.path.basename(path)}: {e}") from e
+
+
+def format_shed(summary: dict, top: int = 5) -> str:
+    parts = [f"{source}={count}" for source, count in list(summary["shed_by_logsource"].items())[:top]]
+    return (f"shed {summary['events_shed']} of {summary['events_seen']} events "
+            f"(peak level {summary['peak_level']}, {summary['shedding_seconds']:.1f}s shedding)"
+            + (f": {', '.join(parts)}" if parts else ""))
@@ -0,0 +1,143 @@
+# sinks.py - Destinations for telemetry and alert batches
+#
+# A sink receives whole batches (lists of event dicts) so per-call overhead is
+# paid once per batch. Sinks are context managers; close() flushes.
+import gzip
+import json
+import os
+import sys
+from typing import Callable, List, Optional
+
+
+class Sink:
+    """Base class: subclasses implement write(batch) and optionally close()."""
+
+    def __init__(self):
+        self.events = 0
+        self.batches = 0
+
+    def write(self, batch: List[dict]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class NullSink(Sink):
+    """Counts events and drops them (benchmarks)."""
+
+    def write(self, batch: List[dict]):
+        self.events += len(batch)
+        self.batches += 1
+
+
+class ListSink(Sink):
+    """Keeps events in memory, up to `limit` of them (None = unbounded)."""
+
+    def __init__(self, limit: Optional[int] = None):
+        super().__init__()
+        self.limit = limit
+        self.records: List[dict] = []
+
+    def write(self, batch: List[dict]):
+        self.events += len(batch)
+        self.batches += 1
+        room = len(batch) if self.limit is None else self.limit - len(self.records)
+        if room > 0:
+            self.records.extend(batch[:room])
+
+
+class CallbackSink(Sink):
+    """Hands each batch to a function, e.g. DetectionEngine.process_batch."""
+
+    def __init__(self, callback: Callable[[List[dict]], object]):
+        super().__init__()
+        self.callback = callback
+
+    def write(self, batch: List[dict]):
+        self.events += len(batch)
+        self.batches += 1
+        self.callback(batch)
+
+
+class NdjsonSink(Sink):
+    """Newline-delimited JSON file; gzip-compressed when the path ends in .gz, stdout for "-"."""
+
+    def __init__(self, path: str, append: bool = False):
+        super().__init__()
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        mode = "at" if append else "wt"
+        if path == "-":
+            self._file = sys.stdout
+        elif path.endswith(".gz"):
+            # Level 1: telemetry is bulky and compresses well even at the fastest level
+            self._file = gzip.open(path, mode, encoding="utf-8", compresslevel=1)
+        else:
+            self._file = open(path, mode, encoding="utf-8")
+        self._encode = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+
+    def write(self, batch: List[dict]):
+        if not batch:
+            return
+        encode = self._encode
+        self._file.write("\n".join([encode(event) for event in batch]))
+        self._file.write("\n")
+        self.events += len(batch)
+        self.batches += 1
+
+    def close(self):
+        if self._file is sys.stdout:
+            self._file.flush()
+        elif not self._file.closed:
+            self._file.close()
+
+
+class TeeSink(Sink):
+    """Writes every batch to several sinks."""
+
+    def __init__(self, *sinks: Sink):
+        super().__init__()
+        self.sinks = sinks
+
+    def write(self, batch: List[dict]):
+        self.events += len(batch)
+        self.batches += 1
+        for sink in self.sinks:
+            sink.write(batch)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+def _store_sink(target: Optional[str] = None) -> Sink:
+    # Imported here: the store module builds on Sink
+    from telemetry_pipeline.store import StoreWriter, TelemetryStore
+
+    return StoreWriter(TelemetryStore(target) if target else None)
+
+
+# name -> factory(target); target is a path for file sinks (the root directory
+# for the columnar store) and ignored otherwise
+SINKS = {
+    "ndjson": NdjsonSink,
+    "null": lambda target=None: NullSink(),
+    "store": _store_sink,
+}
+
+
+def open_sink(name: str, target: Optional[str] = None) -> Sink:
+    if name not in SINKS:
+        raise ValueError(f"Unknown sink '{name}'; available: {sorted(SINKS)}")
+    if name == "ndjson" and not target:
+        raise ValueError("The ndjson sink needs an output path")
+    return SINKS[name](target)
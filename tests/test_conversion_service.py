@@ -0,0 +1,27 @@
+import os
+
+from llm_reporting.backends.service import ConversionService
+from llm_reporting.engine.rules import RULE_DIR
+
+DRAFT = """title: Draft
+id: 7d0c9a52-3f9e-4f55-9d51-0f4f3c1a2b10
+logsource:
+  product: windows
+  category: process_creation
+detection:
+  selection:
+    Image|endswith: '\\\\certutil.exe'
+    CommandLine|contains: '-urlcache'
+  condition: selection
+level: medium
+"""
+
+
+def test_posted_texts_are_not_persisted(tmp_path):
+    service = ConversionService(RULE_DIR, cache_dir=str(tmp_path))
+    first = service.convert_texts([DRAFT])
+    second = service.convert_texts([DRAFT])
+    assert all(output["compiled"] == 1 for output in first["backends"].values())
+    assert all(output["cached"] == 1 for output in second["backends"].values())
+    assert os.listdir(tmp_path) == []
+    assert all(not cache.entries for cache in service.caches.values())
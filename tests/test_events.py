@@ -0,0 +1,25 @@
+from llm_reporting.engine.events import event_logsource
+
+
+def test_channel_routing():
+    assert event_logsource({"EventID": 1, "Channel": "Microsoft-Windows-Sysmon/Operational"}) == \
+        ("windows", "process_creation", "sysmon")
+    assert event_logsource({"EventID": 4624, "Channel": "Security"}) == ("windows", None, "security")
+
+
+def test_sysmon_inferred_without_channel():
+    # Splunk-style exports carry EventCode and source/sourcetype instead of Channel
+    assert event_logsource({"EventCode": "1", "Image": "C:\\x.exe"}) == ("windows", "process_creation", "sysmon")
+    assert event_logsource({"EventID": 10}) == ("windows", "process_access", "sysmon")
+    assert event_logsource({"EventCode": 3, "sourcetype": "XmlWinEventLog:Microsoft-Windows-Sysmon/Operational"}) == \
+        ("windows", "network_connection", "sysmon")
+    assert event_logsource({"EventCode": 4688, "source": "WinEventLog:Security"}) == ("windows", None, "security")
+    assert event_logsource({"EventCode": 4104}) == ("windows", None, "powershell")
+    assert event_logsource({"EventCode": 4657}) == ("windows", None, "security")
+
+
+def test_explicit_logsource_is_lowercased_like_rules():
+    assert event_logsource({"logsource": {"product": "Windows", "service": "Sysmon"}}) == \
+        ("windows", None, "sysmon")
+    assert event_logsource({"logsource": {"product": "Windows", "category": "Process_Creation"}}) == \
+        ("windows", "process_creation", None)
@@ -0,0 +1,59 @@
+import pytest
+import yaml
+
+from llm_reporting.detection_rules.fix_ids import find_problems, read_id, set_id
+
+ID = "0f6a8c3e-2b1d-4c5e-9f70-1a2b3c4d5e6f"
+NEW_ID = "7d0c9a52-3f9e-4f55-9d51-0f4f3c1a2b10"
+BODY = "title: Test rule\n{id_line}\nlogsource:\n  product: windows\nlevel: low\n"
+
+
+def _write(tmp_path, id_line, newline="\n"):
+    path = tmp_path / "rule.yml"
+    path.write_bytes(BODY.format(id_line=id_line).replace("\n", newline).encode("utf-8"))
+    return str(path)
+
+
+@pytest.mark.parametrize("id_line, expected", [
+    (f"id: {ID}", ID),
+    (f"id: '{ID}'", ID),
+    (f'id: "{ID}"', ID),
+    (f"id: {ID}  # reviewed", ID),
+    (f"id: {ID}#dup", f"{ID}#dup"),
+    ("id:", None),
+    ("id:   # todo", None),
+])
+def test_read_id_agrees_with_yaml(tmp_path, id_line, expected):
+    path = _write(tmp_path, id_line)
+    with open(path, encoding="utf-8") as f:
+        loaded = yaml.safe_load(f)["id"]
+    assert read_id(path) == (path, expected)
+    assert loaded == expected
+
+
+def test_comment_glued_to_the_id_is_malformed(tmp_path):
+    path = _write(tmp_path, f"id: {ID}#dup")
+    assert find_problems(dict([read_id(path)])) == {path: "malformed"}
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+@pytest.mark.parametrize("id_line, comment", [
+    ("id:", None),
+    ("id:   # todo", "# todo"),
+    (f"id: '{ID}'", None),
+    (f"id: {ID}#dup", None),
+    (f"id: {ID} # keep me", "# keep me"),
+    ("", None),  # no id line at all: inserted after the title
+])
+def test_set_id_rewrites_a_loadable_line(tmp_path, newline, id_line, comment):
+    path = _write(tmp_path, id_line, newline)
+    set_id(path, NEW_ID)
+    with open(path, "rb") as f:
+        data = f.read().decode("utf-8")
+    if newline == "\r\n":
+        assert data.count("\n") == data.count("\r\n")
+    assert yaml.safe_load(data)["id"] == NEW_ID
+    assert read_id(path) == (path, NEW_ID)
+    line = next(line for line in data.splitlines() if line.startswith("id:"))
+    assert line == f"id: {NEW_ID}" + (f" {comment}" if comment else "")
+    assert data.splitlines()[0] == "title: Test rule"
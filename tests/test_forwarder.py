@@ -0,0 +1,69 @@
+import json
+
+from telemetry_pipeline.forwarder import ElasticBulk, Forwarder, SplunkHEC, SpillBuffer
+from telemetry_pipeline.receiver import Receiver
+
+
+def _events(n):
+    return [{"EventID": 1, "Computer": "ws1", "Image": f"C:\\bin\\{i}.exe"} for i in range(n)]
+
+
+def _forwarder(receiver, spill_dir, **kwargs):
+    host, port = receiver.address
+    return Forwarder(SplunkHEC("test"), f"http://{host}:{port}", spill_dir=str(spill_dir), **kwargs)
+
+
+def test_slow_siem_applies_backpressure_instead_of_leaving_spill(tmp_path):
+    receiver = Receiver(port=0, latency=0.02, token="test").start()
+    try:
+        forwarder = _forwarder(receiver, tmp_path, connections=2, queue_size=1, batch_bytes=2048)
+        for _ in range(10):
+            forwarder.write(_events(100))
+        forwarder.close()
+    finally:
+        receiver.stop()
+    stats = forwarder.stats()
+    assert stats["sent"] == 1000
+    assert stats["spill_events"] == 0
+    assert receiver.stats()["events"] == 1000
+
+
+def test_close_drains_spill_while_siem_accepts(tmp_path):
+    # Spill left behind by an earlier run against a failing SIEM
+    target = SplunkHEC("test")
+    spill = SpillBuffer(str(tmp_path))
+    for _ in range(5):
+        spill.write([target.encode(event) for event in _events(50)])
+
+    receiver = Receiver(port=0, token="test").start()
+    try:
+        forwarder = _forwarder(receiver, tmp_path)
+        forwarder.write(_events(10))
+        forwarder.close()
+    finally:
+        receiver.stop()
+    stats = forwarder.stats()
+    assert stats["unspilled"] == 250
+    assert stats["sent"] == 260
+    assert stats["spill_events"] == 0
+    assert receiver.stats()["events"] == 260
+
+
+def test_close_keeps_spill_when_siem_fails(tmp_path):
+    receiver = Receiver(port=0, token="test").start()
+    receiver.stop()
+    forwarder = _forwarder(receiver, tmp_path, retries=1, timeout=1.0, drain_timeout=5.0)
+    forwarder.write(_events(10))
+    forwarder.close()
+    stats = forwarder.stats()
+    assert stats["sent"] == 0
+    assert stats["spill_events"] == 10
+
+
+def test_elastic_items_rejected_for_good_are_not_retried():
+    items = [{"index": {"status": 201}}, {"index": {"status": 429}},
+             {"index": {"status": 400, "error": {"type": "mapper_parsing_exception"}}}]
+    data = json.dumps({"errors": True, "items": items}).encode("utf-8")
+    retry, rejected = ElasticBulk().failed([b"a", b"b", b"c"], 200, data)
+    assert retry == [b"b"]
+    assert rejected == 1
@@ -0,0 +1,28 @@
+import socket
+import threading
+import time
+
+from telemetry_pipeline import ingest
+
+
+def test_socket_source_drops_the_whole_of_an_over_long_line(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "MAX_LINE", 1000)
+    address = str(tmp_path / "ingest.sock")
+    stop = threading.Event()
+    lines = []
+    source = ingest.socket_source(address, stop=stop)
+    reader = threading.Thread(target=lambda: [lines.extend(batch) for batch in source], daemon=True)
+    reader.start()
+    deadline = time.monotonic() + 10
+    while not (tmp_path / "ingest.sock").exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(address)
+        # Longer than one recv, so the line is seen partial and over MAX_LINE first
+        client.sendall(b'{"n": 1}\n{"junk": "' + b"x" * 200000 + b'", "tail": 1}\n{"n": 2}\n')
+    while b'{"n": 2}' not in lines and time.monotonic() < deadline:
+        time.sleep(0.01)
+    stop.set()
+    reader.join(timeout=10)
+    assert [line for line in lines if line] == [b'{"n": 1}', b'{"n": 2}']
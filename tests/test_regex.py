@@ -0,0 +1,75 @@
+import logging
+import re
+
+from llm_reporting.engine import regex
+from llm_reporting.engine.engine import DetectionEngine, compile_rules
+from llm_reporting.engine.regex import (MAX_RISKY_WINDOWS, RISKY_INPUT_LIMIT, CompiledPattern, backtracking_risks,
+                                         unevaluated_searches)
+
+
+def test_benign_adjacent_quantifiers_are_not_flagged():
+    for pattern in (r"\w+\s+\w+", r"\S+\s+\S+\s+\S+", r"[^,]*,[^,]*,[^,]*", r".*\\cmd\.exe.*", r"\w+[^\w]+\w+",
+                    r"[a-z]+[0-9]+[A-Z]+"):
+        assert backtracking_risks(pattern) == [], pattern
+
+
+def test_overlapping_quantifiers_are_flagged():
+    assert backtracking_risks(r"(a+)+$") == ["nested unbounded quantifiers"]
+    assert backtracking_risks(r"(a|ab)*c") == ["overlapping alternation inside an unbounded repeat"]
+    overlapping = ["adjacent unbounded quantifiers over overlapping characters"]
+    for pattern in (r"\w+\d+$", r".*.*=", r"[^a]+b+c"):
+        assert backtracking_risks(pattern) == overlapping, pattern
+    # Case folding makes the two ranges overlap
+    assert backtracking_risks(r"[a-z]+[A-Z]+!", re.IGNORECASE) == overlapping
+
+
+# Long values below are made of short words, so each window searches in linear time
+
+def test_long_values_are_searched_in_windows():
+    pattern = CompiledPattern(r"[^a]+b+c")
+    # Past the first window, and across the cut between two windows
+    assert pattern.search("a" * 10000 + "bbc")
+    assert pattern.search("a" * (RISKY_INPUT_LIMIT - 1) + "bbc" + "a" * 10000)
+    assert not pattern.search("a" * 10000 + "b c")
+    assert pattern.windowed == 3
+    assert pattern.unevaluated == 0
+
+
+def test_end_anchored_match_is_only_taken_at_the_real_end():
+    pattern = CompiledPattern(r"\w+\d+$")
+    assert pattern.search("a " * 5000 + "a1")
+    # The first window ends on a digit, but the value does not
+    assert not pattern.search("a " * (RISKY_INPUT_LIMIT // 2 - 1) + "a1" + " b" * 1500 + " ")
+    assert pattern.unevaluated == 0
+
+
+def test_values_beyond_the_windows_are_unevaluated_and_logged_once(caplog):
+    pattern = CompiledPattern(r"\w+\d+$")
+    before = unevaluated_searches()
+    value = "a " * (RISKY_INPUT_LIMIT // 2 * (MAX_RISKY_WINDOWS // 2 + 1))
+    with caplog.at_level(logging.WARNING, logger="llm_reporting.engine.regex"):
+        assert not pattern.search(value)
+        assert not pattern.search(value)
+    assert pattern.unevaluated == 2
+    assert unevaluated_searches() == before + 2
+    assert len(caplog.records) == 1
+    assert "could not be fully evaluated" in caplog.records[0].getMessage()
+
+
+def test_search_stops_when_out_of_budget(monkeypatch):
+    monkeypatch.setattr(regex, "RISKY_BUDGET_MS", 0)
+    pattern = CompiledPattern(r"[^a]+b+c")
+    assert not pattern.search("a" * 10000 + "bbc")
+    assert pattern.unevaluated == 1
+
+
+def test_unevaluated_events_raise_flagged_alerts():
+    rule = {"id": "long-digits", "title": "Long digits", "level": "high",
+            "logsource": {"product": "windows", "category": "process_creation"},
+            "detection": {"selection": {"CommandLine|re": r"\w+\d+$"}, "condition": "selection"}}
+    engine = DetectionEngine(compile_rules([rule]))
+    event = {"EventID": 1, "Channel": "Microsoft-Windows-Sysmon/Operational"}
+    long_value = "a " * (RISKY_INPUT_LIMIT // 2 * (MAX_RISKY_WINDOWS // 2 + 1))
+    alerts = engine.process_batch([dict(event, CommandLine="a1"), dict(event, CommandLine=long_value),
+                                   dict(event, CommandLine="a b")])
+    assert [alert.get("unevaluated", False) for alert in alerts] == [False, True]
@@ -0,0 +1,51 @@
+import os
+import shutil
+
+from llm_reporting.engine.reload import LiveEngine
+from llm_reporting.engine.rules import RULE_DIR, list_rule_files
+
+
+def _copy_rules(tmp_path):
+    for path in list_rule_files(RULE_DIR):
+        shutil.copy(path, tmp_path / os.path.basename(path))
+    return tmp_path
+
+
+def _rewrite(path, old, new):
+    text = path.read_text(encoding="utf-8")
+    assert old in text
+    path.write_text(text.replace(old, new), encoding="utf-8")
+    # Make the edit visible to the (mtime, size) check even on coarse clocks
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def _levels(live):
+    return {rule.name: rule.level for rule in live.engine.rules}
+
+
+def test_broken_file_does_not_drop_valid_edits_of_the_same_poll(tmp_path):
+    rule_dir = _copy_rules(tmp_path)
+    live = LiveEngine(str(rule_dir))
+    before = _levels(live)
+    assert before["T1086_encoded_powershell"] == "high"
+
+    _rewrite(rule_dir / "T1086_encoded_powershell.yml", "level: high", "level: critical")
+    (rule_dir / "T1055_process_injection.yml").write_text("title: [unterminated\n  detection: {", encoding="utf-8")
+
+    assert live.reload() is True
+    levels = _levels(live)
+    assert levels["T1086_encoded_powershell"] == "critical"
+    # The broken file keeps serving its last good version and is reported
+    assert "T1055_process_injection" in levels
+    assert any(path.endswith("T1055_process_injection.yml") for path in live.ruleset.errors)
+
+
+def test_malformed_file_at_startup(tmp_path):
+    rule_dir = _copy_rules(tmp_path)
+    (rule_dir / "T1055_process_injection.yml").write_text("title: [unterminated\n", encoding="utf-8")
+
+    live = LiveEngine(str(rule_dir))
+    assert "T1086_encoded_powershell" in _levels(live)
+    assert "T1055_process_injection" not in _levels(live)
+    assert any(path.endswith("T1055_process_injection.yml") for path in live.ruleset.errors)
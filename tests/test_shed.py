@@ -0,0 +1,32 @@
+from llm_reporting.engine.correlation import compile_correlations
+from llm_reporting.engine.engine import DetectionEngine, compile_rules
+from llm_reporting.engine.rules import RULE_DIR, load_rules
+from telemetry_pipeline.shed import LEVEL_VALUES, PROTECTED, LoadShedder, ShedLevel, consumer_levels
+
+SECURITY = ("windows", None, "security")
+
+
+def test_correlations_raise_the_value_of_the_logsources_they_read():
+    # The RDP logon rule is medium, the burst correlation over it is high
+    rules = [rule for rule in load_rules(RULE_DIR) if rule.get("name") in ("T1021.001_rdp_logon", "rdp_logon_burst")]
+    assert len(rules) == 2
+    engine = DetectionEngine(compile_rules(rules), compile_correlations(rules))
+    assert consumer_levels(engine.correlations)["de154334-02d5-4690-ad96-707d5d556469"] == LEVEL_VALUES["high"]
+    assert LoadShedder([ShedLevel("high")], lambda: engine).value(SECURITY) == PROTECTED
+
+    # Without the correlation the logon rule alone leaves it at medium, below protect_level
+    without = DetectionEngine(engine.rules)
+    assert LoadShedder([ShedLevel("high")], lambda: without).value(SECURITY) == LEVEL_VALUES["medium"]
+
+
+def test_chained_correlations_pass_their_level_down():
+    class Correlation:
+        def __init__(self, name, level, rules):
+            self.id = self.name = name
+            self.level = level
+            self.rules = rules
+
+    levels = consumer_levels([Correlation("burst", "medium", ("logon",)),
+                              Correlation("spray_then_burst", "critical", ("burst", "spray"))])
+    assert levels == {"logon": LEVEL_VALUES["critical"], "burst": LEVEL_VALUES["critical"],
+                      "spray": LEVEL_VALUES["critical"]}
@@ -0,0 +1,35 @@
+import random
+
+from llm_reporting.engine.similarity import MIN_SIMILARITY, SimilarityIndex, rule_features
+
+
+def _rule(rule_id, values):
+    return {"id": rule_id, "title": rule_id, "logsource": {"product": "windows"},
+            "detection": {"selection": {"CommandLine|contains": values}, "condition": "selection"}}
+
+
+def _jaccard(a, b):
+    a, b = rule_features(a), rule_features(b)
+    return len(a & b) / len(a | b)
+
+
+def test_pairs_just_above_min_similarity_are_found():
+    rng = random.Random(7)
+    words = [f"{rng.getrandbits(40):010x}" for _ in range(4000)]
+    index = SimilarityIndex(None)
+    pairs = []
+    for i in range(100):
+        shared = [words.pop() for _ in range(3)]
+        left = _rule(f"left-{i}", shared + [words.pop() for _ in range(7)])
+        right = _rule(f"right-{i}", shared + [words.pop() for _ in range(7)])
+        index.add_rule(f"left-{i}", left)
+        index.add_rule(f"right-{i}", right)
+        pairs.append((left, right))
+
+    # Pairs between MIN_SIMILARITY and about 0.22
+    pairs = [(left, right) for left, right in pairs if _jaccard(left, right) >= MIN_SIMILARITY]
+    assert len(pairs) >= 30
+    found = sum(any(result["id"] == right["id"] for result in index.similar_to_id(left["id"]))
+                for left, right in pairs)
+    # 32 bands of 4 rows (threshold ~0.42) found fewer than half of these
+    assert found >= 0.9 * len(pairs)
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from llm_reporting.backends.base import load_rule
+from llm_reporting.backends.cache import OutputCache
+from llm_reporting.backends.splunk import CACHE_VERSION, SPL_PATH, build_queries, combined_text, verify_rule
+from llm_reporting.engine.fieldmap import default_mappings
+from llm_reporting.engine.rules import RULE_DIR, list_rule_files, load_rule_file
+
+SPLUNK_FIELDS = default_mappings().profile("splunk")
+WILDCARDS = {"contains": "*{}*", "startswith": "{}*", "endswith": "*{}"}
+
+
+@pytest.fixture(scope="module")
+def entries(tmp_path_factory):
+    # A private cache so every rule is compiled afresh
+    cache = OutputCache("splunk", CACHE_VERSION, str(tmp_path_factory.mktemp("cache")))
+    entries, errors = build_queries(RULE_DIR, cache)
+    assert errors == []
+    assert cache.hits == 0
+    return entries
+
+
+def _spl_value(value) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _expected_clauses(detection: dict):
+    """SPL comparisons written straight from the Sigma field/value pairs."""
+    for name, block in detection.items():
+        if name in ("condition", "timeframe") or not isinstance(block, dict):
+            continue
+        for spec, raw in block.items():
+            field, *modifiers = spec.split("|")
+            field = SPLUNK_FIELDS.get(field, field)
+            values = raw if isinstance(raw, list) else [raw]
+            wildcard = next((WILDCARDS[m] for m in modifiers if m in WILDCARDS), "{}")
+            values = [v if isinstance(v, int) else wildcard.format(v) for v in values]
+            if len(values) == 1:
+                yield f"{field}={_spl_value(values[0])}"
+            else:
+                yield f"{field} IN ({', '.join(_spl_value(v) for v in values)})"
+
+
+def test_every_rule_round_trips(entries):
+    rules = [entry for entry in entries if entry["kind"] == "rule"]
+    assert len(rules) == sum(1 for path in list_rule_files(RULE_DIR) if "correlation" not in load_rule_file(path))
+    for entry in rules:
+        rule = load_rule(entry["path"])
+        assert verify_rule(rule, entry["query"]) == [], os.path.basename(entry["path"])
+
+
+def test_committed_spl_matches_a_fresh_build(entries):
+    with open(SPL_PATH, "r", encoding="utf-8") as f:
+        assert f.read() == combined_text(entries)
+
+
+def test_detection_field_values_appear_in_spl(entries):
+    for entry in entries:
+        if entry["kind"] != "rule":
+            continue
+        rule = load_rule_file(entry["path"])
+        search = entry["query"].split(" | ", 1)[0]
+        for clause in _expected_clauses(rule["detection"]):
+            assert clause in search, f"{os.path.basename(entry['path'])}: {clause}"
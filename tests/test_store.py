@@ -0,0 +1,33 @@
+import json
+
+from llm_reporting.engine.records import EventRecord
+from telemetry_pipeline.store import TelemetryStore
+
+
+def test_buffered_records_round_trip(tmp_path):
+    events = [{"EventID": 1, "Channel": "Microsoft-Windows-Sysmon/Operational", "Image": f"C:\\{i}.exe",
+               "ts": 1792392273.0 + i} for i in range(10)]
+    events.append({"EventID": 4624, "Channel": "Security", "LogonType": 10, "ts": 1792392300.0,
+                   "Extra": {"nested": [1, 2]}})
+    store = TelemetryStore(str(tmp_path))
+    writer = store.writer("run1")
+    writer.write(events)
+    assert all(isinstance(event, EventRecord) for buffer in writer._buffers.values() for event in buffer)
+    writer.close()
+
+    rows = [{k: v for k, v in row.items() if v is not None} for batch in store.scan(["run1"]) for row in batch]
+    assert sorted(rows, key=lambda row: row["ts"]) == events
+
+
+def test_lone_surrogates_are_stored(tmp_path):
+    # json.loads accepts lone surrogate escapes; they are not encodable as UTF-8
+    events = [json.loads('{"EventID": 1, "ts": 1792392273.0, "CommandLine": "cmd \\ud800 /c", "User": "\\udfff",'
+                         ' "Extra": {"k": "\\ud83d"}}')]
+    events += [{"EventID": 1, "ts": 1792392274.0 + i, "CommandLine": f"cmd {i}", "User": "\udfff"} for i in range(5)]
+    store = TelemetryStore(str(tmp_path))
+    writer = store.writer("run1")
+    writer.write(events)
+    writer.close()
+
+    rows = [{k: v for k, v in row.items() if v is not None} for batch in store.scan(["run1"]) for row in batch]
+    assert sorted(rows, key=lambda row: row["ts"]) == events
@@ -9,6 +9,7 @@ import pandas as pd
 import json
 import time
 import os
+import sys
 from datetime import datetime
 from typing import Dict, List, Tuple, Optional
 import threading
@@ -16,6 +17,15 @@ import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
 
+# The rule tree and detection engine live in the llm_reporting package at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm_reporting.core.search import default_index, highlight
+from llm_reporting.engine.coverage import CoverageIndex
+from llm_reporting.engine.engine import load_engine
+from llm_reporting.engine.suppress import load_suppressor
+from telemetry_pipeline.generator import LABEL_FIELD, TelemetryGenerator, supported
+from telemetry_pipeline.store import StoreWriter, TelemetryStore
+
 # =============================================================================
 # ENHANCED MOCK DATA AND CONFIGURATION
 # =============================================================================
@@ -36,26 +46,33 @@ APT_GROUPS_ENHANCED = {
 
 APT_GROUPS = list(APT_GROUPS_ENHANCED.keys())
 
-# Enhanced detection results with more realistic data
-ENHANCED_DETECTION_RESULTS = {
+# Techniques attributed to each APT group (threat intel); detection coverage is
+# computed from the rule tags by the coverage index, not stored here
+APT_TECHNIQUES = {
     "APT29 (Cozy Bear)": [
-        {"Technique": "T1055.002", "Name": "Process Injection: Portable Executable", "Tactic": "Defense Evasion", "Coverage": "Full", "Confidence": "95%", "Last_Seen": "2024-01-15", "Severity": "High"},
-        {"Technique": "T1078.004", "Name": "Valid Accounts: Cloud Accounts", "Tactic": "Initial Access", "Coverage": "Partial", "Confidence": "78%", "Last_Seen": "2024-01-14", "Severity": "Critical"},
-        {"Technique": "T1083", "Name": "File and Directory Discovery", "Tactic": "Discovery", "Coverage": "Full", "Confidence": "92%", "Last_Seen": "2024-01-15", "Severity": "Medium"},
-        {"Technique": "T1090.003", "Name": "Proxy: Multi-hop Proxy", "Tactic": "Command and Control", "Coverage": "None", "Confidence": "0%", "Last_Seen": "N/A", "Severity": "High"},
-        {"Technique": "T1105", "Name": "Ingress Tool Transfer", "Tactic": "Command and Control", "Coverage": "Partial", "Confidence": "65%", "Last_Seen": "2024-01-13", "Severity": "Medium"},
-        {"Technique": "T1566.001", "Name": "Spearphishing Attachment", "Tactic": "Initial Access", "Coverage": "Full", "Confidence": "88%", "Last_Seen": "2024-01-15", "Severity": "Critical"},
-        {"Technique": "T1059.001", "Name": "PowerShell", "Tactic": "Execution", "Coverage": "Full", "Confidence": "96%", "Last_Seen": "2024-01-15", "Severity": "High"},
+        {"Technique": "T1055.002", "Name": "Process Injection: Portable Executable", "Tactic": "Defense Evasion", "Severity": "High"},
+        {"Technique": "T1078.004", "Name": "Valid Accounts: Cloud Accounts", "Tactic": "Initial Access", "Severity": "Critical"},
+        {"Technique": "T1083", "Name": "File and Directory Discovery", "Tactic": "Discovery", "Severity": "Medium"},
+        {"Technique": "T1090.003", "Name": "Proxy: Multi-hop Proxy", "Tactic": "Command and Control", "Severity": "High"},
+        {"Technique": "T1105", "Name": "Ingress Tool Transfer", "Tactic": "Command and Control", "Severity": "Medium"},
+        {"Technique": "T1566.001", "Name": "Spearphishing Attachment", "Tactic": "Initial Access", "Severity": "Critical"},
+        {"Technique": "T1059.001", "Name": "PowerShell", "Tactic": "Execution", "Severity": "High"},
     ],
     "APT33 (Elfin)": [
-        {"Technique": "T1059.003", "Name": "Windows Command Shell", "Tactic": "Execution", "Coverage": "Full", "Confidence": "98%", "Last_Seen": "2024-01-12", "Severity": "High"},
-        {"Technique": "T1087.002", "Name": "Domain Account Discovery", "Tactic": "Discovery", "Coverage": "Full", "Confidence": "89%", "Last_Seen": "2024-01-12", "Severity": "Medium"},
-        {"Technique": "T1135", "Name": "Network Share Discovery", "Tactic": "Discovery", "Coverage": "Partial", "Confidence": "67%", "Last_Seen": "2024-01-11", "Severity": "Medium"},
-        {"Technique": "T1560.001", "Name": "Archive via Utility", "Tactic": "Collection", "Coverage": "None", "Confidence": "0%", "Last_Seen": "N/A", "Severity": "Medium"},
-        {"Technique": "T1003.001", "Name": "LSASS Memory", "Tactic": "Credential Access", "Coverage": "Partial", "Confidence": "73%", "Last_Seen": "2024-01-10", "Severity": "Critical"},
+        {"Technique": "T1059.003", "Name": "Windows Command Shell", "Tactic": "Execution", "Severity": "High"},
+        {"Technique": "T1087.002", "Name": "Domain Account Discovery", "Tactic": "Discovery", "Severity": "Medium"},
+        {"Technique": "T1135", "Name": "Network Share Discovery", "Tactic": "Discovery", "Severity": "Medium"},
+        {"Technique": "T1560.001", "Name": "Archive via Utility", "Tactic": "Collection", "Severity": "Medium"},
+        {"Technique": "T1003.001", "Name": "LSASS Memory", "Tactic": "Credential Access", "Severity": "Critical"},
     ]
 }
 
+# ATT&CK coverage of the real rule tree, re-indexed incrementally when rules change
+COVERAGE_INDEX = CoverageIndex()
+
+# Full-text index over rule evaluations and reports, re-indexed incrementally on search
+SEARCH_INDEX = default_index()
+
 # Mock report files
 MOCK_REPORTS = [
     "APT29_CozyBear_Analysis.md",
@@ -66,6 +83,11 @@ MOCK_REPORTS = [
     "Threat_Intelligence_Brief.pdf"
 ]
 
+# Simulated telemetry goes to the columnar store, one run partition per simulation
+TELEMETRY_STORE = TelemetryStore()
+# Benign background events generated around each phase's technique executions
+SIMULATION_NOISE_EVENTS = 2000
+
 # Global state for enhanced simulation
 simulation_state = {
     "running": False,
@@ -75,23 +97,58 @@ simulation_state = {
     "progress": 0,
     "current_phase": "Idle",
     "techniques_executed": 0,
-    "detections_triggered": 0
+    "detections_triggered": 0,
+    "events_generated": 0,
+    "telemetry_run": None
 }
 
+# =============================================================================
+# COVERAGE DATA
+# =============================================================================
+
+def get_coverage_rows(apt_name: Optional[str] = None) -> List[Dict]:
+    """Coverage rows for an APT group (or every known technique), computed from rule tags."""
+    COVERAGE_INDEX.refresh()
+    if apt_name and apt_name != "All APT Groups" and apt_name in APT_TECHNIQUES:
+        profile = APT_TECHNIQUES[apt_name]
+    else:
+        profile = [item for techniques in APT_TECHNIQUES.values() for item in techniques]
+        attributed = {item["Technique"] for item in profile}
+        # Techniques the rules cover that no APT profile lists yet
+        for technique in COVERAGE_INDEX.techniques():
+            if technique not in attributed:
+                info = COVERAGE_INDEX.coverage(technique)
+                profile.append({
+                    "Technique": technique,
+                    "Name": info["rules"][0],
+                    "Tactic": info["tactics"][0] if info["tactics"] else "Unmapped",
+                    "Severity": (info["max_level"] or "medium").title(),
+                })
+
+    rows = []
+    seen = set()
+    for item in profile:
+        if item["Technique"] in seen:
+            continue
+        seen.add(item["Technique"])
+        info = COVERAGE_INDEX.coverage(item["Technique"])
+        rows.append({
+            "Technique": item["Technique"],
+            "Name": item["Name"],
+            "Tactic": item["Tactic"],
+            "Coverage": info["coverage"],
+            "Rules": len(info["rules"]),
+            "Severity": item["Severity"],
+        })
+    return rows
+
 # =============================================================================
 # ENHANCED VISUALIZATION FUNCTIONS
 # =============================================================================
 
 def create_coverage_donut_chart(apt_name: Optional[str] = None):
     """Create a beautiful donut chart for detection coverage."""
-    if apt_name and apt_name != "All APT Groups" and apt_name in ENHANCED_DETECTION_RESULTS:
-        data = ENHANCED_DETECTION_RESULTS[apt_name]
-    else:
-        data = []
-        for apt_results in ENHANCED_DETECTION_RESULTS.values():
-            data.extend(apt_results)
-    
-    df = pd.DataFrame(data)
+    df = pd.DataFrame(get_coverage_rows(apt_name))
     if df.empty:
         # Return empty chart if no data
         fig = go.Figure()
@@ -104,8 +161,9 @@ def create_coverage_donut_chart(apt_name: Optional[str] = None):
         )
         return fig
     
-    coverage_counts = df['Coverage'].value_counts()
-    colors = ['#10b981', '#f59e0b', '#ef4444']  # Green, Yellow, Red
+    coverage_counts = df['Coverage'].value_counts().reindex(['Full', 'Partial', 'None']).dropna()
+    palette = {'Full': '#10b981', 'Partial': '#f59e0b', 'None': '#ef4444'}  # Green, Yellow, Red
+    colors = [palette[label] for label in coverage_counts.index]
     
     fig = go.Figure(data=[go.Pie(
         labels=coverage_counts.index,
@@ -145,16 +203,15 @@ def create_technique_heatmap():
     tactics = []
     scores = []
     
-    for apt_data in ENHANCED_DETECTION_RESULTS.values():
-        for item in apt_data:
-            techniques.append(item['Technique'])
-            tactics.append(item['Tactic'])
-            if item['Coverage'] == 'Full':
-                scores.append(100)
-            elif item['Coverage'] == 'Partial':
-                scores.append(60)
-            else:
-                scores.append(0)
+    for item in get_coverage_rows():
+        techniques.append(item['Technique'])
+        tactics.append(item['Tactic'])
+        if item['Coverage'] == 'Full':
+            scores.append(100)
+        elif item['Coverage'] == 'Partial':
+            scores.append(60)
+        else:
+            scores.append(0)
     
     df = pd.DataFrame({
         'Technique': techniques,
@@ -335,7 +392,9 @@ def simulate_attack(apt_name: str) -> Tuple[str, str, float, str]:
         "progress": 0,
         "current_phase": "Initializing",
         "techniques_executed": 0,
-        "detections_triggered": 0
+        "detections_triggered": 0,
+        "events_generated": 0,
+        "telemetry_run": None
     }
     
     apt_info = APT_GROUPS_ENHANCED[apt_name]
@@ -358,29 +417,65 @@ def simulate_attack(apt_name: str) -> Tuple[str, str, float, str]:
             ("Execution", ["💻 Executing PowerShell payloads...", "🔄 Running command interpreters...", "📜 Deploying malicious scripts..."]),
             ("Persistence", ["🔐 Establishing registry persistence...", "⏰ Creating scheduled tasks...", "🎭 Modifying startup folders..."]),
             ("Defense Evasion", ["🥷 Injecting into legitimate processes...", "🗑️ Cleaning up artifacts...", "🎪 Obfuscating command lines..."]),
+            ("Credential Access", ["🔑 Dumping LSASS memory...", "🧾 Harvesting cached credentials..."]),
             ("Discovery", ["🔍 Enumerating system information...", "👥 Discovering user accounts...", "🌐 Mapping network topology..."]),
+            ("Lateral Movement", ["🖥️ Opening remote desktop sessions...", "🔀 Pivoting to adjacent hosts..."]),
             ("Collection", ["📂 Accessing sensitive files...", "📋 Capturing clipboard data...", "🎥 Recording screen activity..."]),
+            ("Command and Control", ["📡 Pulling tooling from staging servers...", "🧅 Routing traffic through proxies..."]),
             ("Exfiltration", ["📤 Preparing data for extraction...", "🔐 Encrypting stolen data...", "🌐 Establishing exfil channels..."])
         ]
         
-        for i, (phase, activities) in enumerate(phases):
-            simulation_state["current_phase"] = phase
-            simulation_state["progress"] = (i / len(phases)) * 90  # Leave 10% for completion
-            
-            simulation_state["logs"].append(f"\n🎯 Phase {i+1}/7: {phase.upper()}")
-            simulation_state["logs"].append("─" * 30)
-            
-            for activity in activities:
-                time.sleep(0.8)  # Realistic timing
-                simulation_state["logs"].append(activity)
-                simulation_state["techniques_executed"] += 1
+        # Real telemetry for the group's techniques, checked against the rule tree
+        apt_techniques = APT_TECHNIQUES.get(apt_name, [])
+        generator = TelemetryGenerator()
+        engine = load_engine()
+        suppressor = load_suppressor()
+        slug = "".join(c if c.isalnum() else "_" for c in apt_name).strip("_")
+        run_id = f"{slug}_{simulation_state['start_time']:%Y%m%d_%H%M%S}"
+        simulation_state["telemetry_run"] = run_id
+        
+        with StoreWriter(TELEMETRY_STORE, run_id) as sink:
+            for i, (phase, activities) in enumerate(phases):
+                simulation_state["current_phase"] = phase
+                simulation_state["progress"] = (i / len(phases)) * 90  # Leave 10% for completion
+                
+                simulation_state["logs"].append(f"\n🎯 Phase {i+1}/{len(phases)}: {phase.upper()}")
+                simulation_state["logs"].append("─" * 30)
+                
+                for activity in activities:
+                    time.sleep(0.8)  # Realistic timing
+                    simulation_state["logs"].append(activity)
+                
+                techniques = supported(t["Technique"] for t in apt_techniques if t["Tactic"] == phase)
+                events = generator.simulate(techniques, noise=SIMULATION_NOISE_EVENTS)
+                sink.write(events)
+                simulation_state["events_generated"] += len(events)
+                simulation_state["techniques_executed"] += len(techniques)
+                simulation_state["logs"].append(
+                    f"  📡 {len(events)} events generated ({', '.join(techniques) or 'background activity only'})"
+                )
                 
-                # Simulate detections
-                if "executing" in activity.lower() or "deploying" in activity.lower():
-                    simulation_state["detections_triggered"] += 1
-                    simulation_state["logs"].append("  ✅ Detection triggered!")
-                elif "obfuscating" in activity.lower() or "cleaning" in activity.lower():
-                    simulation_state["logs"].append("  ⚠️ Evasion attempt detected!")
+                alerts = engine.process_batch(events)
+                detected = {}
+                for alert in alerts:
+                    technique = alert["event"].get(LABEL_FIELD)
+                    if technique:
+                        detected.setdefault(technique, set()).add(alert["title"])
+                for technique in techniques:
+                    if technique in detected:
+                        simulation_state["detections_triggered"] += 1
+                        simulation_state["logs"].append(f"  ✅ {technique} detected: {', '.join(sorted(detected[technique]))}")
+                    else:
+                        simulation_state["logs"].append(f"  ❌ {technique} not detected")
+                false_positives = sum(1 for alert in alerts if not alert["event"].get(LABEL_FIELD))
+                if false_positives:
+                    simulation_state["logs"].append(f"  ⚠️ {false_positives} alert(s) on benign activity")
+                # Detection is judged on every alert; this counts the repeats suppression holds back downstream
+                suppressed = suppressor.stats.suppressed
+                suppressor.process(alerts)
+                suppressed = suppressor.stats.suppressed - suppressed
+                if suppressed:
+                    simulation_state["logs"].append(f"  🔕 {suppressed} duplicate alert(s) suppressed")
         
         # Completion phase
         simulation_state["current_phase"] = "Completing"
@@ -392,9 +487,9 @@ def simulate_attack(apt_name: str) -> Tuple[str, str, float, str]:
             "═" * 50,
             f"📊 Techniques executed: {simulation_state['techniques_executed']}",
             f"🚨 Detections triggered: {simulation_state['detections_triggered']}",
-            f"📈 Detection rate: {(simulation_state['detections_triggered']/simulation_state['techniques_executed']*100):.1f}%",
+            f"📈 Detection rate: {(simulation_state['detections_triggered']/max(simulation_state['techniques_executed'], 1)*100):.1f}%",
             f"⏱️ Total runtime: {(datetime.now() - simulation_state['start_time']).total_seconds():.1f} seconds",
-            "✅ Telemetry data generated and ready for analysis"
+            f"✅ {simulation_state['events_generated']} telemetry events stored as run {run_id}"
         ]
         
         simulation_state["logs"].extend(completion_logs)
@@ -427,29 +522,22 @@ def get_simulation_status() -> Tuple[str, str, float, str]:
 
 def get_enhanced_detection_results(apt_name: Optional[str] = None) -> Tuple[pd.DataFrame, str, go.Figure]:
     """Get enhanced detection results with visualizations."""
-    if apt_name and apt_name != "All APT Groups" and apt_name in ENHANCED_DETECTION_RESULTS:
-        data = ENHANCED_DETECTION_RESULTS[apt_name]
+    if apt_name and apt_name != "All APT Groups" and apt_name in APT_TECHNIQUES:
         selected_apt = apt_name
-    elif simulation_state["current_apt"] and simulation_state["current_apt"] in ENHANCED_DETECTION_RESULTS:
-        data = ENHANCED_DETECTION_RESULTS[simulation_state["current_apt"]]
+    elif simulation_state["current_apt"] and simulation_state["current_apt"] in APT_TECHNIQUES:
         selected_apt = simulation_state["current_apt"]
     else:
-        data = []
-        for apt_results in ENHANCED_DETECTION_RESULTS.values():
-            data.extend(apt_results)
         selected_apt = None
     
-    df = pd.DataFrame(data)
+    df = pd.DataFrame(get_coverage_rows(selected_apt))
     
     if not df.empty:
         total = len(df)
         full_coverage = len(df[df['Coverage'] == 'Full'])
         partial_coverage = len(df[df['Coverage'] == 'Partial'])
         no_coverage = len(df[df['Coverage'] == 'None'])
-        
-        # Calculate average confidence
-        confidence_values = df['Confidence'].str.rstrip('%').astype(float)
-        avg_confidence = confidence_values.mean()
+        covered = df[df['Coverage'] != 'None']
+        uncovered_critical = len(df[(df['Coverage'] == 'None') & (df['Severity'] == 'Critical')])
         
         summary = f"""
 🎯 **Detection Analysis Summary**
@@ -459,14 +547,14 @@ def get_enhanced_detection_results(apt_name: Optional[str] = None) -> Tuple[pd.D
 • Partial Coverage: **{partial_coverage}/{total}** ({partial_coverage/total*100:.1f}%)
 • No Coverage: **{no_coverage}/{total}** ({no_coverage/total*100:.1f}%)
 
-🔍 **Performance Metrics:**
-• Average Confidence: **{avg_confidence:.1f}%**
-• Critical Techniques: **{len(df[df['Severity'] == 'Critical'])}**
+🔍 **Rule Metrics:**
+• Rules mapped to these techniques: **{int(df['Rules'].sum())}**
+• Critical Techniques: **{len(df[df['Severity'] == 'Critical'])}** ({uncovered_critical} without a rule)
 • High Priority: **{len(df[df['Severity'] == 'High'])}**
 
 ⚡ **Quick Insights:**
-• Strongest tactic: **{df.groupby('Tactic').size().idxmax()}**
-• Most recent activity: **{df['Last_Seen'].max()}**
+• Strongest tactic: **{covered.groupby('Tactic').size().idxmax() if not covered.empty else 'N/A'}**
+• Rule tree version: **{COVERAGE_INDEX.version}** ({COVERAGE_INDEX.summary()['rules']} tagged rules)
 • Coverage score: **{(full_coverage + partial_coverage*0.5)/total*100:.1f}/100**
         """
     else:
@@ -481,6 +569,24 @@ def list_reports() -> List[str]:
     """Mock function to list available reports."""
     return MOCK_REPORTS
 
+def search_reports(query: str) -> str:
+    """Ranked full-text search over evaluations and reports, as markdown."""
+    if not query or not query.strip():
+        return "Enter a search term, e.g. `\"lateral movement\"` or `SSH`."
+    SEARCH_INDEX.refresh()
+    results = SEARCH_INDEX.search(query, k=20)
+    if not results:
+        return f"🔍 No evaluations or reports match **{query}**."
+    lines = [f"## 🔍 {len(results)} result{'s' if len(results) != 1 else ''} for {query}", ""]
+    for result in results:
+        icon = "🧪" if result["kind"] == "evaluation" else "📄"
+        lines.append(f"### {icon} {result['title']}")
+        lines.append(f"*{result['kind'].title()} · `{result['file']}` · score {result['score']:.2f}*")
+        lines.append("")
+        lines.append(f"> {highlight(result['snippet'], result['highlights'])}")
+        lines.append("")
+    return "\n".join(lines)
+
 def load_report(report_name: str) -> str:
     """Load and return report content."""
     if not report_name:
@@ -736,7 +842,7 @@ def create_enhanced_detection_tab():
                 with gr.Tabs():
                     with gr.Tab("📋 Detailed Results"):
                         results_table = gr.Dataframe(
-                            headers=["Technique", "Name", "Tactic", "Coverage", "Confidence", "Last Seen", "Severity"],
+                            headers=["Technique", "Name", "Tactic", "Coverage", "Rules", "Severity"],
                             interactive=False,
                             wrap=True
                         )
@@ -783,6 +889,15 @@ def create_enhanced_reports_tab():
                     load_btn = gr.Button("📖 Load Report", variant="primary", size="lg")
                     download_btn = gr.Button("⬇️ Download Report", variant="secondary")
                     
+                    # Full-text search across evaluations and reports
+                    gr.HTML("<h3 style='color: #8b5cf6;'>🔍 Search</h3>")
+                    search_box = gr.Textbox(
+                        label="Search evaluations & reports",
+                        placeholder='e.g. "lateral movement" SSH',
+                        lines=1
+                    )
+                    search_btn = gr.Button("🔍 Search", variant="secondary")
+                    
                     # Report categories
                     gr.HTML("""
                     <h3 style='color: #8b5cf6;'>📁 Report Categories</h3>
@@ -837,6 +952,17 @@ Select a report from the dropdown menu and click **'Load Report'** to view detai
             inputs=[report_dropdown],
             outputs=[report_viewer]
         )
+        
+        search_btn.click(
+            fn=search_reports,
+            inputs=[search_box],
+            outputs=[report_viewer]
+        )
+        search_box.submit(
+            fn=search_reports,
+            inputs=[search_box],
+            outputs=[report_viewer]
+        )
 
 def create_enhanced_mitre_tab():
     """Create the enhanced MITRE ATT&CK tab."""
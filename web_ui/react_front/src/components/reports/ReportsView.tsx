@@ -1,6 +1,6 @@
 'use client'
 
-import { useState } from 'react'
+import { useEffect, useState } from 'react'
 import { motion } from 'framer-motion'
 import { 
   FileText, 
@@ -17,6 +17,8 @@ import {
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card'
 import { Button } from '@/components/ui/button'
 import { Badge } from '@/components/ui/badge'
+import { searchApi } from '@/utils/api'
+import type { SearchResult } from '@/types'
 
 const reportTypes = [
   { id: 'apt-analysis', name: 'APT Analysis', icon: BarChart3, color: 'text-blue-400' },
@@ -74,6 +76,23 @@ const reports = [
 
 const formatFileSize = (size: string) => size
 
+// Render a search snippet with its matched terms marked
+const HighlightedSnippet = ({ snippet, highlights }: Pick<SearchResult, 'snippet' | 'highlights'>) => {
+  const parts: JSX.Element[] = []
+  let pos = 0
+  highlights.forEach(([start, end], i) => {
+    parts.push(<span key={`t${i}`}>{snippet.slice(pos, start)}</span>)
+    parts.push(
+      <mark key={`m${i}`} className="bg-amber-400/30 text-amber-200 rounded px-0.5">
+        {snippet.slice(start, end)}
+      </mark>
+    )
+    pos = end
+  })
+  parts.push(<span key="rest">{snippet.slice(pos)}</span>)
+  return <p className="text-sm text-slate-300 leading-relaxed">{parts}</p>
+}
+
 const formatDate = (dateString: string) => {
   return new Date(dateString).toLocaleString()
 }
@@ -81,6 +100,31 @@ const formatDate = (dateString: string) => {
 export function ReportsView() {
   const [selectedType, setSelectedType] = useState<string>('all')
   const [searchTerm, setSearchTerm] = useState('')
+  const [contentResults, setContentResults] = useState<SearchResult[]>([])
+  const [searching, setSearching] = useState(false)
+
+  // Full-text search over evaluation and report contents, debounced while typing
+  useEffect(() => {
+    const query = searchTerm.trim()
+    if (!query) {
+      setContentResults([])
+      setSearching(false)
+      return
+    }
+    let cancelled = false
+    const timer = setTimeout(async () => {
+      setSearching(true)
+      const results = await searchApi.search(query, 20)
+      if (!cancelled) {
+        setContentResults(results)
+        setSearching(false)
+      }
+    }, 250)
+    return () => {
+      cancelled = true
+      clearTimeout(timer)
+    }
+  }, [searchTerm])
 
   const filteredReports = reports.filter(report => {
     const matchesType = selectedType === 'all' || report.type === selectedType
@@ -192,7 +236,7 @@ export function ReportsView() {
           <Search className="absolute left-3 top-3 h-4 w-4 text-slate-400" />
           <input
             type="text"
-            placeholder="Search reports..."
+            placeholder="Search reports & evaluations..."
             value={searchTerm}
             onChange={(e) => setSearchTerm(e.target.value)}
             className="w-64 pl-10 pr-4 py-2 bg-slate-800/50 border border-slate-700/50 rounded-lg text-slate-300 placeholder:text-slate-500 focus:outline-none focus:border-blue-500/50 transition-colors"
@@ -200,6 +244,49 @@ export function ReportsView() {
         </div>
       </motion.div>
 
+      {/* Content Matches */}
+      {searchTerm.trim() && (
+        <motion.div
+          initial={{ opacity: 0, y: 20 }}
+          animate={{ opacity: 1, y: 0 }}
+          transition={{ duration: 0.3 }}
+        >
+          <Card className="glass-effect border-slate-700/40">
+            <CardHeader>
+              <CardTitle className="text-xl text-white font-semibold flex items-center gap-2">
+                <Search className="h-5 w-5 text-amber-400" />
+                Content Matches
+              </CardTitle>
+              <CardDescription className="text-slate-400">
+                {searching
+                  ? 'Searching evaluations and reports...'
+                  : `${contentResults.length} match${contentResults.length !== 1 ? 'es' : ''} in evaluations and reports`}
+              </CardDescription>
+            </CardHeader>
+            <CardContent>
+              <div className="space-y-3">
+                {contentResults.map((result) => (
+                  <div
+                    key={`${result.kind}:${result.file}`}
+                    className="p-4 bg-slate-800/30 border border-slate-700/30 rounded-lg space-y-2"
+                  >
+                    <div className="flex items-center justify-between gap-3">
+                      <div className="flex items-center gap-2">
+                        <FileText className={`h-4 w-4 ${result.kind === 'evaluation' ? 'text-blue-400' : 'text-emerald-400'}`} />
+                        <h3 className="font-semibold text-white">{result.title}</h3>
+                        <Badge variant="secondary" className="text-xs capitalize">{result.kind}</Badge>
+                      </div>
+                      <span className="text-xs text-slate-500">{result.file} · {result.score.toFixed(2)}</span>
+                    </div>
+                    <HighlightedSnippet snippet={result.snippet} highlights={result.highlights} />
+                  </div>
+                ))}
+              </div>
+            </CardContent>
+          </Card>
+        </motion.div>
+      )}
+
       {/* Reports List */}
       <motion.div
         initial={{ opacity: 0, y: 20 }}
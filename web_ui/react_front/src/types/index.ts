@@ -201,4 +201,15 @@ export interface RuleEvaluationListItem {
   name: string
   status: 'evaluated' | 'pending' | 'failed'
   last_updated: string
-} 
\ No newline at end of file
+} 
+
+export interface SearchResult {
+  kind: 'evaluation' | 'report'
+  id: string
+  file: string
+  title: string
+  score: number
+  snippet: string
+  // [start, end) character offsets of matched terms within snippet
+  highlights: [number, number][]
+}
@@ -1,5 +1,5 @@
 import axios from 'axios'
-import type { RuleEvaluation, APIResponse } from '@/types'
+import type { RuleEvaluation, APIResponse, SearchResult } from '@/types'
 
 // ✅ Update this to your Ngrok tunnel URL
 const API_BASE = process.env.NEXT_PUBLIC_API_URL || 'https://079b3a0fbe03.ngrok-free.app'
@@ -158,6 +158,19 @@ export const ruleEvaluationApi = {
   },
 }
 
+// Full-text search over rule evaluations and reports
+export const searchApi = {
+  search: async (query: string, limit = 10, kind?: SearchResult['kind']): Promise<SearchResult[]> => {
+    try {
+      const response = await api.get('/search', { params: { q: query, k: limit, kind } })
+      return response.data
+    } catch (error) {
+      console.warn('Search API not available')
+      return []
+    }
+  },
+}
+
 // Simulation API functions (placeholder for future integration)
 export const simulationApi = {
   getSimulations: async () => {